@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Count MongoDB round trips and time the classroom listing queries.
+
+Seeds a scratch database (learnlive_benchmark on MONGODB_URI, dropped
+afterwards) with one teacher's classes full of students, assignments and
+submissions, then runs each query the old way (one users.find_one per
+person, everything in one reply) and the current way (Database's batched
+`$in` lookups, submissions one page at a time). Round trips are counted
+with a pymongo command listener, so every find, getMore and aggregate sent
+to the server is included; latency is the best of --repeat runs. On a
+remote database each round trip costs a network RTT, so the gap grows
+with distance.
+
+Usage: python benchmarks/query_benchmark.py [--classes N] [--students N]
+           [--assignments N] [--repeat N]
+"""
+
+import argparse
+import time
+from datetime import datetime, timedelta
+import sys
+import os
+
+from bson import ObjectId
+from pymongo import monitoring
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import server.database as database
+
+BENCHMARK_DATABASE = 'learnlive_benchmark'
+
+
+class RoundTripCounter(monitoring.CommandListener):
+    """Count the commands the driver sends (one per round trip)"""
+
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event):
+        self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+def get_user_classes_n_plus_one(db, user_id, role):
+    """The previous get_user_classes: one users.find_one per teacher and student"""
+    if role == 'teacher':
+        classes = list(db.classes.find({'teacher_id': user_id}))
+    else:
+        classes = list(db.classes.find({'students': user_id}))
+
+    for c in classes:
+        c['_id'] = str(c['_id'])
+        if 'teacher_id' in c:
+            teacher = db.users.find_one({'_id': ObjectId(c['teacher_id'])})
+            if teacher:
+                c['teacher_name'] = teacher.get('name', 'Teacher')
+
+        student_list = []
+        for student_id in c.get('students', []):
+            student = db.users.find_one({'_id': ObjectId(student_id)})
+            if student:
+                student_list.append({
+                    'id': student_id,
+                    'name': student.get('name', 'Student'),
+                    'email': student.get('email', '')
+                })
+        c['student_list'] = student_list
+    return {'success': True, 'classes': classes}
+
+
+def get_submissions_n_plus_one(db, assignment_id):
+    """The previous get_submissions: every submission, one users.find_one for each"""
+    submissions = list(db.submissions.find({'assignment_id': assignment_id}))
+    for submission in submissions:
+        submission['_id'] = str(submission['_id'])
+        submission['assignment_id'] = str(submission['assignment_id'])
+        submission['student_id'] = str(submission['student_id'])
+        if submission.get('submitted_at'):
+            submission['submitted_at'] = submission['submitted_at'].isoformat()
+        student = db.users.find_one({'_id': ObjectId(submission['student_id'])})
+        submission['student_name'] = student.get('name', 'Unknown') if student else 'Unknown'
+        submission['student_email'] = student.get('email', '') if student else ''
+    return {'success': True, 'submissions': submissions}
+
+
+def get_teacher_submissions_n_plus_one(db, teacher_id):
+    """The previous get_teacher_submissions: every submission, find_one and linear scans for each"""
+    teacher_classes = list(db.classes.find({'teacher_id': teacher_id}))
+    class_ids = [cls['_id'] for cls in teacher_classes]
+    assignments = list(db.assignments.find({'class_id': {'$in': [str(cid) for cid in class_ids]}}))
+    assignment_ids = [str(assgn['_id']) for assgn in assignments]
+    submissions = list(db.submissions.find({'assignment_id': {'$in': assignment_ids}}))
+
+    for s in submissions:
+        s['_id'] = str(s['_id'])
+        user = db.users.find_one({'_id': ObjectId(s['student_id'])})
+        if user:
+            s['student_name'] = user['name']
+        assignment = next((a for a in assignments if str(a['_id']) == s['assignment_id']), None)
+        if assignment:
+            s['assignment_title'] = assignment['title']
+            class_obj = next((c for c in teacher_classes if str(c['_id']) == assignment['class_id']), None)
+            if class_obj:
+                s['class_name'] = class_obj['class_name']
+        if 'submitted_at' in s:
+            s['submitted_at'] = s['submitted_at'].strftime('%Y-%m-%d %H:%M')
+    submissions.sort(key=lambda x: x.get('submitted_at', ''), reverse=True)
+    return {'success': True, 'submissions': submissions}
+
+
+def get_student_all_assignments_n_plus_one(db, student_id):
+    """The previous get_student_all_assignments: a find_one and a linear scan per assignment"""
+    student_classes = list(db.classes.find({'students': student_id}))
+    class_ids = [str(cls['_id']) for cls in student_classes]
+    assignments = list(db.assignments.find({'class_id': {'$in': class_ids}}))
+
+    for assgn in assignments:
+        assgn['_id'] = str(assgn['_id'])
+        if assgn.get('created_at'):
+            assgn['created_at'] = assgn['created_at'].isoformat()
+        class_obj = next((c for c in student_classes if str(c['_id']) == assgn['class_id']), None)
+        if class_obj:
+            assgn['class_name'] = class_obj['class_name']
+        submission = db.submissions.find_one({'assignment_id': str(assgn['_id']), 'student_id': student_id})
+        assgn['submitted'] = submission is not None
+        if submission and 'submitted_at' in submission:
+            assgn['submitted_at'] = submission['submitted_at'].isoformat()
+    assignments.sort(key=lambda x: x.get('created_at', ''), reverse=True)
+    return {'success': True, 'assignments': assignments}
+
+
+def seed(db, class_count, students_per_class, assignments_per_class):
+    """Insert a teacher's classes, their students, assignments and everyone's submissions"""
+    teacher_id = str(db.users.insert_one({
+        'email': 'teacher@benchmark.test', 'password': 'x' * 64, 'name': 'Teacher', 'role': 'teacher'
+    }).inserted_id)
+
+    students = [
+        {'email': f'student{n}@benchmark.test', 'password': 'x' * 64, 'name': f'Student {n}', 'role': 'student'}
+        for n in range(class_count * students_per_class)
+    ]
+    student_ids = [str(inserted) for inserted in db.users.insert_many(students).inserted_ids]
+
+    classes = [
+        {
+            'class_name': f'Class {n}',
+            'class_code': f'BENCH{n}',
+            'teacher_id': teacher_id,
+            'students': student_ids[n * students_per_class:(n + 1) * students_per_class]
+        }
+        for n in range(class_count)
+    ]
+    db.classes.insert_many(classes)
+
+    assignments = [
+        {'class_id': str(cls['_id']), 'title': f'Assignment {n}', 'created_at': datetime.now()}
+        for cls in classes for n in range(assignments_per_class)
+    ]
+    db.assignments.insert_many(assignments)
+
+    started = datetime.now()
+    submissions = []
+    for assignment, cls in ((a, c) for c in classes for a in assignments if a['class_id'] == str(c['_id'])):
+        for n, student_id in enumerate(cls['students']):
+            submissions.append({
+                'assignment_id': str(assignment['_id']),
+                'student_id': student_id,
+                'file_id': str(ObjectId()),
+                'original_filename': f'answer{n}.pdf',
+                'text_content': 'x' * 2000,
+                'submitted_at': started - timedelta(seconds=len(submissions))
+            })
+    if submissions:
+        db.submissions.insert_many(submissions)
+
+    return {
+        'teacher_id': teacher_id,
+        'student_id': student_ids[0],
+        'assignment_id': str(assignments[0]['_id']) if assignments else str(ObjectId())
+    }
+
+
+def measure(counter, run, repeat):
+    """Run `run` `repeat` times - returns (round trips per run, best seconds, last result)"""
+    best = None
+    for _ in range(repeat):
+        counter.count = 0
+        started = time.perf_counter()
+        result = run()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return counter.count, best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark LearnLive listing queries against a seeded database')
+    parser.add_argument('--classes', type=int, default=8, help='Classes taught by the seeded teacher')
+    parser.add_argument('--students', type=int, default=60, help='Students enrolled per class')
+    parser.add_argument('--assignments', type=int, default=10, help='Assignments per class, each submitted by every student')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per query (best latency is reported)')
+    args = parser.parse_args()
+
+    counter = RoundTripCounter()
+    monitoring.register(counter)  # Applies to clients created from here on
+
+    database.DATABASE_NAME = BENCHMARK_DATABASE  # Never touch the real data
+    db = database.Database()
+    db.client.drop_database(BENCHMARK_DATABASE)
+    db = database.Database()  # Recreate the indexes the server would have
+    try:
+        ids = seed(db, args.classes, args.students, args.assignments)
+
+        # (name, old query, current query, key of the returned rows, results must match)
+        cases = [
+            ('get_user_classes (teacher)',
+             lambda: get_user_classes_n_plus_one(db, ids['teacher_id'], 'teacher'),
+             lambda: db.get_user_classes(ids['teacher_id'], 'teacher'), 'classes', True),
+            ('get_user_classes (student)',
+             lambda: get_user_classes_n_plus_one(db, ids['student_id'], 'student'),
+             lambda: db.get_user_classes(ids['student_id'], 'student'), 'classes', True),
+            ('get_submissions',
+             lambda: get_submissions_n_plus_one(db, ids['assignment_id']),
+             lambda: db.get_submissions(ids['assignment_id']), 'submissions', False),
+            ('get_teacher_submissions',
+             lambda: get_teacher_submissions_n_plus_one(db, ids['teacher_id']),
+             lambda: db.get_teacher_submissions(ids['teacher_id']), 'submissions', False),
+            ('get_student_all_assignments',
+             lambda: get_student_all_assignments_n_plus_one(db, ids['student_id']),
+             lambda: db.get_student_all_assignments(ids['student_id']), 'assignments', False),
+        ]
+
+        print(f"{args.classes} classes x {args.students} students x {args.assignments} assignments "
+              f"(pages of {database.LIST_PAGE_SIZE})")
+        print(f"{'query':<28}  {'trips before':>12}  {'trips after':>11}  {'ms before':>9}  {'ms after':>8}  "
+              f"{'rows before':>11}  {'rows after':>10}")
+        for name, before, after, key, same in cases:
+            trips_before, time_before, result_before = measure(counter, before, args.repeat)
+            trips_after, time_after, result_after = measure(counter, after, args.repeat)
+            assert result_after['success'], f"{name}: {result_after.get('error')}"
+            if same:
+                assert result_before == result_after, f'{name}: results differ'
+            print(f"{name:<28}  {trips_before:>12}  {trips_after:>11}  "
+                  f"{time_before * 1000:>9.1f}  {time_after * 1000:>8.1f}  "
+                  f"{len(result_before[key]):>11}  {len(result_after[key]):>10}")
+    finally:
+        db.client.drop_database(BENCHMARK_DATABASE)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Compare the old and new ways of receiving a payload.
+
+The old path (`data += chunk` with 4096-byte recv calls) copies everything
+received so far on every read. The new path (protocol.framing) fills one
+preallocated buffer with recv_into. Both read the same payload from a local
+socket pair at 1 MB, 10 MB and 50 MB. The old path needs a few minutes at
+50 MB, which is the point.
+
+Usage: python benchmarks/recv_benchmark.py [--repeat N]
+"""
+
+import argparse
+import socket
+import threading
+import time
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from protocol.codec import frame
+from protocol.framing import FrameReader, PayloadStream
+
+SIZES = [1024 * 1024, 10 * 1024 * 1024, 50 * 1024 * 1024]
+
+
+def recv_concat(sock, size):
+    """The previous receive loop"""
+    data = b""
+    while len(data) < size:
+        chunk = sock.recv(min(4096, size - len(data)))
+        if not chunk:
+            break
+        data += chunk
+    return data
+
+
+def recv_payload_stream(sock, size):
+    """Raw payload after a GridFS frame / download metadata"""
+    return PayloadStream(sock, size).read_all()
+
+
+def recv_frame_reader(sock, size):
+    """Length-prefixed frame through FrameReader (sender adds the prefix)"""
+    data, _ = FrameReader(sock).read_frame()
+    return data
+
+
+def run_once(receive, payload, framed):
+    """Send `payload` over a socket pair and time `receive` on the other end"""
+    left, right = socket.socketpair()
+    outgoing = frame(payload) if framed else payload
+    sender = threading.Thread(target=left.sendall, args=(outgoing,))
+
+    started = time.perf_counter()
+    sender.start()
+    received = receive(right, len(payload))
+    elapsed = time.perf_counter() - started
+
+    sender.join()
+    left.close()
+    right.close()
+    assert len(received) == len(payload)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the LearnLive receive paths')
+    parser.add_argument('--repeat', type=int, default=1, help='Runs per size (best is reported)')
+    args = parser.parse_args()
+
+    paths = [
+        ('data += chunk', recv_concat, False),
+        ('PayloadStream', recv_payload_stream, False),
+        ('FrameReader', recv_frame_reader, True),
+    ]
+
+    print(f"{'size':>8}  " + "  ".join(f"{name:>15}" for name, _, _ in paths))
+    for size in SIZES:
+        payload = os.urandom(size)
+        timings = [
+            min(run_once(receive, payload, framed) for _ in range(args.repeat))
+            for _, receive, framed in paths
+        ]
+        print(f"{size // (1024 * 1024):>6}MB  " + "  ".join(f"{t * 1000:>13.1f}ms" for t in timings))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Measure chunked upload throughput against window size over a slow link.
+
+A small in-process server answers HELLO and the transfer messages with the
+real FileHandler, and the real LearnLiveClient uploads to it through
+LatencyProxy, a loopback TCP proxy that holds every segment for half the
+round-trip time in each direction (a sleep-based stand-in for tc netem, so
+no root or kernel support is needed). With stop-and-wait (window 1) every
+chunk costs a full round trip; a wider window, larger chunks or more
+streams keep the link busy instead.
+
+The benchmark server handles each connection's frames in order on one
+thread, so it understates what the threaded/async engines manage with
+their worker pool; compare rows with each other, not with production.
+
+Usage: python benchmarks/transfer_benchmark.py [--size-mb N] [--rtt-ms N]
+           [--windows 1,2,4,8,16,32] [--chunk-kb 8,64] [--streams 1,4]
+"""
+
+import argparse
+import contextlib
+import io
+import queue
+import shutil
+import socket
+import tempfile
+import threading
+import time
+import uuid
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.config import (
+    CODEC_JSON, MSG_HELLO, MSG_START_FILE_TRANSFER, MSG_FILE_CHUNK, MSG_END_FILE_TRANSFER,
+    RESP_ERROR, RESP_SUCCESS
+)
+from protocol.codec import choose_codec, decode_frame, encode_frame
+from protocol.framing import FrameReader, PayloadStream
+from server.file_handler import FileHandler
+from client.utility import LearnLiveClient
+
+
+class LatencyProxy:
+    """Forward TCP connections to `target`, delaying each direction by `delay` seconds"""
+
+    def __init__(self, target, delay):
+        self.target = target
+        self.delay = delay
+        self.listener = socket.create_server(('127.0.0.1', 0))
+        self.port = self.listener.getsockname()[1]
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            downstream, _ = self.listener.accept()
+            upstream = socket.create_connection(self.target)
+            for sock in (downstream, upstream):
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            threading.Thread(target=self._pipe, args=(downstream, upstream), daemon=True).start()
+            threading.Thread(target=self._pipe, args=(upstream, downstream), daemon=True).start()
+
+    def _pipe(self, source, destination):
+        """Read from `source` and hand each segment to a delay line towards `destination`"""
+        line = queue.Queue()
+
+        def deliver():
+            while True:
+                due, data = line.get()
+                wait = due - time.monotonic()
+                if wait > 0:
+                    time.sleep(wait)
+                try:
+                    if not data:
+                        destination.shutdown(socket.SHUT_WR)
+                        return
+                    destination.sendall(data)
+                except OSError:
+                    return
+
+        threading.Thread(target=deliver, daemon=True).start()
+        while True:
+            try:
+                data = source.recv(256 * 1024)
+            except OSError:
+                data = b''
+            line.put((time.monotonic() + self.delay, data))
+            if not data:
+                return
+
+
+class TransferServer:
+    """Just enough of the LearnLive server for chunked uploads (no database, no auth)"""
+
+    def __init__(self):
+        self.file_handler = FileHandler()
+        self.handlers = {
+            MSG_START_FILE_TRANSFER: lambda data: self.file_handler.handle_file_upload_start(data, None),
+            MSG_FILE_CHUNK: self.file_handler.handle_file_chunk,
+            MSG_END_FILE_TRANSFER: self.file_handler.handle_file_upload_complete,
+        }
+        self.listener = socket.create_server(('127.0.0.1', 0))
+        self.address = self.listener.getsockname()
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            sock, _ = self.listener.accept()
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            threading.Thread(target=self._serve, args=(sock,), daemon=True).start()
+
+    def _serve(self, sock):
+        reader = FrameReader(sock)
+        codec = CODEC_JSON
+        with sock:
+            while True:
+                frame = reader.read_frame()
+                if frame is None:
+                    return
+                message = decode_frame(frame[0], frame[1], codec)
+                data = message.get('data', {})
+                if message.get('type') == MSG_FILE_CHUNK and 'chunk_length' in data:
+                    data['chunk_data'] = PayloadStream(sock, data['chunk_length']).read_all()
+
+                if message.get('type') == MSG_HELLO:
+                    agreed = choose_codec(data.get('codecs'))
+                    sock.sendall(encode_frame({'type': RESP_SUCCESS, 'success': True, 'codec': agreed}, codec))
+                    codec = agreed
+                    continue
+
+                handler = self.handlers.get(message.get('type'))
+                response = handler(data) if handler else {'type': RESP_ERROR, 'error': 'Unknown message type'}
+                if 'request_id' in message:
+                    response['request_id'] = message['request_id']
+                sock.sendall(encode_frame(response, codec))
+
+
+def run_upload(port, file_path, window, chunk_size, streams):
+    """Upload `file_path` once through the proxy and return the elapsed seconds"""
+    client = LearnLiveClient()
+    # FileHandler and the client log every chunk; keep the table readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        client.connect('127.0.0.1', port)
+        started = time.perf_counter()
+        result = client.upload_file(file_path, transfer_id=uuid.uuid4().hex, window=window,
+                                    chunk_size=chunk_size, streams=streams, timeout=60)
+        elapsed = time.perf_counter() - started
+        client.disconnect()
+    if not result.get('success'):
+        raise RuntimeError(f"Upload failed: {result.get('error')}")
+    os.remove(result['filepath'])
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark chunked upload throughput by window size')
+    parser.add_argument('--size-mb', type=float, default=4, help='Size of the uploaded file')
+    parser.add_argument('--rtt-ms', type=float, default=20, help='Round-trip time added by the proxy')
+    parser.add_argument('--windows', default='1,2,4,8,16,32', help='Comma-separated window sizes')
+    parser.add_argument('--chunk-kb', default='8,64', help='Comma-separated requested chunk sizes')
+    parser.add_argument('--streams', default='1,4', help='Comma-separated connection counts')
+    args = parser.parse_args()
+
+    windows = [int(value) for value in args.windows.split(',')]
+    chunk_sizes = [int(value) * 1024 for value in args.chunk_kb.split(',')]
+    stream_counts = [int(value) for value in args.streams.split(',')]
+
+    # FileHandler writes under ./uploads, so work in a scratch directory
+    original_dir = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix='learnlive-transfer-')
+    os.chdir(workdir)
+    try:
+        size = int(args.size_mb * 1024 * 1024)
+        file_path = os.path.join(workdir, 'payload.zip')
+        with open(file_path, 'wb') as f:
+            f.write(os.urandom(size))
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            server = TransferServer()
+        proxy = LatencyProxy(server.address, args.rtt_ms / 2000)
+
+        print(f"{args.size_mb:g} MB upload, {args.rtt_ms:g} ms RTT")
+        print(f"{'chunk':>7}  {'streams':>7}  {'window':>6}  {'seconds':>8}  {'MB/s':>7}")
+        for chunk_size in chunk_sizes:
+            for streams in stream_counts:
+                for window in windows:
+                    elapsed = run_upload(proxy.port, file_path, window, chunk_size, streams)
+                    print(f"{chunk_size // 1024:>5}KB  {streams:>7}  {window:>6}  {elapsed:>8.2f}  "
+                          f"{size / (1024 * 1024) / elapsed:>7.2f}")
+    finally:
+        os.chdir(original_dir)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
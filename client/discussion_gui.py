@@ -145,8 +145,9 @@ class DiscussionView:
     def _load_messages(self):
         """Fetch messages for the current class and render them.
 
-        This calls the server-side handler directly (DiscussionHandler) which
-        accesses MongoDB. If no class is selected, nothing is fetched.
+        Messages are requested from the server over the dashboard's
+        connection (GET_MESSAGES) and rendered on the Tk thread when the
+        reply arrives. If no class is selected, nothing is fetched.
         """
         # Determine class_id
         class_id = None
@@ -165,11 +166,21 @@ class DiscussionView:
             self._add_message("Open a class to view discussion messages.", "System")
             return
 
+        client = getattr(self.dashboard, 'client', None)
+        if not client or not client.connected:
+            self._add_message("Not connected to server; messages can't be loaded.", "System")
+            return
+
+        future = client.request('GET_MESSAGES', {'class_id': class_id, 'limit': 200})
+        future.add_done_callback(
+            lambda done: self.dashboard.window.after(0, lambda: self._show_messages(done.result()))
+        )
+
+    def _show_messages(self, resp):
+        """Render a GET_MESSAGES response (oldest message first)."""
+        if not self.messages_frame.winfo_exists():
+            return  # The discussion page was closed before the reply came
         try:
-            # Import here to avoid client/server import at module load time
-            from server.discussion_handler import DiscussionHandler
-            handler = DiscussionHandler()
-            resp = handler.fetch_messages_handler({'class_id': class_id, 'limit': 200})
             if resp.get('type') != 'SUCCESS':
                 self._add_message(f"Failed to load messages: {resp.get('error')}", "System")
                 return
@@ -0,0 +1,154 @@
+# Download Cache for LearnLive Client
+#
+# Downloaded files are kept on disk keyed by their GridFS file_id and the
+# etag the server reports for them (the content's SHA-256 for files stored
+# since deduplication). Before downloading, the client asks the server for
+# the file's metadata with HEAD_FILE; if the cached copy's etag still
+# matches, the file is served from disk without transferring any content.
+# The cache is capped at CLIENT_CACHE_MAX_BYTES and evicts the least
+# recently used files first. Its index is a JSON file next to the files.
+
+import json
+import re
+import shutil
+import threading
+import time
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.config import CLIENT_CACHE_DIR, CLIENT_CACHE_MAX_BYTES
+
+INDEX_FILE = 'index.json'
+
+
+class FileCache:
+    def __init__(self, cache_dir: str = CLIENT_CACHE_DIR, max_bytes: int = CLIENT_CACHE_MAX_BYTES):
+        """Open (or create) the download cache in `cache_dir`"""
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(cache_dir, INDEX_FILE)
+        self.lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self.entries = self._load_index()  # file_id -> {etag, filename, path, size, last_used}
+
+    def _load_index(self):
+        """Read the index and delete cached files it doesn't know about"""
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            entries = {}
+
+        known = {os.path.basename(self._entry_dir(file_id)) for file_id in entries}
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if os.path.isdir(path) and name not in known:
+                shutil.rmtree(path, ignore_errors=True)
+        return entries
+
+    def _save_index(self):
+        """Write the index atomically so a crash never leaves it half written"""
+        temp_path = self.index_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f)
+        os.replace(temp_path, self.index_path)
+
+    def _entry_dir(self, file_id):
+        """Directory holding one cached file (kept under its own name for opening)"""
+        return os.path.join(self.cache_dir, re.sub(r'[^A-Za-z0-9_-]', '_', str(file_id)))
+
+    def _drop(self, file_id):
+        """Forget an entry and delete its file"""
+        self.entries.pop(file_id, None)
+        shutil.rmtree(self._entry_dir(file_id), ignore_errors=True)
+
+    def get(self, file_id, etag):
+        """
+        Look up a cached file.
+
+        Args:
+            file_id: GridFS file id
+            etag: The file's current etag from HEAD_FILE
+
+        Returns:
+            dict: The entry (with `path`, `filename`, `size`), or None if the
+            file isn't cached or the cached copy is stale
+        """
+        with self.lock:
+            entry = self.entries.get(file_id)
+            if entry is None:
+                return None
+            try:
+                intact = os.path.getsize(entry['path']) == entry['size']
+            except OSError:
+                intact = False
+            if entry['etag'] != etag or not intact:
+                self._drop(file_id)
+                self._save_index()
+                return None
+
+            entry['last_used'] = time.time()
+            self._save_index()
+            return dict(entry)
+
+    def put(self, file_id, etag, source_path, filename):
+        """
+        Move a finished download into the cache.
+
+        Args:
+            file_id: GridFS file id
+            etag: The etag the file was downloaded under
+            source_path: Downloaded file (moved, not copied)
+            filename: Name to keep the file under
+
+        Returns:
+            str: Path of the cached file, or None if it is too large to cache
+            (`source_path` is then left where it is)
+        """
+        size = os.path.getsize(source_path)
+        if size > self.max_bytes:
+            return None
+
+        with self.lock:
+            self._drop(file_id)
+            entry_dir = self._entry_dir(file_id)
+            os.makedirs(entry_dir, exist_ok=True)
+            path = os.path.join(entry_dir, os.path.basename(filename or '') or 'download.bin')
+            shutil.move(source_path, path)
+
+            self.entries[file_id] = {
+                'etag': etag,
+                'filename': filename,
+                'path': path,
+                'size': size,
+                'last_used': time.time()
+            }
+            self._evict()
+            self._save_index()
+            return path
+
+    def _evict(self):
+        """Remove least recently used files until the cache fits in max_bytes"""
+        total = sum(entry['size'] for entry in self.entries.values())
+        for file_id, entry in sorted(self.entries.items(), key=lambda item: item[1]['last_used']):
+            if total <= self.max_bytes:
+                break
+            total -= entry['size']
+            self._drop(file_id)
+
+    def usage(self):
+        """Number of cached files and the bytes they take"""
+        with self.lock:
+            return {
+                'files': len(self.entries),
+                'bytes': sum(entry['size'] for entry in self.entries.values()),
+                'max_bytes': self.max_bytes
+            }
+
+    def clear(self):
+        """Delete every cached file"""
+        with self.lock:
+            for file_id in list(self.entries):
+                self._drop(file_id)
+            self._save_index()
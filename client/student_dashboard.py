@@ -1,6 +1,6 @@
 import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
-from tkinter import messagebox, Canvas, simpledialog
+from tkinter import messagebox, Canvas, simpledialog, StringVar, BooleanVar
 import os
 import sys
 import threading
@@ -13,6 +13,9 @@ from client.utility import LearnLiveClient
 from client.expand_gui import ExpandView
 from client.discussion_gui import DiscussionView
 
+# To-Do "Due" filter choices -> due_within_days (None shows every assignment)
+TODO_DUE_FILTERS = {"Any time": None, "Today": 0, "Next 7 days": 7, "Next 30 days": 30}
+
 
 class StudentDashboard:
     """Student Dashboard - Google Classroom Style"""
@@ -40,6 +43,9 @@ class StudentDashboard:
         self.assignments_container = None  # Reference to assignments display container
         self.pending_submission_request = None  # Track pending submission requests
         self.current_expand_view = None  # Track current expanded view for comments
+        self.todo_due_within = None  # To-Do filters (created with the window)
+        self.todo_not_submitted = None
+        self.todo_results = None  # Frame the To-Do list is drawn in
         
         self.client.set_message_callback(self._handle_server_message)
     
@@ -1147,13 +1153,14 @@ class StudentDashboard:
         if msg_type == 'FILE_DOWNLOAD_COMPLETE':
             print(f"[DEBUG STUDENT] File download complete: {message.get('filename')}")
     
-            binary_data = message.get('binary_data')
+            file_path = message.get('file_path')  # Temp file the client streamed into, or its cached copy
             filename = message.get('filename')
             request_id = message.get('request_id')
+            cached = message.get('cached', False)  # File lives in the download cache; copy, never move
     
-            print(f"[DEBUG STUDENT] Request ID: {request_id}, Binary data size: {len(binary_data) if binary_data else 0}")
+            print(f"[DEBUG STUDENT] Request ID: {request_id}, File: {file_path} ({message.get('size', 0)} bytes)")
     
-            if binary_data and filename:
+            if file_path and filename:
                 # CRITICAL FIX: Use window.after() to prevent UI blocking
                 if hasattr(self, f'want_to_open_{request_id}'):
                     # Open the file
@@ -1161,17 +1168,13 @@ class StudentDashboard:
                     delattr(self, f'want_to_open_{request_id}')
                     # Use after() to schedule in main thread
                     if self.window and self.window.winfo_exists():
-                        self.window.after(0, lambda: self._open_downloaded_file(filename, binary_data, request_id))
+                        self.window.after(0, lambda: self._open_downloaded_file(filename, file_path, request_id))
                 else:
                     # Save the file - DEFAULT BEHAVIOR
                     print(f"[DEBUG STUDENT] Saving file: {filename}")
                     # Use after() to schedule in main thread
                     if self.window and self.window.winfo_exists():
-                        self.window.after(0, lambda: self._save_downloaded_file(filename, binary_data, request_id))
-    
-            # Clear binary data from message to save memory
-            if 'binary_data' in message:
-                message['binary_data'] = b''
+                        self.window.after(0, lambda: self._save_downloaded_file(filename, file_path, request_id, cached))
     
             return
 
@@ -1386,7 +1389,7 @@ class StudentDashboard:
             # If currently viewing To-Do page, refresh all assignments
             if self.current_view == "todo":
                 print(f"[DEBUG] Refreshing To-Do page for new assignment")
-                self.client.send_message('GET_STUDENT_ALL_ASSIGNMENTS', {})
+                self.window.after(0, self._load_todo)
         
             # Show notification popup
             self.window.after(50, lambda: messagebox.showinfo(
@@ -1564,6 +1567,9 @@ class StudentDashboard:
     def _show_todo_page(self):
         """Show To-Do page with all assignments from all classes"""
         self.current_view = "todo"
+        if self.todo_due_within is None:
+            self.todo_due_within = StringVar(value="Any time")
+            self.todo_not_submitted = BooleanVar(value=False)
         
         # Clear main content
         for widget in self.content_frame.winfo_children():
@@ -1588,36 +1594,84 @@ class StudentDashboard:
             bootstyle="secondary"
         ).pack(anchor=W, pady=(5, 0))
         
+        # Filters (applied by the server)
+        filters = ttk.Frame(header, bootstyle="dark")
+        filters.pack(anchor=W, pady=(10, 0))
+        
+        ttk.Label(filters, text="Due:", font=("Arial", 11), bootstyle="inverse-dark").pack(side=LEFT)
+        due_combo = ttk.Combobox(
+            filters,
+            textvariable=self.todo_due_within,
+            values=list(TODO_DUE_FILTERS),
+            state="readonly",
+            width=14
+        )
+        due_combo.pack(side=LEFT, padx=(5, 20))
+        due_combo.bind("<<ComboboxSelected>>", lambda e: self._load_todo())
+        
+        ttk.Checkbutton(
+            filters,
+            text="Hide submitted",
+            variable=self.todo_not_submitted,
+            command=self._load_todo,
+            bootstyle="round-toggle"
+        ).pack(side=LEFT)
+        
+        # Results are replaced whenever the filters change
+        self.todo_results = ttk.Frame(self.content_frame, bootstyle="dark")
+        self.todo_results.pack(fill=BOTH, expand=YES)
+        self._load_todo()
+    
+    def _load_todo(self):
+        """Request every page of the To-Do list with the selected filters"""
+        for widget in self.todo_results.winfo_children():
+            widget.destroy()
+        
         # Loading message
         ttk.Label(
-            self.content_frame,
+            self.todo_results,
             text="📥 Loading assignments...",
             font=("Arial", 14),
             bootstyle="secondary"
         ).pack(pady=50)
         
-        # Request all assignments from server
-        self.client.send_message('GET_STUDENT_ALL_ASSIGNMENTS', {})
+        data = {"not_submitted": self.todo_not_submitted.get()}
+        due_within_days = TODO_DUE_FILTERS.get(self.todo_due_within.get())
+        if due_within_days is not None:
+            data["due_within_days"] = due_within_days
+        
+        future = self.client.request_all_pages('GET_STUDENT_ALL_ASSIGNMENTS', data, 'assignments')
+        future.add_done_callback(
+            lambda done: self.window.after(0, lambda: self._show_todo_assignments(done.result()))
+        )
+    
+    def _show_todo_assignments(self, response):
+        """Render a combined GET_STUDENT_ALL_ASSIGNMENTS response on the To-Do page"""
+        if not response.get('success'):
+            if self.current_view == "todo":
+                messagebox.showerror("Error", f"Failed to load assignments: {response.get('error')}")
+            return
+        self._display_all_assignments(response.get('assignments', []))
     
     def _display_all_assignments(self, assignments):
         """Display all assignments in To-Do page"""
-        if self.current_view != "todo":
+        if self.current_view != "todo" or not self.todo_results.winfo_exists():
             return
         
-        # Clear loading message
-        for widget in self.content_frame.winfo_children():
-            if widget.winfo_class() == 'TLabel' and 'Loading' in str(widget.cget('text')):
-                widget.destroy()
+        # Clear loading message (or the previous results)
+        for widget in self.todo_results.winfo_children():
+            widget.destroy()
         
         if not assignments:
+            filtered = self.todo_not_submitted.get() or TODO_DUE_FILTERS.get(self.todo_due_within.get()) is not None
             ttk.Label(
-                self.content_frame,
-                text="📭 No assignments yet",
+                self.todo_results,
+                text="📭 Nothing matches these filters" if filtered else "📭 No assignments yet",
                 font=("Arial", 16),
                 bootstyle="secondary"
             ).pack(pady=50)
             ttk.Label(
-                self.content_frame,
+                self.todo_results,
                 text="Your assignments will appear here when teachers create them",
                 font=("Arial", 12),
                 bootstyle="secondary"
@@ -1626,8 +1680,8 @@ class StudentDashboard:
         
         # Canvas for scrolling
         from tkinter import Canvas, Scrollbar, LEFT, RIGHT, BOTH, YES, Y, NW
-        canvas = Canvas(self.content_frame, bg='#1a1a1a', highlightthickness=0)
-        scrollbar = Scrollbar(self.content_frame, orient="vertical", command=canvas.yview)
+        canvas = Canvas(self.todo_results, bg='#1a1a1a', highlightthickness=0)
+        scrollbar = Scrollbar(self.todo_results, orient="vertical", command=canvas.yview)
         scrollable_frame = ttk.Frame(canvas, bootstyle="dark")
         
         scrollable_frame.bind(
@@ -1939,24 +1993,21 @@ class StudentDashboard:
             self.client.disconnect()
             self.window.destroy()
 
-    def _save_downloaded_file(self, filename, binary_data, request_id=None):
+    def _save_downloaded_file(self, filename, file_path, request_id=None, cached=False):
         """Save a downloaded file"""
-        print(f"[DEBUG STUDENT SAVE] _save_downloaded_file called: {filename}, data size: {len(binary_data) if binary_data else 0}")
+        print(f"[DEBUG STUDENT SAVE] _save_downloaded_file called: {filename}, temp file: {file_path}")
     
         from tkinter import filedialog, messagebox
+        import os
+        import shutil
     
         try:
-            # CRITICAL: Validate binary data
-            if not binary_data:
-                print(f"[ERROR STUDENT SAVE] No binary data received")
+            # CRITICAL: Validate downloaded file
+            if not file_path or not os.path.exists(file_path):
+                print(f"[ERROR STUDENT SAVE] Downloaded file missing: {file_path}")
                 messagebox.showerror("Error", "No file data received")
                 return
         
-            if not isinstance(binary_data, bytes):
-                print(f"[ERROR STUDENT SAVE] Binary data is not bytes, type: {type(binary_data)}")
-                messagebox.showerror("Error", "File data is corrupted")
-                return
-        
             print(f"[DEBUG STUDENT SAVE] Showing save dialog for: {filename}")
         
             # Ask user where to save
@@ -1969,9 +2020,12 @@ class StudentDashboard:
             print(f"[DEBUG STUDENT SAVE] User selected path: {save_path}")
         
             if save_path:
-                # Save the file
-                with open(save_path, 'wb') as f:
-                    f.write(binary_data)
+                # Move the downloaded temp file into place (cached files are copied)
+                size = os.path.getsize(file_path)
+                if cached:
+                    shutil.copyfile(file_path, save_path)
+                else:
+                    shutil.move(file_path, save_path)
             
                 print(f"[DEBUG STUDENT SAVE] File saved successfully: {save_path}")
             
@@ -1979,11 +2033,13 @@ class StudentDashboard:
                     "Success", 
                     f"✅ File saved successfully!\n\n"
                     f"📄 {filename}\n"
-                    f"📦 Size: {len(binary_data):,} bytes\n"
+                    f"📦 Size: {size:,} bytes\n"
                     f"📁 Location: {save_path}"
                 )
             else:
                print(f"[DEBUG STUDENT SAVE] User cancelled save")
+               if not cached:
+                   os.remove(file_path)
                messagebox.showinfo("Cancelled", "Download cancelled")
             
         except Exception as e:
@@ -1992,9 +2048,9 @@ class StudentDashboard:
             traceback.print_exc()
             messagebox.showerror("Error", f"Cannot save file: {str(e)}")
 
-    def _open_downloaded_file(self, filename, binary_data, request_id=None):
+    def _open_downloaded_file(self, filename, file_path, request_id=None):
         """Open a downloaded file directly"""
-        print(f"[DEBUG STUDENT OPEN] _open_downloaded_file called: {filename}, data size: {len(binary_data) if binary_data else 0}")
+        print(f"[DEBUG STUDENT OPEN] _open_downloaded_file called: {filename}, temp file: {file_path}")
     
         from tkinter import messagebox
         import tempfile
@@ -2003,30 +2059,19 @@ class StudentDashboard:
         import sys
     
         try:
-            # CRITICAL: Validate binary data
-            if not binary_data:
-                print(f"[ERROR STUDENT OPEN] No binary data received")
+            # CRITICAL: Validate downloaded file
+            if not file_path or not os.path.exists(file_path):
+                print(f"[ERROR STUDENT OPEN] Downloaded file missing: {file_path}")
                 messagebox.showerror("Error", "No file data received")
                 return
         
-            if not isinstance(binary_data, bytes):
-                print(f"[ERROR STUDENT OPEN] Binary data is not bytes, type: {type(binary_data)}")
-                messagebox.showerror("Error", "File data is corrupted")
-                return
-        
             # Make sure filename is a string
             if not isinstance(filename, str):
                 filename = str(filename) if filename else "download.bin"
         
-            # Create temp file
-            import tempfile
-            with tempfile.NamedTemporaryFile(
-                delete=False, 
-                suffix=os.path.splitext(filename)[1] or '.bin',
-                prefix='download_'
-            ) as tmp:
-                tmp.write(binary_data)
-                temp_path = tmp.name
+            # The client already streamed the download into a temp file
+            temp_path = file_path
+            size = os.path.getsize(temp_path)
         
             print(f"[DEBUG STUDENT OPEN] Saved temp file: {temp_path}")
         
@@ -2046,7 +2091,7 @@ class StudentDashboard:
                     "Success", 
                     f"{message}\n\n"
                    f"📄 {filename}\n"
-                    f"📦 Size: {len(binary_data):,} bytes\n"
+                    f"📦 Size: {size:,} bytes\n"
                     f"📁 Temporary file: {temp_path}"
                 )
             
@@ -2055,7 +2100,7 @@ class StudentDashboard:
                 messagebox.showinfo(
                     "File Saved", 
                     f"📄 {filename}\n"
-                    f"📦 Size: {len(binary_data):,} bytes\n"
+                    f"📦 Size: {size:,} bytes\n"
                     f"📁 Saved to temporary location:\n{temp_path}\n\n"
                     f"Please open it manually from this location."
                 )
@@ -238,8 +238,23 @@ class TeacherDashboard:
             bootstyle="secondary"
         ).pack(pady=50)
         
-        # Request submissions (response will come via callback)
-        self.client.send_message('GET_TEACHER_SUBMISSIONS', {})
+        # Request submissions (every page; displayed when the last arrives)
+        self._load_toget_submissions()
+    
+    def _load_toget_submissions(self):
+        """Fetch all of the teacher's submissions, following the server's pages"""
+        future = self.client.request_all_pages('GET_TEACHER_SUBMISSIONS', {}, 'submissions')
+        future.add_done_callback(
+            lambda done: self.window.after(0, lambda: self._show_toget_submissions(done.result()))
+        )
+    
+    def _show_toget_submissions(self, response):
+        """Render a combined GET_TEACHER_SUBMISSIONS response on the To-Get page"""
+        if not response.get('success'):
+            if self.current_view == "toget":
+                messagebox.showerror("Error", f"Failed to load submissions: {response.get('error')}")
+            return
+        self._display_submissions(response.get('submissions', []))
     
     def _display_submissions(self, submissions):
         """Display submissions in To-Get page"""
@@ -360,36 +375,11 @@ class TeacherDashboard:
             return
     
         try:
-            # Use the new binary download method
+            # The file arrives as FILE_DOWNLOAD_COMPLETE (from the cache if it is current)
+            # and _handle_server_message asks where to save it
             result = self.client.download_file_binary(file_id)
         
-            if result.get('success'):
-                binary_data = result.get('binary_data')
-                filename = result.get('filename', f"submission_{file_id[:8]}.bin")
-            
-                # Ask user where to save
-                from tkinter import filedialog
-                save_path = filedialog.asksaveasfilename(
-                    defaultextension="",
-                    initialfile=filename,
-                    filetypes=[("All Files", "*.*")]
-                )
-            
-                if save_path:
-                    # Write raw binary to file
-                    with open(save_path, 'wb') as f:
-                        f.write(binary_data)
-                
-                    messagebox.showinfo(
-                        "Success", 
-                        f"Submission downloaded!\n\n"
-                        f"File: {filename}\n"
-                        f"Size: {len(binary_data)} bytes\n"
-                        f"Saved to: {save_path}"
-                    )
-                else:
-                    messagebox.showinfo("Cancelled", "Download cancelled")
-            else:
+            if not result.get('success'):
                 messagebox.showerror("Error", f"Failed to download: {result.get('error')}")
             
         except Exception as e:
@@ -1730,13 +1720,14 @@ class TeacherDashboard:
         if msg_type == 'FILE_DOWNLOAD_COMPLETE':
             print(f"[DEBUG TEACHER] File download complete: {message.get('filename')}")
     
-            binary_data = message.get('binary_data')
+            file_path = message.get('file_path')  # Temp file the client streamed into, or its cached copy
             filename = message.get('filename')
             request_id = message.get('request_id')
+            cached = message.get('cached', False)  # File lives in the download cache; copy, never move
     
-            print(f"[DEBUG TEACHER] Request ID: {request_id}, Binary data size: {len(binary_data) if binary_data else 0}")
+            print(f"[DEBUG TEACHER] Request ID: {request_id}, File: {file_path} ({message.get('size', 0)} bytes)")
     
-            if binary_data and filename:
+            if file_path and filename:
              # CRITICAL FIX: Use window.after() to prevent UI blocking
                 if hasattr(self, f'want_to_open_{request_id}'):
                     # Open the file
@@ -1744,17 +1735,13 @@ class TeacherDashboard:
                     delattr(self, f'want_to_open_{request_id}')
                     # Use after() to schedule in main thread
                     if self.window and self.window.winfo_exists():
-                        self.window.after(0, lambda: self._open_downloaded_file(filename, binary_data, request_id))
+                        self.window.after(0, lambda: self._open_downloaded_file(filename, file_path, request_id))
                 else:
                     # Save the file - DEFAULT BEHAVIOR
                     print(f"[DEBUG TEACHER] Saving file: {filename}")
                     # Use after() to schedule in main thread
                     if self.window and self.window.winfo_exists():
-                        self.window.after(0, lambda: self._save_downloaded_file(filename, binary_data, request_id))
-    
-            # Clear binary data from message to save memory
-            if 'binary_data' in message:
-                message['binary_data'] = b''
+                        self.window.after(0, lambda: self._save_downloaded_file(filename, file_path, request_id, cached))
     
             return
     
@@ -1821,7 +1808,7 @@ class TeacherDashboard:
                 # If currently viewing To-Get page, refresh all submissions
                 if self.current_view == "toget":
                     print(f"[DEBUG] Refreshing To-Get page after assignment creation")
-                    self.window.after(100, lambda: self.client.send_message('GET_TEACHER_SUBMISSIONS', {}))
+                    self.window.after(100, self._load_toget_submissions)
             elif "material_id" in message:
                 # Handle UPLOAD_MATERIAL response
                 if hasattr(self, 'upload_dialog') and self.upload_dialog:
@@ -2101,7 +2088,7 @@ class TeacherDashboard:
                 print(f"[DEBUG] Received NEW_SUBMISSION notification")
                 if self.current_view == "toget":
                     print(f"[DEBUG] Refreshing To-Get page after new submission")
-                    self.window.after(100, lambda: self.client.send_message('GET_TEACHER_SUBMISSIONS', {}))
+                    self.window.after(100, self._load_toget_submissions)
             elif notif_type == 'NEW_COMMENT':
                 from tkinter import messagebox  # IMPORT ADDED HERE
             
@@ -2175,9 +2162,12 @@ class TeacherDashboard:
             bootstyle="inverse-light"
         ).pack(padx=20, pady=20)
         
-        # Fetch submissions from server
-        print(f"[DEBUG] Calling view_submissions for assignment_id: {assignment_id}")
-        self.client.view_submissions(assignment_id)
+        # Fetch every page of submissions from server
+        print(f"[DEBUG] Requesting submissions for assignment_id: {assignment_id}")
+        future = self.client.request_all_pages('VIEW_SUBMISSIONS', {'assignment_id': assignment_id}, 'submissions')
+        future.add_done_callback(
+            lambda done: self.window.after(0, lambda: self._show_dialog_submissions(dialog, done.result()))
+        )
         
         # Create scrollable frame for submissions
         from tkinter import Canvas, Scrollbar
@@ -2223,6 +2213,15 @@ class TeacherDashboard:
             width=15
         ).pack(pady=(0, 20))
     
+    def _show_dialog_submissions(self, dialog, response):
+        """Render a combined VIEW_SUBMISSIONS response in its dialog, if still open"""
+        if not dialog.winfo_exists():
+            return
+        if not response.get('success'):
+            messagebox.showerror("Error", f"Failed to load submissions: {response.get('error')}", parent=dialog)
+            return
+        self._display_submissions_in_dialog(dialog, response.get('submissions', []))
+    
     def _display_submissions_in_dialog(self, dialog, submissions):
             """Display submissions in the dialog"""
             print(f"[DEBUG] _display_submissions_in_dialog called with {len(submissions)} submissions")
@@ -2400,56 +2399,32 @@ class TeacherDashboard:
 
     def _download_material_handler(self, file_id, filename, material_type, title):
         """Handle material download for teacher"""
-        from tkinter import messagebox, filedialog
+        from tkinter import messagebox
         
+        # The file arrives as FILE_DOWNLOAD_COMPLETE (from the cache if it is current)
+        # and _handle_server_message asks where to save it
         result = self.client.download_file_binary(file_id)
         
-        if result.get('success'):
-            binary_data = result.get('binary_data')
-            download_filename = result.get('filename', filename)
-            
-            # Ask where to save
-            save_path = filedialog.asksaveasfilename(
-                defaultextension="",
-                initialfile=download_filename,
-                filetypes=[("All Files", "*.*")]
-            )
-            
-            if save_path:
-                try:
-                    with open(save_path, 'wb') as f:
-                        f.write(binary_data)
-                    messagebox.showinfo("Success", 
-                        f"Material downloaded!\n\n"
-                        f"📄 {download_filename}\n"
-                        f"📦 {len(binary_data):,} bytes\n"
-                        f"📁 {save_path}"
-                    )
-                except Exception as e:
-                    messagebox.showerror("Error", f"Save failed: {str(e)}")
-        else:
+        if not result.get('success'):
             messagebox.showerror("Error", f"Download failed: {result.get('error')}")
 
 
 
-    def _save_downloaded_file(self, filename, binary_data, request_id=None):
+    def _save_downloaded_file(self, filename, file_path, request_id=None, cached=False):
         """Save a downloaded file"""
-        print(f"[DEBUG TEACHER SAVE] _save_downloaded_file called: {filename}, data size: {len(binary_data) if binary_data else 0}")
+        print(f"[DEBUG TEACHER SAVE] _save_downloaded_file called: {filename}, temp file: {file_path}")
     
         from tkinter import filedialog, messagebox
+        import os
+        import shutil
     
         try:
-             # CRITICAL: Validate binary data
-            if not binary_data:
-                print(f"[ERROR TEACHER SAVE] No binary data received")
+            # CRITICAL: Validate downloaded file
+            if not file_path or not os.path.exists(file_path):
+                print(f"[ERROR TEACHER SAVE] Downloaded file missing: {file_path}")
                 messagebox.showerror("Error", "No file data received")
                 return
         
-            if not isinstance(binary_data, bytes):
-                print(f"[ERROR TEACHER SAVE] Binary data is not bytes, type: {type(binary_data)}")
-                messagebox.showerror("Error", "File data is corrupted")
-                return
-        
             print(f"[DEBUG TEACHER SAVE] Showing save dialog for: {filename}")
         
             # Ask user where to save
@@ -2462,9 +2437,12 @@ class TeacherDashboard:
             print(f"[DEBUG TEACHER SAVE] User selected path: {save_path}")
         
             if save_path:
-                # Save the file
-                with open(save_path, 'wb') as f:
-                    f.write(binary_data)
+                # Move the downloaded temp file into place (cached files are copied)
+                size = os.path.getsize(file_path)
+                if cached:
+                    shutil.copyfile(file_path, save_path)
+                else:
+                    shutil.move(file_path, save_path)
             
                 print(f"[DEBUG TEACHER SAVE] File saved successfully: {save_path}")
             
@@ -2472,11 +2450,13 @@ class TeacherDashboard:
                     "Success", 
                     f"✅ File saved successfully!\n\n"
                     f"📄 {filename}\n"
-                    f"📦 Size: {len(binary_data):,} bytes\n"
+                    f"📦 Size: {size:,} bytes\n"
                     f"📁 Location: {save_path}"
                 )
             else:
                 print(f"[DEBUG TEACHER SAVE] User cancelled save")
+                if not cached:
+                    os.remove(file_path)
                 messagebox.showinfo("Cancelled", "Download cancelled")
             
         except Exception as e:
@@ -2485,9 +2465,9 @@ class TeacherDashboard:
             traceback.print_exc()
             messagebox.showerror("Error", f"Cannot save file: {str(e)}")
 
-    def _open_downloaded_file(self, filename, binary_data, request_id=None):
+    def _open_downloaded_file(self, filename, file_path, request_id=None):
         """Open a downloaded file directly"""
-        print(f"[DEBUG TEACHER OPEN] _open_downloaded_file called: {filename}, data size: {len(binary_data) if binary_data else 0}")
+        print(f"[DEBUG TEACHER OPEN] _open_downloaded_file called: {filename}, temp file: {file_path}")
     
         from tkinter import messagebox
         import tempfile
@@ -2496,30 +2476,19 @@ class TeacherDashboard:
         import sys
     
         try:
-            # CRITICAL: Validate binary data
-            if not binary_data:
-                print(f"[ERROR TEACHER OPEN] No binary data received")
+            # CRITICAL: Validate downloaded file
+            if not file_path or not os.path.exists(file_path):
+                print(f"[ERROR TEACHER OPEN] Downloaded file missing: {file_path}")
                 messagebox.showerror("Error", "No file data received")
                 return
         
-            if not isinstance(binary_data, bytes):
-                print(f"[ERROR TEACHER OPEN] Binary data is not bytes, type: {type(binary_data)}")
-                messagebox.showerror("Error", "File data is corrupted")
-                return
-        
             # Make sure filename is a string
             if not isinstance(filename, str):
                 filename = str(filename) if filename else "download.bin"
         
-            # Create temp file
-            import tempfile
-            with tempfile.NamedTemporaryFile(
-                delete=False, 
-                suffix=os.path.splitext(filename)[1] or '.bin',
-                prefix='download_'
-            ) as tmp:
-                tmp.write(binary_data)
-                temp_path = tmp.name
+            # The client already streamed the download into a temp file
+            temp_path = file_path
+            size = os.path.getsize(temp_path)
         
             print(f"[DEBUG TEACHER OPEN] Saved temp file: {temp_path}")
         
@@ -2539,7 +2508,7 @@ class TeacherDashboard:
                     "Success", 
                     f"{message}\n\n"
                     f"📄 {filename}\n"
-                    f"📦 Size: {len(binary_data):,} bytes\n"
+                    f"📦 Size: {size:,} bytes\n"
                     f"📁 Temporary file: {temp_path}"
                 )
             
@@ -2548,7 +2517,7 @@ class TeacherDashboard:
                 messagebox.showinfo(
                     "File Saved", 
                     f"📄 {filename}\n"
-                    f"📦 Size: {len(binary_data):,} bytes\n"
+                    f"📦 Size: {size:,} bytes\n"
                     f"📁 Saved to temporary location:\n{temp_path}\n\n"
                     f"Please open it manually from this location."
                 )
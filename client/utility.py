@@ -1,8 +1,13 @@
 import socket
-import json
 import threading
 import uuid
 import time
+import tempfile
+import base64
+import hashlib
+import json
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
 from typing import Callable, Optional
 import os
 import sys
@@ -10,7 +15,63 @@ import sys
 # Add parent directory to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from config.config import SERVER_HOST, SERVER_PORT, BUFFER_SIZE
+from config.config import (
+    SERVER_HOST, SERVER_PORT, BUFFER_SIZE, CODEC_JSON, GRIDFS_STREAM_CHUNK, TRANSFER_WINDOW
+)
+from protocol.codec import (
+    CodecError, available_codecs, available_compressions, decode_frame, encode_frame
+)
+from protocol.framing import FrameReader, PayloadStream
+from client.file_cache import FileCache
+
+
+class _ChunkSchedule:
+    """Chunks still to send for one upload, shared by all of its streams.
+    
+    Streams take chunk numbers in order, give back the ones they had in
+    flight if their connection fails, and report every CHUNK_ACK so chunks
+    the server already has (per its cumulative and selective ACKs) are
+    never sent again.
+    """
+    
+    def __init__(self, missing, total_chunks):
+        self.lock = threading.Lock()
+        self.pending = deque(n for first, end in missing for n in range(first, end))
+        self.acked = bytearray(total_chunks)  # 1 once the server has the chunk
+        self.cumulative = 0  # Every chunk below this is acknowledged
+        self.chunks_received = total_chunks - len(self.pending)
+    
+    def next_chunk(self):
+        """The next chunk to send, or None when nothing is left"""
+        with self.lock:
+            while self.pending:
+                chunk_number = self.pending.popleft()
+                if not self.acked[chunk_number]:
+                    return chunk_number
+            return None
+    
+    def give_back(self, chunk_numbers):
+        """Requeue chunks whose acknowledgements were lost with a connection"""
+        with self.lock:
+            self.pending.extendleft(reversed(chunk_numbers))
+    
+    def acknowledge(self, ack):
+        """Record a CHUNK_ACK; returns the server's received count so far"""
+        with self.lock:
+            self.acked[ack['chunk_number']] = 1
+            cumulative = ack.get('cumulative_ack', 0)
+            if cumulative > self.cumulative:
+                self.acked[self.cumulative:cumulative] = b'\x01' * (cumulative - self.cumulative)
+                self.cumulative = cumulative
+            for first, end in ack.get('sack', []):
+                self.acked[first:end] = b'\x01' * (end - first)
+            self.chunks_received = max(self.chunks_received, ack['chunks_received'])
+            return self.chunks_received
+    
+    def has_pending(self):
+        with self.lock:
+            return any(not self.acked[n] for n in self.pending)
+
 
 class LearnLiveClient:
     """
@@ -24,10 +85,20 @@ class LearnLiveClient:
         self.token = None
         self.user_data = {}
         self.receive_thread = None
+        self.frame_reader = None  # Reads frames into a reusable buffer
         self.running = False
         self.message_callback = None
         self.server_address = (SERVER_HOST, SERVER_PORT)
         self.pending_download = None  # NEW: Track pending download
+        self.download_progress = None  # progress(received, total) for the pending download
+        self.download_target = None  # Open file a range download is written into (see download_range)
+        self.download_cache_key = None  # (file_id, etag) the pending download is cached under
+        self.file_cache = None  # FileCache, opened by the first cached download
+        self.pending_requests = {}  # request_id -> Future, see request()
+        self.pending_lock = threading.Lock()
+        self.send_lock = threading.Lock()  # Keeps a frame and its raw payload together
+        self.codec = CODEC_JSON  # Frame codec, agreed with the server in connect()
+        self.compression = None  # Frame compression, agreed likewise
         
     def connect(self, host: str = '127.0.0.1', port: int = SERVER_PORT) -> dict:
         """
@@ -43,8 +114,16 @@ class LearnLiveClient:
         try:
             self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.socket.connect((host, port))
+            # A header frame and its raw payload go out as separate writes; don't let
+            # Nagle hold the second one back for the server's delayed ACK
+            self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.server_address = (host, port)
+            self.frame_reader = FrameReader(self.socket)
             self.connected = True
             self.running = True
+            self.codec = CODEC_JSON
+            self.compression = None
+            self._negotiate_codec()
             
             # Start receiving thread
             self.receive_thread = threading.Thread(target=self._receive_messages, daemon=True)
@@ -54,6 +133,37 @@ class LearnLiveClient:
         except Exception as e:
             return {"success": False, "error": str(e)}
     
+    def _negotiate_codec(self):
+        """Offer our codecs and compression with HELLO and switch to the server's picks.
+        
+        Runs before the receive thread starts, so the reply is read here.
+        Servers that don't know HELLO answer with an error and the
+        connection simply stays on JSON.
+        """
+        if not self.send_message("HELLO", {
+            "codecs": available_codecs(),
+            "compression": available_compressions()
+        }):
+            return
+        
+        try:
+            frame = self.frame_reader.read_frame()
+            if frame is None:
+                raise ConnectionError("Server closed connection")
+            data, compressed = frame
+            response = decode_frame(data, compressed, self.codec, self.compression)
+        except (ConnectionError, CodecError) as e:
+            print(f"Codec negotiation failed: {e}")
+            return
+        
+        if not response.get('success'):
+            return
+        if response.get('codec') in available_codecs():
+            self.codec = response['codec']
+        if response.get('compression') in available_compressions():
+            self.compression = response['compression']
+        print(f"🤝 Using {self.codec} codec, compression {self.compression or 'off'}")
+    
     def disconnect(self):
         """Disconnect from the server."""
         self.running = False
@@ -65,6 +175,8 @@ class LearnLiveClient:
             except:
                 pass
             self.socket = None
+        
+        self._fail_pending_requests("Disconnected from server")
     
     def set_message_callback(self, callback: Callable):
         """
@@ -79,41 +191,25 @@ class LearnLiveClient:
         """Background thread for receiving messages from server."""
         while self.running and self.connected:
             try:
-                # Receive message length (4 bytes)
-                length_data = b''
-                while len(length_data) < 4:
-                    chunk = self.socket.recv(4 - len(length_data))
-                    if not chunk:
-                        # Server closed connection
-                        self.connected = False
-                        if self.message_callback:
-                            self.message_callback({
-                                "type": "DISCONNECTED",
-                                "message": "Server closed connection"
-                            })
-                        return
-                    length_data += chunk
-                
-                message_length = int.from_bytes(length_data, byteorder='big')
+                # Receive the next length-prefixed message
+                frame = self.frame_reader.read_frame()
+                if frame is None:
+                    # Server closed connection
+                    self.connected = False
+                    self._fail_pending_requests("Server closed connection")
+                    if self.message_callback:
+                        self.message_callback({
+                            "type": "DISCONNECTED",
+                            "message": "Server closed connection"
+                        })
+                    return
                 
-                # Receive the full message
-                data = b''
-                while len(data) < message_length:
-                    chunk = self.socket.recv(min(BUFFER_SIZE, message_length - len(data)))
-                    if not chunk:
-                        # Server closed connection
-                        self.connected = False
-                        if self.message_callback:
-                            self.message_callback({
-                                "type": "DISCONNECTED",
-                                "message": "Server closed connection"
-                            })
-                        return
-                    data += chunk
+                # View into the reader's buffer, decoded before the next read
+                data, compressed = frame
                 
-                # Parse the complete JSON message
+                # Decode the complete message
                 try:
-                    message = json.loads(data.decode())
+                    message = decode_frame(data, compressed, self.codec, self.compression)
                     
                     # DEBUG: Print received message
                     print(f"📥 Client received: {message}")
@@ -126,35 +222,48 @@ class LearnLiveClient:
                         
                         print(f"[CLIENT] File metadata received, expecting {message['size']} bytes")
                         
-                        # Now read binary data directly from socket
                         size = message.get('size', 0)
+                        if self.download_target is not None:
+                            # Range download: write at the offset the server sends from
+                            # (servers without range support always start at 0)
+                            self.download_target.seek(message.get('offset', 0))
+                            self._receive_download(message.get('filename'), size, self.download_target)
+                            self.pending_download = None
+                            self.download_target = None
+                            self.download_progress = None
+                            continue
+                        
+                        # Now stream the binary data from the socket into a temp file
                         if size > 0:
-                            binary_data = b""
-                            bytes_received = 0
+                            file_path = self._receive_download(message.get('filename'), size)
                             
-                            while bytes_received < size:
-                                remaining = size - bytes_received
-                                chunk = self.socket.recv(min(4096, remaining))
-                                if not chunk:
-                                    break
-                                binary_data += chunk
-                                bytes_received += len(chunk)
+                            print(f"[CLIENT] Received {size} bytes of binary data into {file_path}")
                             
-                            print(f"[CLIENT] Received {len(binary_data)} bytes of binary data")
+                            # Keep a copy for next time (the cached file must not be moved or deleted)
+                            cached_path = None
+                            if self.download_cache_key is not None:
+                                file_id, etag = self.download_cache_key
+                                try:
+                                    cached_path = self.file_cache.put(file_id, etag, file_path, message.get('filename'))
+                                except OSError as e:
+                                    print(f"[CLIENT] Could not cache {file_id}: {e}")
                             
                             # Create complete download response
                             download_response = {
                                 "type": "FILE_DOWNLOAD_COMPLETE",
                                 "success": True,
                                 "filename": message.get('filename'),
-                                "binary_data": binary_data,
-                                "size": len(binary_data),
+                                "file_path": cached_path or file_path,
+                                "cached": cached_path is not None,
+                                "size": size,
                                 "content_type": message.get('content_type'),
                                 "request_id": self.pending_download
                             }
                             
                             # Reset pending download
                             self.pending_download = None
+                            self.download_progress = None
+                            self.download_cache_key = None
                             
                             # Call callback with complete file
                             if self.message_callback:
@@ -163,13 +272,18 @@ class LearnLiveClient:
                             # Skip normal callback for metadata
                             continue
                     
+                    # Responses to request() resolve their Future instead
+                    if self._resolve_request(message):
+                        continue
+                    
                     # Call callback if set
                     if self.message_callback:
                         self.message_callback(message)
-                except json.JSONDecodeError as e:
-                    print(f"JSON decode error: {e}")
+                except CodecError as e:
+                    print(f"Decode error: {e}")
                     
             except Exception as e:
+                self._fail_pending_requests(f"Connection error: {str(e)}")
                 if self.running:  # Only report if not intentional disconnect
                     # Don't show connection errors for expected disconnections
                     error_str = str(e).lower()
@@ -181,13 +295,60 @@ class LearnLiveClient:
                             })
                 break
     
-    def send_message(self, message_type: str, data: dict = None) -> bool:
+    def _receive_download(self, filename: str, size: int, target=None) -> str:
+        """
+        Stream a download's raw bytes into a file, chunk by chunk.
+        
+        Memory use is one GRIDFS_STREAM_CHUNK buffer whatever the file size.
+        
+        Args:
+            filename: Server-side filename (for the temp file's extension)
+            size: Number of raw bytes that follow the metadata frame
+            target: Open file to write into at its current position;
+                a new temp file is created when None
+        
+        Returns:
+            str: Path of the file written (the caller moves or deletes a temp file)
+        """
+        payload = PayloadStream(self.socket, size)
+        
+        if target is not None:
+            self._copy_payload(payload, target, size)
+            return target.name
+        
+        suffix = os.path.splitext(filename or '')[1] or '.bin'
+        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix, prefix='download_') as tmp:
+            try:
+                self._copy_payload(payload, tmp, size)
+            except Exception:
+                tmp.close()
+                os.remove(tmp.name)
+                raise
+        
+        return tmp.name
+    
+    def _copy_payload(self, payload, target, size):
+        """Copy a raw payload into `target`, reporting progress after every chunk"""
+        buffer = bytearray(min(GRIDFS_STREAM_CHUNK, size))
+        view = memoryview(buffer)
+        while True:
+            count = payload.readinto(buffer)
+            if not count:
+                break
+            target.write(view[:count])
+            if self.download_progress:
+                self.download_progress(payload.received, size)
+    
+    def send_message(self, message_type: str, data: dict = None,
+                     request_id: str = None, payload: bytes = None) -> bool:
         """
         Send a message to the server.
         
         Args:
             message_type: Type of message (LOGIN, CREATE_CLASS, etc.)
             data: Message data
+            request_id: Optional id the server echoes in its response
+            payload: Optional raw bytes sent right after the frame
             
         Returns:
             bool: True if sent successfully
@@ -205,17 +366,110 @@ class LearnLiveClient:
             if self.token:
                 message["token"] = self.token
             
-            # Send JSON message with length prefix
-            json_data = json.dumps(message).encode()
-            message_length = len(json_data)
-            length_prefix = message_length.to_bytes(4, byteorder='big')
-            self.socket.sendall(length_prefix + json_data)
+            if request_id is not None:
+                message["request_id"] = request_id
+            
+            # Send message with length prefix
+            message_frame = encode_frame(message, self.codec, self.compression)
+            with self.send_lock:
+                self.socket.sendall(message_frame)
+                if payload is not None:
+                    self.socket.sendall(payload)
             
             return True
         except Exception as e:
             print(f"Send error: {e}")
             return False
     
+    def request(self, message_type: str, data: dict = None, payload: bytes = None) -> Future:
+        """
+        Send a message and return a Future for its response.
+        
+        The message carries a unique request_id that the server echoes, so
+        many requests can be in flight at once and responses may arrive in
+        any order. The matching response resolves the Future instead of
+        going to the message callback; attach a done-callback or call
+        result(timeout) from a worker thread to avoid blocking the UI.
+        
+        Args:
+            message_type: Type of message
+            data: Message data
+            payload: Optional raw bytes sent right after the frame
+            
+        Returns:
+            Future: Resolves to the response dict (an ERROR dict if the
+            request could not be sent or the connection dropped)
+        """
+        request_id = uuid.uuid4().hex
+        future = Future()
+        with self.pending_lock:
+            self.pending_requests[request_id] = future
+        
+        if not self.send_message(message_type, data, request_id=request_id, payload=payload):
+            with self.pending_lock:
+                self.pending_requests.pop(request_id, None)
+            future.set_result({'type': 'ERROR', 'error': 'Failed to send request'})
+        
+        return future
+
+    def request_all_pages(self, message_type: str, data: dict, key: str) -> Future:
+        """
+        Request every page of a paged listing, following `next_cursor`.
+
+        Pages are requested one after another without blocking the caller.
+
+        Args:
+            message_type: Listing message (e.g. "GET_TEACHER_SUBMISSIONS")
+            data: Message data (filters); `cursor` is added for later pages
+            key: Field of the response holding the page's items
+
+        Returns:
+            Future: Resolves to the last page's response with `key` holding
+            the items of all pages, or to the first ERROR response
+        """
+        combined = Future()
+        items = []
+
+        def on_page(done):
+            response = done.result()
+            if not response.get('success'):
+                combined.set_result(response)
+                return
+            items.extend(response.get(key) or [])
+            cursor = response.get('next_cursor')
+            if cursor:
+                self.request(message_type, {**data, "cursor": cursor}).add_done_callback(on_page)
+            else:
+                combined.set_result({**response, key: items})
+
+        self.request(message_type, dict(data)).add_done_callback(on_page)
+        return combined
+
+    def _resolve_request(self, message: dict) -> bool:
+        """Complete the Future waiting on this response, if any."""
+        request_id = message.get('request_id')
+        if request_id is None:
+            return False
+        
+        with self.pending_lock:
+            future = self.pending_requests.pop(request_id, None)
+        if future is None:
+            return False
+        
+        if not future.done():  # Caller may have given up and cancelled it
+            future.set_result(message)
+        return True
+    
+    def _fail_pending_requests(self, error: str):
+        """Resolve every outstanding request with an error (connection lost)."""
+        with self.pending_lock:
+            pending = list(self.pending_requests.values())
+            self.pending_requests.clear()
+        
+        for future in pending:
+            if not future.done():
+                future.set_result({'type': 'ERROR', 'error': error})
+    
     def login(self, email: str, password: str) -> dict:
         """
         Login to the server.
@@ -313,84 +567,79 @@ class LearnLiveClient:
         return self.send_message("VIEW_ASSIGNMENTS", {
             "class_id": class_id
         })
+
+    def view_todo(self, due_within_days: int = None, not_submitted: bool = False,
+                  limit: int = None, cursor: str = None) -> bool:
+        """
+        View assignments across all of the student's classes (student only).
+
+        Args:
+            due_within_days: Only assignments due between today and this many days on
+            not_submitted: Leave out assignments already handed in
+            limit: Page size (the server's default if None)
+            cursor: `next_cursor` of the previous page
+        """
+        data = {"not_submitted": not_submitted}
+        if due_within_days is not None:
+            data["due_within_days"] = due_within_days
+        if limit is not None:
+            data["limit"] = limit
+        if cursor:
+            data["cursor"] = cursor
+        return self.send_message("GET_STUDENT_ALL_ASSIGNMENTS", data)
+
+    def submit_assignment(self, assignment_id: str, file_content: bytes = None,
+                          text_content: str = "", filename: str = "") -> bool:
+        """Submit an assignment inline (bytes travel natively on a binary codec)."""
+        file_data = None
+        if file_content:
+            file_data = file_content if self.codec != CODEC_JSON else file_content.hex()
+        return self.send_message("SUBMIT_ASSIGNMENT", {
+            "assignment_id": assignment_id,
+            "file_data": file_data,
+            "text_content": text_content,
+            "filename": filename
+        })
     
-    def submit_assignment_gridfs(self, assignment_id, user_id, file_content, submission_text="", filename=None):
+    def submit_assignment_gridfs(self, assignment_id, user_id, file_content, submission_text="", filename=None, timeout=10):
         """ Submit assignment with GridFS storage using binary protocol.Sends metadata as JSON first, then raw binary data."""
-        # Create a unique request ID to track this specific request
-        request_id = str(uuid.uuid4())[:8]
-    
-        # Step 1: Send metadata as JSON
         data_payload = {
             "assignment_id": assignment_id,
             "user_id": user_id,
             "submission_text": submission_text,
             "filename": filename or "",
-            "file_size": len(file_content),
-            "request_id": request_id  # Put request_id inside data
+            "file_size": len(file_content)
         }
     
         print(f"[CLIENT GRIDFS] Sending metadata: {data_payload}")
+        print(f"[CLIENT GRIDFS] Sending {len(file_content)} bytes of binary data after metadata")
     
-        # Create a temporary callback to capture the response
-        response_received = {"result": None}
-    
-        def gridfs_response_callback(response):
-            response_received["result"] = response
-            print(f"[CLIENT GRIDFS] Received response for request {request_id}: {response}")
+        # Metadata frame and raw bytes go out back to back; the response is
+        # matched by request_id, so other traffic keeps flowing meanwhile
+        future = self.request("SUBMIT_ASSIGNMENT_GRIDFS", data_payload, payload=file_content)
     
-        # Temporarily set callback to capture this specific response
-        original_callback = self.message_callback
-        self.set_message_callback(gridfs_response_callback)
-     
         try:
-            # Send metadata message
-            send_success = self.send_message("SUBMIT_ASSIGNMENT_GRIDFS", data_payload)
-        
-            if not send_success:
-                print(f"[CLIENT GRIDFS ERROR] Failed to send metadata")
-                return {'type': 'ERROR', 'error': 'Failed to send metadata'}
-        
-            print(f"[CLIENT GRIDFS] Metadata accepted, sending {len(file_content)} bytes of binary data")
+            response = future.result(timeout=timeout)
+            print(f"[CLIENT GRIDFS] Received response: {response}")
+            return response
+        except Exception:
+            future.cancel()
+            print(f"[CLIENT GRIDFS ERROR] No response received within timeout")
+            return {'type': 'ERROR', 'error': 'No response from server'}
+    
+    def view_submissions(self, assignment_id: str, limit: int = None, cursor: str = None) -> bool:
+        """
+        View submissions for an assignment (teacher only).
         
-            # Step 2: Send raw binary data (NO encoding)
-            try:
-                # Send binary data directly
-                self.socket.sendall(file_content)
-                print(f"[CLIENT GRIDFS] Binary data sent successfully")
-            
-                # Wait for response (with timeout)
-                timeout = 10  # 10 seconds timeout
-                start_time = time.time()
-            
-                while response_received["result"] is None and time.time() - start_time < timeout:
-                    time.sleep(0.1)  # Small delay to avoid busy waiting
-            
-                # Restore original callback
-                self.set_message_callback(original_callback)
-            
-                if response_received["result"]:
-                    return response_received["result"]
-                else:
-                    print(f"[CLIENT GRIDFS ERROR] No response received within timeout")
-                    return {'type': 'ERROR', 'error': 'No response from server'}
-                
-            except Exception as e:
-                print(f"[CLIENT GRIDFS ERROR] Failed to send binary data: {e}")
-                # Restore original callback
-                self.set_message_callback(original_callback)
-                return {'type': 'ERROR', 'error': f'Failed to send binary data: {str(e)}'}
-            
-        except Exception as e:
-            print(f"[CLIENT GRIDFS ERROR] General error: {e}")
-            # Restore original callback
-            self.set_message_callback(original_callback)
-            return {'type': 'ERROR', 'error': f'General error: {str(e)}'}
-    
-    def view_submissions(self, assignment_id: str) -> bool:
-        """View submissions for an assignment (teacher only)."""
-        return self.send_message("VIEW_SUBMISSIONS", {
-            "assignment_id": assignment_id
-        })
+        Replies hold one page, newest first; send the reply's `next_cursor`
+        back as `cursor` for the next one (it is None after the last page).
+        """
+        data = {"assignment_id": assignment_id}
+        if limit is not None:
+            data["limit"] = limit
+        if cursor:
+            data["cursor"] = cursor
+        return self.send_message("VIEW_SUBMISSIONS", data)
     
     def get_student_submission(self, assignment_id: str, student_id: str) -> bool:
         """Get a specific student's submission for an assignment."""
@@ -448,42 +697,162 @@ class LearnLiveClient:
             "class_id": class_id
         })
     
-    def upload_file(self, file_path: str, metadata: dict = None) -> bool:
+    def upload_file(self, file_path: str, transfer_id: str = None, file_type: str = None,
+                    progress_callback: Callable = None, timeout: float = 10,
+                    window: int = TRANSFER_WINDOW, chunk_size: int = None, streams: int = 1) -> dict:
         """
-        Upload a file to the server using chunked transfer.
+        Upload a file to the server using the resumable chunked transfer.
+        
+        Chunks the server already has are skipped, so calling this again with
+        the same transfer_id after a disconnect finishes the upload instead of
+        starting over. Each connection keeps up to `window` chunks in flight;
+        with `streams` > 1 extra connections are opened (sharing this
+        client's token) and the chunks are spread over all of them.
         
         Args:
             file_path: Path to file to upload
-            metadata: Optional file metadata
+            transfer_id: Id of an interrupted upload to resume (new one if None)
+            file_type: Optional MIME/type label stored with the transfer
+            progress_callback: Optional progress(chunks_received, total_chunks),
+                called from the upload's worker threads
+            timeout: Seconds to wait for each server reply
+            window: Chunks in flight per connection (the server may lower it)
+            chunk_size: Requested chunk size in bytes (the server may adjust it;
+                a resumed transfer keeps its original size)
+            streams: Connections to spread the upload over (capped by the server)
             
         Returns:
-            bool: True if upload started
+            dict: UPLOAD_COMPLETE_ACK on success, otherwise an ERROR response
+                  whose transfer_id can be passed back in to resume
         """
+        transfer_id = transfer_id or uuid.uuid4().hex
+        extra_clients = []
+        
         try:
             if not os.path.exists(file_path):
-                return False
+                return {"type": "ERROR", "success": False, "error": "File not found"}
             
             file_size = os.path.getsize(file_path)
             file_name = os.path.basename(file_path)
             
-            # Send start transfer message
-            start_data = {
-                "file_name": file_name,
-                "file_size": file_size,
-                "metadata": metadata or {}
+            # Start (or resume) the transfer; the reply lists the missing chunks
+            # and the chunk size and window the server agreed to
+            request = {
+                "transfer_id": transfer_id,
+                "filename": file_name,
+                "filesize": file_size,
+                "file_type": file_type or os.path.splitext(file_name)[1].lstrip('.'),
+                "window": window
             }
+            if chunk_size:
+                request["chunk_size"] = chunk_size
+            start = self.request("START_FILE_TRANSFER", request).result(timeout=timeout)
+            if not start.get('success'):
+                return start
             
-            if not self.send_message("START_FILE_TRANSFER", start_data):
-                return False
+            total_chunks = start['total_chunks']
+            window = start.get('window', window)
+            schedule = _ChunkSchedule(start['missing'], total_chunks)
             
-            # TODO: Wait for server ACK, then send chunks
-            # This will be implemented with proper async handling in GUI
+            # Extra connections for the same transfer; any that fail to connect are skipped
+            for _ in range(min(streams, start.get('max_streams', 1)) - 1):
+                extra = LearnLiveClient()
+                if extra.connect(*self.server_address).get('success'):
+                    extra.token = self.token
+                    extra_clients.append(extra)
             
-            return True
+            errors = []
+            
+            def run_stream(client):
+                try:
+                    self._send_chunks(client, start, file_path, window, schedule, progress_callback, timeout)
+                except Exception as e:
+                    errors.append(e)
+            
+            workers = [threading.Thread(target=run_stream, args=(client,), daemon=True)
+                       for client in [self] + extra_clients]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            
+            # A stream that failed after the others ran dry handed its chunks back
+            if schedule.has_pending():
+                if errors and not self.connected:
+                    raise errors[0]
+                self._send_chunks(self, start, file_path, window, schedule, progress_callback, timeout)
+            
+            return self.request("END_FILE_TRANSFER", {
+                "transfer_id": transfer_id
+            }).result(timeout=timeout)
             
         except Exception as e:
             print(f"Upload error: {e}")
-            return False
+            return {
+                "type": "ERROR",
+                "success": False,
+                "error": f"Upload interrupted: {e}",
+                "transfer_id": transfer_id
+            }
+        finally:
+            for extra in extra_clients:
+                extra.disconnect()
+    
+    def _send_chunks(self, client, transfer, file_path, window, schedule, progress_callback, timeout):
+        """Send scheduled chunks over one connection with up to `window` in flight.
+        
+        `transfer` is the START_FILE_TRANSFER response. Servers that
+        advertise `raw_chunks` get each chunk as raw bytes after a small
+        header frame; older ones get it inside the message (base64 over JSON).
+        """
+        transfer_id = transfer['transfer_id']
+        chunk_size = transfer['chunk_size']
+        total_chunks = transfer['total_chunks']
+        inflight = deque()  # (chunk_number, Future) in send order
+        try:
+            with open(file_path, 'rb') as f:
+                while True:
+                    while len(inflight) < window:
+                        chunk_number = schedule.next_chunk()
+                        if chunk_number is None:
+                            break
+                        f.seek(chunk_number * chunk_size)
+                        chunk = f.read(chunk_size)
+                        header = {"transfer_id": transfer_id, "chunk_number": chunk_number}
+                        
+                        if transfer.get('raw_chunks'):
+                            header["chunk_length"] = len(chunk)
+                            future = client.request("FILE_CHUNK", header, payload=chunk)
+                        else:
+                            # Bytes travel natively on a binary codec, base64 over JSON
+                            if client.codec == CODEC_JSON:
+                                chunk = base64.b64encode(chunk).decode()
+                            header["chunk_data"] = chunk
+                            future = client.request("FILE_CHUNK", header)
+                        inflight.append((chunk_number, future))
+                    
+                    if not inflight:
+                        return
+                    
+                    ack = inflight[0][1].result(timeout=timeout)
+                    if not ack.get('success'):
+                        raise ConnectionError(ack.get('error', 'Chunk rejected'))
+                    inflight.popleft()
+                    chunks_received = schedule.acknowledge(ack)
+                    if progress_callback:
+                        progress_callback(chunks_received, total_chunks)
+        except BaseException:
+            schedule.give_back([chunk_number for chunk_number, _ in inflight])
+            raise
+    
+    def query_transfer(self, transfer_id: str, timeout: float = 10) -> dict:
+        """Ask the server which chunks of an upload are still missing."""
+        try:
+            return self.request("QUERY_TRANSFER", {
+                "transfer_id": transfer_id
+            }).result(timeout=timeout)
+        except Exception as e:
+            return {"type": "ERROR", "success": False, "error": str(e)}
     
     def download_file(self, file_id: str, save_path: str) -> bool:
         """
@@ -518,10 +887,23 @@ class LearnLiveClient:
     # REMOVED duplicate get_notifications method
     
     # NEW: Fixed download_file_binary method
-    def download_file_binary(self, file_id):
+    def download_file_binary(self, file_id, progress_callback: Callable = None, use_cache: bool = True):
         """
         Download a file from the server using the SAME socket connection.
-        The file will be delivered via the message callback as FILE_DOWNLOAD_COMPLETE.
+        The file is streamed into a temp file and delivered via the message
+        callback as FILE_DOWNLOAD_COMPLETE with its `file_path`.
+        
+        With `use_cache`, a HEAD_FILE request checks the download cache
+        first: if the cached copy is current it is delivered straight away
+        without downloading, otherwise the download is stored in the cache.
+        Either way `cached` is True in FILE_DOWNLOAD_COMPLETE, and the file
+        at `file_path` must then be copied rather than moved or deleted.
+        
+        Args:
+            file_id: GridFS file id
+            progress_callback: Optional progress(received_bytes, total_bytes),
+                called from the receive thread after every chunk
+            use_cache: Look in (and add to) the download cache
         
         Returns:
             dict: Initial response with request_id
@@ -530,24 +912,20 @@ class LearnLiveClient:
             # Generate a unique request ID
             request_id = str(uuid.uuid4())[:8]
             
-            # Store that we're expecting a download
-            self.pending_download = request_id
-            
-            # Send the download request using the standard protocol
-            success = self.send_message("DOWNLOAD_FILE", {
-                "file_id": file_id,
-                "request_id": request_id
-            })
-            
-            if not success:
-                self.pending_download = None
+            if use_cache:
+                if self.file_cache is None:
+                    self.file_cache = FileCache()
+                future = self.request("HEAD_FILE", {"file_id": file_id})
+                future.add_done_callback(
+                    lambda done: self._download_after_head(done.result(), file_id, request_id, progress_callback)
+                )
+                print(f"[CLIENT] Checking cache for file_id: {file_id}, request_id: {request_id}")
+            elif not self._start_download(file_id, request_id, progress_callback):
                 return {
                     'success': False, 
                     'error': 'Failed to send download request'
                 }
             
-            print(f"[CLIENT] Download request sent for file_id: {file_id}, request_id: {request_id}")
-            
             return {
                 'success': True,
                 'message': 'Download request sent',
@@ -559,15 +937,102 @@ class LearnLiveClient:
             print(f"[CLIENT DOWNLOAD ERROR] {e}")
             self.pending_download = None
             return {'success': False, 'error': str(e)}
+    
+    def _start_download(self, file_id, request_id, progress_callback, cache_key=None) -> bool:
+        """Send DOWNLOAD_FILE; the receive thread streams the reply into a file"""
+        # Store that we're expecting a download
+        self.pending_download = request_id
+        self.download_progress = progress_callback
+        self.download_cache_key = cache_key
         
-    def upload_material_gridfs(self, class_id, teacher_id, title, material_type, file_content, filename=None):
-        """Upload material with GridFS storage using binary protocol"""
-        import uuid
-        import time
+        # Send the download request using the standard protocol
+        success = self.send_message("DOWNLOAD_FILE", {
+            "file_id": file_id,
+            "request_id": request_id
+        })
+        
+        if not success:
+            self.pending_download = None
+            self.download_progress = None
+            self.download_cache_key = None
+            return False
+        
+        print(f"[CLIENT] Download request sent for file_id: {file_id}, request_id: {request_id}")
+        return True
     
-        # Create a unique request ID
-        request_id = str(uuid.uuid4())[:8]
+    def _download_after_head(self, head, file_id, request_id, progress_callback):
+        """Serve a download from the cache if HEAD_FILE says it is current, else fetch it"""
+        etag = head.get('etag') if head.get('success') else None  # Older servers don't know HEAD_FILE
+        
+        entry = self.file_cache.get(file_id, etag) if etag else None
+        if entry is not None:
+            print(f"[CLIENT] Cache hit for file_id: {file_id} ({entry['size']} bytes)")
+            if self.message_callback:
+                self.message_callback({
+                    "type": "FILE_DOWNLOAD_COMPLETE",
+                    "success": True,
+                    "filename": head.get('filename') or entry['filename'],
+                    "file_path": entry['path'],
+                    "cached": True,
+                    "size": entry['size'],
+                    "content_type": head.get('content_type'),
+                    "request_id": request_id
+                })
+            return
+        
+        cache_key = (file_id, etag) if etag else None
+        if not self._start_download(file_id, request_id, progress_callback, cache_key):
+            if self.message_callback:
+                self.message_callback({
+                    "type": "ERROR",
+                    "error": "Failed to send download request"
+                })
+        
+    def download_range(self, file_id, target, offset: int = 0, length: int = None,
+                       progress_callback: Callable = None) -> Future:
+        """
+        Download part of a file into an open file object.
+        
+        The bytes are written into `target` at `offset` (or at 0 if the
+        server ignores ranges) by the receive thread. Used by DownloadManager;
+        only one download can be pending per connection.
+        
+        Args:
+            file_id: GridFS file id
+            target: File opened for writing in binary mode, seekable
+            offset: First byte wanted
+            length: Number of bytes wanted (to the end of the file if None)
+            progress_callback: Optional progress(received_bytes, range_bytes)
+        
+        Returns:
+            Future: Resolves to the server's final reply, which carries
+            `offset`, `size`, `total_size` and `sha256` (or an ERROR dict)
+        """
+        if self.pending_download is not None:
+            future = Future()
+            future.set_result({'type': 'ERROR', 'success': False, 'error': 'Another download is in progress'})
+            return future
+        
+        self.pending_download = uuid.uuid4().hex
+        self.download_target = target
+        self.download_progress = progress_callback
+        
+        request = {"file_id": file_id, "offset": offset}
+        if length is not None:
+            request["length"] = length
+        future = self.request("DOWNLOAD_FILE", request)
+        
+        def clear_pending(_):
+            # Errors arrive without a metadata frame, so nothing else resets this
+            if self.download_target is target:
+                self.pending_download = None
+                self.download_target = None
+                self.download_progress = None
+        future.add_done_callback(clear_pending)
+        return future
     
+    def upload_material_gridfs(self, class_id, teacher_id, title, material_type, file_content, filename=None, timeout=10):
+        """Upload material with GridFS storage using binary protocol"""
         # Get filename from path if not provided
         if filename is None:
             filename = "material.bin"
@@ -580,60 +1045,146 @@ class LearnLiveClient:
             "teacher_id": teacher_id,
             "title": title,
             "material_type": material_type,
-           "filename": filename,
-           "file_size": len(file_content),
-            "request_id": request_id,
-            "user_role": "teacher"  # Add user role for server validation
+            "filename": filename,
+            "file_size": len(file_content)
         }
     
-        # Create a temporary callback to capture the response
-        response_received = {"result": None}
+        future = self.request("UPLOAD_MATERIAL_GRIDFS", data_payload, payload=file_content)
     
-        def material_response_callback(response):
-            response_received["result"] = response
-            print(f"[CLIENT MATERIAL] Received response for request {request_id}: {response}")
+        try:
+            response = future.result(timeout=timeout)
+            print(f"[CLIENT MATERIAL] Received response: {response}")
+            return response
+        except Exception:
+            future.cancel()
+            print(f"[CLIENT MATERIAL ERROR] No response received within timeout")
+            return {'type': 'ERROR', 'error': 'No response from server'}
+
+
+class DownloadManager:
+    """
+    Resumable, checksum-verified downloads over a LearnLiveClient.
     
-        # Temporarily set callback
-        original_callback = self.message_callback
-        self.set_message_callback(material_response_callback)
+    Bytes are written to `<dest>.part`, and the file's id, size and
+    SHA-256 are kept in `<dest>.part.json`. An interrupted download, even
+    one from an earlier run, continues from the end of the .part file.
+    Dropped connections are re-established with the client's token and
+    retried. The finished file is checked against the server's checksum
+    before it is renamed into place.
+    """
     
-        try:
-            # Send metadata message
-            send_success = self.send_message("UPLOAD_MATERIAL_GRIDFS", data_payload)
-         
-            if not send_success:
-                print(f"[CLIENT MATERIAL ERROR] Failed to send metadata")
-                return {'type': 'ERROR', 'error': 'Failed to send metadata'}
+    def __init__(self, client: LearnLiveClient, retries: int = 3, timeout: float = 60):
+        self.client = client
+        self.retries = retries
+        self.timeout = timeout  # Seconds without any progress before a request is abandoned
+    
+    def download(self, file_id: str, dest_path: str, progress_callback: Callable = None) -> dict:
+        """
+        Download (or finish downloading) a file. Blocks; call it from a worker thread.
         
-            print(f"[CLIENT MATERIAL] Metadata accepted, sending {len(file_content)} bytes of binary data")
+        Args:
+            file_id: GridFS file id
+            dest_path: Where the finished file is written
+            progress_callback: Optional progress(bytes_on_disk, total_bytes)
         
-            # Send raw binary data
+        Returns:
+            dict: success with `file_path`, `size` and `sha256`, or an error;
+                  after an error the partial file stays for the next attempt
+        """
+        attempt = 0
+        while True:
             try:
-                self.socket.sendall(file_content)
-                print(f"[CLIENT MATERIAL] Binary data sent successfully")
-            
-                # Wait for response
-                timeout = 10
-                start_time = time.time()
-            
-                while response_received["result"] is None and time.time() - start_time < timeout:
-                   time.sleep(0.1)
-            
-                # Restore original callback
-                self.set_message_callback(original_callback)
-            
-                if response_received["result"]:
-                    return response_received["result"]
-                else:
-                    print(f"[CLIENT MATERIAL ERROR] No response received within timeout")
-                    return {'type': 'ERROR', 'error': 'No response from server'}
-                
+                receiving = self.client.receive_thread is not None and self.client.receive_thread.is_alive()
+                if not (self.client.connected and receiving):
+                    self.client.disconnect()
+                    reconnected = self.client.connect(*self.client.server_address)
+                    if not reconnected.get('success'):
+                        raise ConnectionError(reconnected.get('error'))
+                return self._download_once(file_id, dest_path, progress_callback)
             except Exception as e:
-                print(f"[CLIENT MATERIAL ERROR] Failed to send binary data: {e}")
-                self.set_message_callback(original_callback)
-                return {'type': 'ERROR', 'error': f'Failed to send binary data: {str(e)}'}
+                attempt += 1
+                if attempt > self.retries:
+                    return {'success': False, 'error': f'Download interrupted: {e}', 'partial': dest_path + '.part'}
+                print(f"[DOWNLOAD MANAGER] Attempt {attempt} failed ({e}), resuming")
+                time.sleep(min(attempt, 5))
+    
+    def discard(self, dest_path: str):
+        """Delete a partial download"""
+        for path in self._partial_paths(dest_path):
+            if os.path.exists(path):
+                os.remove(path)
+    
+    def _partial_paths(self, dest_path):
+        return dest_path + '.part', dest_path + '.part.json'
+    
+    def _request(self, file_id, target, offset, length=None, progress_callback=None):
+        """Run one range request; raises ConnectionError if the server refuses it"""
+        last_progress = [time.monotonic()]
+        
+        def progress(received, size):
+            last_progress[0] = time.monotonic()
+            if progress_callback:
+                progress_callback(received, size)
+        
+        future = self.client.download_range(file_id, target, offset, length, progress)
+        while True:
+            try:
+                reply = future.result(timeout=1)
+                break
+            except FutureTimeoutError:
+                if time.monotonic() - last_progress[0] > self.timeout:
+                    # Stalled mid-stream: drop the connection so nothing more is written
+                    self.client.disconnect()
+                    raise TimeoutError(f'No progress for {self.timeout} seconds')
+        if not reply.get('success'):
+            raise ConnectionError(reply.get('error', 'Download failed'))
+        return reply
+    
+    def _download_once(self, file_id, dest_path, progress_callback):
+        part_path, state_path = self._partial_paths(dest_path)
+        mode = 'r+b' if os.path.exists(part_path) else 'w+b'
+        
+        with open(part_path, mode) as target:
+            # An empty range returns the file's size and checksum up front
+            info = self._request(file_id, target, 0, length=0)
+            total_size = info.get('total_size', info['size'])
+            state = {'file_id': file_id, 'total_size': total_size, 'sha256': info.get('sha256')}
             
-        except Exception as e:
-            print(f"[CLIENT MATERIAL ERROR] General error: {e}")
-            self.set_message_callback(original_callback)
-            return {'type': 'ERROR', 'error': f'General error: {str(e)}'}
\ No newline at end of file
+            # Keep what is on disk only if it belongs to this exact file
+            saved = None
+            if os.path.exists(state_path):
+                with open(state_path, 'r') as f:
+                    saved = json.load(f)
+            if saved != state or os.fstat(target.fileno()).st_size > total_size:
+                target.truncate(0)
+            with open(state_path, 'w') as f:
+                json.dump(state, f)
+            
+            offset = os.fstat(target.fileno()).st_size
+            if offset < total_size:
+                print(f"[DOWNLOAD MANAGER] Fetching {total_size - offset} bytes of {file_id} from offset {offset}")
+                progress = None
+                if progress_callback:
+                    progress = lambda received, _: progress_callback(offset + received, total_size)
+                self._request(file_id, target, offset, progress_callback=progress)
+                target.flush()
+        
+        if not self._verify(part_path, state):
+            self.discard(dest_path)
+            raise ConnectionError('Checksum mismatch, starting over')
+        
+        os.replace(part_path, dest_path)
+        os.remove(state_path)
+        return {'success': True, 'file_path': dest_path, 'size': total_size, 'sha256': state['sha256']}
+    
+    def _verify(self, part_path, state):
+        """Check a finished .part file's size and (when known) SHA-256"""
+        if os.path.getsize(part_path) != state['total_size']:
+            return False
+        if not state['sha256']:
+            return True  # Uploaded before checksums were recorded
+        digest = hashlib.sha256()
+        with open(part_path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        return digest.hexdigest() == state['sha256']
@@ -9,12 +9,25 @@ load_dotenv()
 SERVER_HOST = '0.0.0.0'  # Listen on all interfaces (for LAN)
 SERVER_PORT = 8888
 BUFFER_SIZE = 4096
+FRAME_BUFFER_LIMIT = 1024 * 1024  # Largest frame buffer a connection keeps for reuse
+MAX_FRAME_SIZE = 128 * 1024 * 1024  # Largest frame accepted; fits a hex-encoded MAX_FILE_SIZE inline upload
 MAX_CLIENTS = 50
 
+# Asyncio engine (python -m server.app --engine asyncio)
+ASYNC_BACKLOG = 1024  # Listen backlog for the event loop server
+
 # MongoDB Configuration
 MONGODB_URI = os.getenv('MONGODB_URI', 'mongodb://localhost:27017/')
 DATABASE_NAME = 'learnlive_db'
 
+# MongoDB connection pool (one MongoClient per URI, shared by the whole process)
+MONGO_MAX_POOL_SIZE = 50  # Connections per server; above DISPATCH_WORKERS so handlers rarely wait
+MONGO_MIN_POOL_SIZE = 0  # Connections kept open while idle
+MONGO_WAIT_QUEUE_TIMEOUT_MS = 10000  # Longest wait for a free connection before the query fails
+MONGO_CONNECT_TIMEOUT_MS = 5000
+MONGO_SERVER_SELECTION_TIMEOUT_MS = 10000  # How long a query waits for MongoDB to become reachable
+MONGO_SOCKET_TIMEOUT_MS = None  # None never times out a reply (GridFS streams can be slow)
+
 # Collections
 USERS_COLLECTION = 'users'
 CLASSES_COLLECTION = 'classes'
@@ -24,6 +37,13 @@ ANNOUNCEMENTS_COLLECTION = 'announcements'
 COMMENTS_COLLECTION = 'comments'
 MATERIALS_COLLECTION = 'materials'
 
+# Listings (pages of VIEW_SUBMISSIONS / GET_TEACHER_SUBMISSIONS, newest first)
+LIST_PAGE_SIZE = 100  # Items per page when the client doesn't ask for a size
+LIST_MAX_PAGE_SIZE = 500  # Largest page a client may ask for
+
+# Assignment -> class cache (class lookups of GridFS submissions)
+ASSIGNMENT_CLASS_CACHE_SIZE = 5000  # Assignments kept in memory (LRU)
+
 # Email Configuration (Gmail SMTP)
 SMTP_SERVER = 'smtp.gmail.com'
 SMTP_PORT = 587
@@ -33,10 +53,30 @@ SMTP_PASSWORD = os.getenv('SMTP_APP_PASSWORD', 'your-app-password')
 # File Upload Configuration
 UPLOAD_FOLDER = 'uploads'
 MAX_FILE_SIZE = 50 * 1024 * 1024  # 50 MB
+GRIDFS_STREAM_CHUNK = 255 * 1024  # Bytes read from the socket per GridFS write (GridFS chunk size)
+GRIDFS_COMPRESSION = True  # Store compressible uploads compressed in GridFS (zstd if installed, else zlib)
+GRIDFS_COMPRESSION_MIN_SAVING = 0.1  # Store raw unless compressing the first block saves this fraction
+TRANSFER_CHUNK_SIZE = 8192  # Default (and smallest) chunk size for START_FILE_TRANSFER uploads
+TRANSFER_WINDOW = 8  # Chunks a client keeps in flight during a chunked upload
+TRANSFER_MAX_CHUNK_SIZE = 512 * 1024  # Largest chunk a client may negotiate (base64 frames stay under FRAME_BUFFER_LIMIT)
+TRANSFER_MAX_WINDOW = 32  # Largest window a client may negotiate (matches PIPELINE_MAX_INFLIGHT)
+TRANSFER_MAX_STREAMS = 4  # Connections one upload may be spread over
+TRANSFER_SACK_BLOCKS = 4  # Received ranges reported past the cumulative ACK in each CHUNK_ACK
+TRANSFER_IDLE_TIMEOUT = 300  # Seconds before an idle transfer's file handle is closed
+TRANSFER_RETENTION = 86400  # Seconds an unfinished transfer can be resumed before it is deleted
+TRANSFER_REAP_INTERVAL = 60  # Seconds between sweeps for idle and abandoned transfers
+TRANSFER_QUARANTINE = False  # Move abandoned partial uploads to uploads/.quarantine instead of deleting them
+TRANSFER_USER_QUOTA = 200 * 1024 * 1024  # Bytes of unfinished uploads one user may hold at once
+UPLOAD_QUOTA = 2 * 1024 * 1024 * 1024  # Bytes under UPLOAD_FOLDER for everyone (stored + in progress)
 ALLOWED_EXTENSIONS = {'pdf', 'doc', 'docx', 'ppt', 'pptx', 'txt', 'jpg', 'jpeg', 'png', 'zip'}
 
+# Client download cache (materials reopened without downloading them again)
+CLIENT_CACHE_DIR = os.getenv('LEARNLIVE_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.learnlive', 'cache'))
+CLIENT_CACHE_MAX_BYTES = 500 * 1024 * 1024  # Least recently used files are evicted past this
+
 # Security
 TOKEN_EXPIRY = 86400  # 24 hours in seconds
+SESSION_CACHE_SIZE = 10000  # Verified tokens kept in memory (LRU)
 SECRET_KEY = os.getenv('SECRET_KEY', 'your-secret-key-change-in-production')
 
 # Protocol Message Types
@@ -56,9 +96,11 @@ MSG_POST_COMMENT = 'POST_COMMENT'
 MSG_VIEW_COMMENTS = 'VIEW_COMMENTS'
 MSG_UPLOAD_FILE = 'UPLOAD_FILE'
 MSG_DOWNLOAD_FILE = 'DOWNLOAD_FILE'
+MSG_HEAD_FILE = 'HEAD_FILE'
 MSG_START_FILE_TRANSFER = 'START_FILE_TRANSFER'
 MSG_FILE_CHUNK = 'FILE_CHUNK'
 MSG_END_FILE_TRANSFER = 'END_FILE_TRANSFER'
+MSG_QUERY_TRANSFER = 'QUERY_TRANSFER'
 MSG_CHUNK_ACK = 'CHUNK_ACK'
 MSG_UPLOAD_COMPLETE_ACK = 'UPLOAD_COMPLETE_ACK'
 MSG_REMOVE_STUDENT = 'REMOVE_STUDENT'
@@ -74,8 +116,37 @@ MSG_GET_MESSAGES = 'GET_MESSAGES'
 MSG_MESSAGE_NOTIFICATION = 'MESSAGE_NOTIFICATION'
 MSG_SUBMIT_ASSIGNMENT_GRIDFS = "SUBMIT_ASSIGNMENT_GRIDFS"
 MSG_UPLOAD_MATERIAL_GRIDFS = "UPLOAD_MATERIAL_GRIDFS"
+MSG_GET_METRICS = 'GET_METRICS'
+MSG_HELLO = 'HELLO'
 
 # Response Types
 RESP_SUCCESS = 'SUCCESS'
 RESP_ERROR = 'ERROR'
 RESP_NOTIFICATION = 'NOTIFICATION'
+
+# Wire codecs (agreed per connection with HELLO; JSON until then)
+CODEC_JSON = 'json'
+CODEC_MSGPACK = 'msgpack'
+PREFERRED_CODECS = [CODEC_MSGPACK, CODEC_JSON]  # Most preferred first
+
+# Frame compression (also agreed with HELLO; off until then)
+COMPRESSION_ZLIB = 'zlib'
+COMPRESSION_ZSTD = 'zstd'
+PREFERRED_COMPRESSIONS = [COMPRESSION_ZSTD, COMPRESSION_ZLIB]  # Most preferred first
+COMPRESSION_THRESHOLD = 8 * 1024  # Frames smaller than this are sent as is
+
+# Error codes
+ERR_BUSY = 'BUSY'
+ERR_NOT_FOUND = 'NOT_FOUND'
+ERR_BAD_REQUEST = 'BAD_REQUEST'
+
+# Request Dispatcher (bounded worker pool used by both server engines)
+DISPATCH_WORKERS = 16  # Threads running message handlers
+DISPATCH_QUEUE_SIZE = 256  # Requests waiting for a worker before BUSY is returned
+DISPATCH_RETRY_AFTER = 1.0  # Seconds suggested to clients in BUSY errors
+PIPELINE_MAX_INFLIGHT = 32  # Pipelined requests per connection before reading pauses
+DISPATCH_TYPE_LIMITS = {  # Max concurrent requests per message type
+    MSG_SUBMIT_ASSIGNMENT_GRIDFS: 4,
+    MSG_UPLOAD_MATERIAL_GRIDFS: 4,
+    MSG_GET_TEACHER_SUBMISSIONS: 4,
+}
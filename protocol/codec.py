@@ -0,0 +1,248 @@
+# Frame Codecs for LearnLive
+#
+# Every frame is a 4-byte big-endian length followed by an encoded message.
+# Connections start out in JSON; a HELLO exchange lets client and server
+# switch to MessagePack, which carries bytes and datetimes natively (no hex
+# strings for file data). JSON stays the fallback when msgpack is missing
+# on either side.
+#
+# HELLO can also turn on compression. Frames of at least
+# COMPRESSION_THRESHOLD bytes are then compressed with the agreed algorithm
+# and flagged by the top bit of the length prefix. Ratio and CPU time are
+# tallied per message type in COMPRESSION_STATS.
+
+import json
+import threading
+import time
+import zlib
+import sys
+import os
+from datetime import datetime, timezone
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.config import (
+    CODEC_JSON, CODEC_MSGPACK, PREFERRED_CODECS,
+    COMPRESSION_ZLIB, COMPRESSION_ZSTD, PREFERRED_COMPRESSIONS, COMPRESSION_THRESHOLD,
+    MAX_FRAME_SIZE
+)
+
+try:
+    import msgpack
+except ImportError:  # Optional dependency
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # Optional dependency
+    zstandard = None
+
+# Set in the length prefix of a compressed frame (frames stay below 2 GB)
+COMPRESSED_FLAG = 0x80000000
+
+
+class CodecError(ValueError):
+    """A message could not be encoded or decoded with the given codec"""
+
+
+class FrameTooLarge(CodecError):
+    """A peer announced (or decompressed to) a frame longer than MAX_FRAME_SIZE"""
+
+
+def available_codecs():
+    """Codecs usable in this process, most preferred first"""
+    return [
+        codec for codec in PREFERRED_CODECS
+        if codec == CODEC_JSON or (codec == CODEC_MSGPACK and msgpack is not None)
+    ]
+
+
+def choose_codec(offered):
+    """Pick the first codec from the peer's list that we also support"""
+    supported = available_codecs()
+    for codec in offered or []:
+        if codec in supported:
+            return codec
+    return CODEC_JSON
+
+
+def encode(message, codec=CODEC_JSON):
+    """Serialize a message for the wire"""
+    try:
+        if codec == CODEC_MSGPACK:
+            return msgpack.packb(message, use_bin_type=True, datetime=True, default=_msgpack_default)
+        return json.dumps(message).encode()
+    except (TypeError, ValueError, OverflowError) as e:
+        raise CodecError(f'Cannot encode message as {codec}: {e}') from e
+
+
+def decode(data, codec=CODEC_JSON):
+    """Parse a received frame payload"""
+    try:
+        if codec == CODEC_MSGPACK:
+            # timestamp=3 -> timezone-aware UTC datetimes
+            return msgpack.unpackb(data, raw=False, timestamp=3)
+        return json.loads(str(data, 'utf-8'))  # bytes or a memoryview
+    except Exception as e:
+        raise CodecError(f'Invalid {codec} frame: {e}') from e
+
+
+def available_compressions():
+    """Compression algorithms usable in this process, most preferred first"""
+    return [
+        name for name in PREFERRED_COMPRESSIONS
+        if name == COMPRESSION_ZLIB or (name == COMPRESSION_ZSTD and zstandard is not None)
+    ]
+
+
+def choose_compression(offered):
+    """Pick the first algorithm from the peer's list that we also support"""
+    supported = available_compressions()
+    for name in offered or []:
+        if name in supported:
+            return name
+    return None
+
+
+def compress(payload, compression):
+    """Compress a frame payload"""
+    if compression == COMPRESSION_ZSTD:
+        return zstandard.ZstdCompressor().compress(payload)
+    return zlib.compress(payload)
+
+
+def decompress(payload, compression, max_size=MAX_FRAME_SIZE):
+    """Reverse compress(), raising FrameTooLarge past `max_size` output bytes.
+
+    The output is capped while decompressing, so a small frame can't
+    expand into gigabytes before it is rejected.
+    """
+    if compression == COMPRESSION_ZSTD:
+        # A declared content size is allocated up front, so check it first
+        if zstandard.frame_content_size(payload) > max_size:
+            raise FrameTooLarge(f'Frame decompresses to more than {max_size} bytes')
+        return zstandard.ZstdDecompressor().decompress(payload, max_output_size=max_size)
+
+    decompressor = zlib.decompressobj()
+    data = decompressor.decompress(payload, max_size)
+    if decompressor.unconsumed_tail:
+        raise FrameTooLarge(f'Frame decompresses to more than {max_size} bytes')
+    if not decompressor.eof:
+        raise zlib.error('incomplete or truncated stream')
+    return data
+
+
+def frame(payload, compression=None, label=None):
+    """Prefix an encoded payload with its 4-byte big-endian length.
+
+    With `compression` set, payloads of at least COMPRESSION_THRESHOLD
+    bytes are compressed (and flagged) when that makes them smaller.
+    `label` is the message type the stats are recorded under.
+    """
+    header = 0
+    if compression and len(payload) >= COMPRESSION_THRESHOLD:
+        started = time.perf_counter()
+        packed = compress(payload, compression)
+        COMPRESSION_STATS.record_compress(label, len(payload), len(packed), time.perf_counter() - started)
+        if len(packed) < len(payload):
+            payload = packed
+            header = COMPRESSED_FLAG
+    return (header | len(payload)).to_bytes(4, byteorder='big') + payload
+
+
+def parse_header(header):
+    """Split a 4-byte length prefix into (length, compressed)"""
+    value = int.from_bytes(header, byteorder='big')
+    return value & ~COMPRESSED_FLAG, bool(value & COMPRESSED_FLAG)
+
+
+def check_frame_length(length):
+    """Raise FrameTooLarge before buffering a frame longer than MAX_FRAME_SIZE"""
+    if length > MAX_FRAME_SIZE:
+        raise FrameTooLarge(f'Frame of {length} bytes exceeds the {MAX_FRAME_SIZE} byte limit')
+
+
+def encode_frame(message, codec=CODEC_JSON, compression=None, label=None):
+    """Encode a message and add the length prefix"""
+    if label is None and isinstance(message, dict):
+        label = message.get('type')
+    return frame(encode(message, codec), compression, label)
+
+
+def decode_frame(payload, compressed=False, codec=CODEC_JSON, compression=None):
+    """Decompress (if flagged) and decode a received frame payload"""
+    if not compressed:
+        return decode(payload, codec)
+    if not compression:
+        raise CodecError('Compressed frame on a connection without compression')
+
+    started = time.perf_counter()
+    try:
+        payload = decompress(payload, compression, MAX_FRAME_SIZE)
+    except FrameTooLarge:
+        raise
+    except Exception as e:
+        raise CodecError(f'Invalid {compression} frame: {e}') from e
+    elapsed = time.perf_counter() - started
+
+    message = decode(payload, codec)
+    label = message.get('type') if isinstance(message, dict) else None
+    COMPRESSION_STATS.record_decompress(label, elapsed)
+    return message
+
+
+class CompressionStats:
+    def __init__(self):
+        """Initialize empty per-message-type tallies"""
+        self.lock = threading.Lock()
+        self.by_type = {}  # label -> totals
+
+    def _totals(self, label):
+        return self.by_type.setdefault(label or 'unknown', {
+            'frames': 0,
+            'raw_bytes': 0,
+            'compressed_bytes': 0,
+            'compress_seconds': 0.0,
+            'decompressed_frames': 0,
+            'decompress_seconds': 0.0
+        })
+
+    def record_compress(self, label, raw_size, compressed_size, seconds):
+        """Tally one compression attempt"""
+        with self.lock:
+            totals = self._totals(label)
+            totals['frames'] += 1
+            totals['raw_bytes'] += raw_size
+            totals['compressed_bytes'] += compressed_size
+            totals['compress_seconds'] += seconds
+
+    def record_decompress(self, label, seconds):
+        """Tally one decompressed frame"""
+        with self.lock:
+            totals = self._totals(label)
+            totals['decompressed_frames'] += 1
+            totals['decompress_seconds'] += seconds
+
+    def snapshot(self):
+        """Per-type totals with the compression ratio (raw / compressed)"""
+        with self.lock:
+            result = {}
+            for label, totals in self.by_type.items():
+                entry = dict(totals)
+                entry['ratio'] = round(totals['raw_bytes'] / totals['compressed_bytes'], 2) if totals['compressed_bytes'] else None
+                entry['compress_seconds'] = round(totals['compress_seconds'], 6)
+                entry['decompress_seconds'] = round(totals['decompress_seconds'], 6)
+                result[label] = entry
+            return result
+
+
+COMPRESSION_STATS = CompressionStats()
+
+
+def _msgpack_default(obj):
+    """Pack values msgpack has no native type for"""
+    if isinstance(obj, datetime):
+        # MongoDB returns naive datetimes in UTC
+        return msgpack.Timestamp.from_datetime(obj.replace(tzinfo=timezone.utc))
+    if isinstance(obj, bytearray):
+        return bytes(obj)
+    raise TypeError(f'Object of type {type(obj).__name__} is not serializable')
@@ -0,0 +1,114 @@
+# Socket Framing Helpers for LearnLive
+#
+# Frames and raw payloads are read with `recv_into` straight into
+# preallocated buffers instead of growing a bytes object chunk by chunk
+# (which copies the whole payload on every read). FrameReader reuses one
+# buffer per connection and hands out memoryview slices; PayloadStream
+# exposes the raw bytes that follow a GridFS upload frame as a file-like
+# object so they can be streamed into GridFS without being held in memory.
+
+import io
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.config import BUFFER_SIZE, FRAME_BUFFER_LIMIT
+from protocol.codec import check_frame_length, parse_header
+
+
+def recv_exact_into(sock, view):
+    """Fill `view` from the socket. Returns the byte count, short only at EOF."""
+    received = 0
+    size = len(view)
+    while received < size:
+        count = sock.recv_into(view[received:], size - received)
+        if not count:
+            break
+        received += count
+    return received
+
+
+class FrameReader:
+    def __init__(self, sock, initial_size=BUFFER_SIZE):
+        """Read length-prefixed frames from `sock` into a reusable buffer"""
+        self.sock = sock
+        self.header = bytearray(4)
+        self.buffer = bytearray(initial_size)
+
+    def read_frame(self):
+        """Return (payload, compressed), or None once the peer has closed.
+
+        `payload` is a memoryview into the connection's buffer and is only
+        valid until the next call; decode it (or copy it) before reading on.
+        Raises FrameTooLarge, before allocating anything, if the header
+        announces more than MAX_FRAME_SIZE bytes.
+        """
+        if recv_exact_into(self.sock, memoryview(self.header)) < 4:
+            return None
+        length, compressed = parse_header(self.header)
+        check_frame_length(length)
+
+        if length <= len(self.buffer):
+            buffer = self.buffer
+        else:
+            buffer = bytearray(length)
+            if length <= FRAME_BUFFER_LIMIT:
+                self.buffer = buffer  # Keep it; oversized frames get a one-off buffer
+
+        payload = memoryview(buffer)[:length]
+        if recv_exact_into(self.sock, payload) < length:
+            return None
+        return payload, compressed
+
+
+class PayloadStream(io.RawIOBase):
+    """Read-only file object over the next `size` raw bytes on a socket.
+
+    Reads return as many bytes as requested until the payload is used up
+    (GridFS treats a short read as end of file). If the peer closes early a
+    ConnectionError is raised, so a half-written upload is never mistaken
+    for a complete one. Call drain() when done so unread bytes never end
+    up parsed as the next frame.
+    """
+
+    def __init__(self, sock, size):
+        super().__init__()
+        self.sock = sock
+        self.size = size
+        self.received = 0
+        self.eof = False  # Peer closed before the whole payload arrived
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        view = memoryview(buffer).cast('B')
+        wanted = min(len(view), self.size - self.received)
+        if wanted <= 0 or self.eof:
+            return 0
+        count = recv_exact_into(self.sock, view[:wanted])
+        self.received += count
+        if count < wanted:
+            self.eof = True
+            raise ConnectionError(f'Connection closed after {self.received} of {self.size} payload bytes')
+        return count
+
+    def read_all(self):
+        """Read the rest of the payload into one preallocated bytearray"""
+        data = bytearray(self.size - self.received)
+        self.readinto(data)
+        return data
+
+    def drain(self):
+        """Read and drop whatever is left of the payload (stops quietly at EOF)"""
+        scratch = bytearray(min(BUFFER_SIZE * 16, max(self.size - self.received, 0)))
+        try:
+            while self.readinto(scratch):
+                pass
+        except ConnectionError:
+            pass
+
+    @property
+    def complete(self):
+        """True once every announced byte has been received"""
+        return self.received == self.size
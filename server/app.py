@@ -2,7 +2,6 @@
 
 import socket
 import threading
-import json
 import sys
 import os
 
@@ -14,6 +13,34 @@ from server.database import Database
 from server.file_handler import FileHandler
 from server.notification import NotificationHandler
 from server.discussion_handler import DiscussionHandler
+from server.dispatcher import RequestDispatcher
+from server.metrics import METRICS
+from server.mongo import close_clients
+from server.registry import HandlerRegistry, message_handler
+from server.connection import ClientConnection
+from protocol.codec import (
+    COMPRESSION_STATS, CodecError, FrameTooLarge, available_codecs, available_compressions,
+    choose_codec, choose_compression, decode_frame, encode_frame
+)
+from protocol.framing import FrameReader, PayloadStream
+
+# Messages followed on the wire by `data.file_size` raw bytes
+RAW_PAYLOAD_MESSAGES = {MSG_SUBMIT_ASSIGNMENT_GRIDFS, MSG_UPLOAD_MATERIAL_GRIDFS}
+
+# Messages followed by `data.chunk_length` raw bytes that the connection's
+# reader collects before dispatch (into `data.chunk_data`), so they can
+# still be pipelined
+INLINE_PAYLOAD_MESSAGES = {MSG_FILE_CHUNK}
+
+# I/O steps of a frame, performed by whichever engine reads it (see frame_steps)
+STEP_SEND = 'send'
+STEP_READ = 'read'
+STEP_DISCARD = 'discard'
+STEP_ACQUIRE = 'acquire'
+STEP_RELEASE = 'release'
+STEP_PIPELINE = 'pipeline'
+STEP_WAIT = 'wait'
+STEP_CLOSE = 'close'
 
 
 class LearnLiveServer:
@@ -26,9 +53,12 @@ class LearnLiveServer:
         self.db = Database()
         self.file_handler = FileHandler()
         self.notifier = NotificationHandler(self.db)  # Pass database reference
-        # Discussion handler: use its own DiscussionDB implementation
-        # (passing the general Database instance caused missing `send_message` errors)
+        # Discussion handler: its own DiscussionDB, on the same shared MongoClient
         self.discussion = DiscussionHandler()
+        self.dispatcher = RequestDispatcher()
+        self.handlers = HandlerRegistry()
+        self.handlers.collect(self)
+        METRICS.register_gauge('compression', COMPRESSION_STATS.snapshot)
         self.running = False
         
         print(f"🎓 LearnLive Server Initializing...")
@@ -61,7 +91,7 @@ class LearnLiveServer:
                     # Handle client in a new thread
                     client_thread = threading.Thread(
                         target=self.handle_client,
-                        args=(client_socket, address)
+                        args=(ClientConnection(client_socket), address)
                     )
                     client_thread.daemon = True
                     client_thread.start()
@@ -75,290 +105,423 @@ class LearnLiveServer:
         finally:
             self.stop()
     
+    def new_session(self):
+        """Create the per-connection state tracked across messages"""
+        return {
+            'token': None,
+            'user_id': None,
+            'auth': None,
+            'inflight': threading.BoundedSemaphore(PIPELINE_MAX_INFLIGHT)
+        }
+    
     def handle_client(self, client_socket, address):
         """Handle individual client connection"""
-        current_token = None
-        current_user_id = None
+        session = self.new_session()
+        reader = FrameReader(client_socket)
         
         try:
             while self.running:
-                # Receive message length (4 bytes)
-                length_data = b''
-                while len(length_data) < 4:
-                    chunk = client_socket.recv(4 - len(length_data))
-                    if not chunk:
-                        print(f"🔌 Client {address} disconnected")
-                        return
-                    length_data += chunk
-                
-                message_length = int.from_bytes(length_data, byteorder='big')
-                
-                # Receive the full message
-                data = b''
-                while len(data) < message_length:
-                    chunk = client_socket.recv(min(BUFFER_SIZE, message_length - len(data)))
-                    if not chunk:
-                        print(f"🔌 Client {address} disconnected")
-                        return
-                    data += chunk
-                
-                print(f"\n📨 TCP SEGMENT RECEIVED")
-                print(f"   From: {address[0]}:{address[1]}")
-                print(f"   Size: {len(data)} bytes")
-                print(f"   Protocol: TCP (Reliable, Ordered)")
-                
-                # Parse message
+                # Receive the next length-prefixed message
                 try:
-                    message = json.loads(data.decode())
-                    msg_type = message.get('type')
-                    
-                    print(f"   Message Type: {msg_type}")
-                    
-                    # Handle message based on type
-                    response = self.process_message(message, client_socket, address)
-                    
-                    # DEBUG: Print response (excluding large file data)
-                    response_summary = response.copy()
-                    
-                    # Suppress file_data in direct response
-                    if 'file_data' in response_summary:
-                        response_summary['file_data'] = f"<{len(response['file_data'])} bytes>"
-                    
-                    # Suppress file_data in submission object
-                    if 'submission' in response_summary and isinstance(response_summary['submission'], dict):
-                        if 'file_data' in response_summary['submission']:
-                            response_summary['submission'] = response_summary['submission'].copy()
-                            response_summary['submission']['file_data'] = f"<{len(response['submission']['file_data'])} bytes>"
-                    
-                    # Suppress file_data in submissions array
-                    if 'submissions' in response_summary and isinstance(response_summary['submissions'], list):
-                        cleaned_submissions = []
-                        for sub in response_summary['submissions']:
-                            if isinstance(sub, dict) and 'file_data' in sub:
-                                cleaned_sub = sub.copy()
-                                cleaned_sub['file_data'] = f"<{len(sub['file_data'])} bytes>"
-                                cleaned_submissions.append(cleaned_sub)
-                            else:
-                                cleaned_submissions.append(sub)
-                        response_summary['submissions'] = cleaned_submissions
-                    
-                    print(f"   📤 Response: {response_summary}")
-                    
-                    # Track token for cleanup
-                    if msg_type in [MSG_LOGIN, MSG_SIGNUP] and response.get('success'):
-                        current_token = response.get('token')
-                        current_user_id = response.get('user_id')
-                        self.clients[current_token] = (client_socket, response)
-                        
-                        # Register client with notification system
-                        user_id = response.get('user_id')
-                        user_data = {
-                            'name': response.get('name'),
-                            'email': response.get('email'),
-                            'role': response.get('role')
-                        }
-                        self.notifier.register_client(user_id, client_socket, user_data)
-                        print(f"📲 Client registered for notifications: {user_data.get('name')} ({user_id})")
-                    
-                    # Send response with length prefix
-                    try:
-                        response_data = json.dumps(response).encode()
-                        message_length = len(response_data)
-                        length_prefix = message_length.to_bytes(4, byteorder='big')
-                        client_socket.sendall(length_prefix + response_data)
-                        
-                        print(f"   ✅ Response sent ({len(response_data)} bytes)\n")
-                    except (TypeError, ValueError) as e:
-                        # JSON serialization failed (e.g., datetime objects)
-                        print(f"   ❌ JSON serialization error: {e}")
-                        error_response = {
-                            'type': RESP_ERROR,
-                            'error': 'Server serialization error'
-                        }
-                        error_data = json.dumps(error_response).encode()
-                        error_length = len(error_data)
-                        length_prefix = error_length.to_bytes(4, byteorder='big')
-                        client_socket.sendall(length_prefix + error_data)
-                        print(f"   ❌ Error response sent\n")
-                    
-                except json.JSONDecodeError:
-                    error_response = {
-                        'type': RESP_ERROR,
-                        'error': 'Invalid JSON format'
-                    }
-                    error_data = json.dumps(error_response).encode()
-                    error_length = len(error_data)
-                    length_prefix = error_length.to_bytes(4, byteorder='big')
-                    client_socket.sendall(length_prefix + error_data)
-                    error_response = {
-                        'type': RESP_ERROR,
-                        'error': 'Invalid JSON format'
-                    }
-                    error_data = json.dumps(error_response).encode()
-                    error_length = len(error_data)
-                    length_prefix = error_length.to_bytes(4, byteorder='big')
-                    client_socket.sendall(length_prefix + error_data)
+                    frame = reader.read_frame()
+                except FrameTooLarge as e:
+                    self.send_response(client_socket, self.frame_too_large(address, e))
+                    return
+                if frame is None:
+                    print(f"🔌 Client {address} disconnected")
+                    return
+                
+                # `data` is a view into the reader's buffer; handle_frame
+                # decodes it before the next frame is read
+                data, compressed = frame
+                if not self.handle_frame(data, client_socket, address, session, compressed):
+                    return
                 
         except Exception as e:
             print(f"❌ Error handling client {address}: {e}")
         
         finally:
-            # Cleanup
-            if current_token and current_token in self.clients:
-                del self.clients[current_token]
-            if current_user_id:
-                self.notifier.unregister_client(current_user_id)
-                print(f"📲 Client unregistered from notifications: {current_user_id}")
-            client_socket.close()
-            print(f"👋 Connection closed with {address}\n")
-    
-    def process_message(self, message, client_socket, address):
+            self.close_session(session, client_socket, address)
+    
+    def handle_frame(self, data, client_socket, address, session, compressed=False):
+        """Handle one frame on the reader's thread (threaded engine).
+        
+        Runs the frame's steps (see frame_steps) with blocking socket I/O.
+        Returns False if the connection must be closed.
+        """
+        steps = self.frame_steps(data, client_socket, address, session, compressed)
+        result = None
+        while True:
+            try:
+                step, value = steps.send(result)
+            except StopIteration:
+                return True
+            result = None
+            if step == STEP_SEND:
+                self.send_response(client_socket, value)
+            elif step == STEP_READ:
+                result = PayloadStream(client_socket, value).read_all()
+            elif step == STEP_DISCARD:
+                self.discard_payload(client_socket, value)
+            elif step == STEP_ACQUIRE:
+                session['inflight'].acquire()
+            elif step == STEP_RELEASE:
+                session['inflight'].release()
+            elif step == STEP_PIPELINE:
+                future, message = value
+                future.add_done_callback(
+                    lambda done: self.finish_pipelined(done, message, client_socket, session['inflight'])
+                )
+            elif step == STEP_WAIT:
+                value.result()
+            elif step == STEP_CLOSE:
+                return False
+    
+    def frame_steps(self, data, client_socket, address, session, compressed=False):
+        """Decode one length-prefixed frame and run it on the dispatcher.
+        
+        Both engines handle every frame here; only their I/O differs, so
+        this generator yields each I/O step as (step, value) for the
+        engine to perform:
+        
+            STEP_SEND      send the response `value`
+            STEP_READ      read `value` raw bytes and send() them back
+            STEP_DISCARD   read and drop `value` raw bytes
+            STEP_ACQUIRE   take one of the connection's pipelining slots
+            STEP_RELEASE   give that slot back
+            STEP_PIPELINE  keep reading frames; `value` is (future, message):
+                           when the future is done, give the slot back and
+                           report any failure for the message
+            STEP_WAIT      wait for the future `value` before the next frame
+            STEP_CLOSE     close the connection: the raw bytes that follow
+                           can't be told apart from the next frame
+        
+        Requests that carry a top-level `request_id` are pipelined: the
+        reader moves on to the next frame while a worker handles this one,
+        and the response (echoing the id) may overtake earlier ones. Other
+        requests, and any whose handler uses the raw socket, block until
+        answered, preserving the original in-order behaviour.
+        """
+        try:
+            message = self.parse_frame(data, address, client_socket, compressed)
+        except FrameTooLarge as e:
+            yield STEP_SEND, self.frame_too_large(address, e)
+            yield STEP_CLOSE, None
+            return
+        if message is None:
+            yield STEP_SEND, {
+                'type': RESP_ERROR,
+                'error': 'Invalid message format'
+            }
+            return
+        
+        if message.get('type') == MSG_HELLO:
+            # Answered on the reader so the next frame is decoded with the new settings
+            codec, compression, response = self.negotiate_hello(message)
+            yield STEP_SEND, response
+            client_socket.codec = codec
+            client_socket.compression = compression
+            return
+        
+        payload_size = self.inline_payload_size(message)
+        if payload_size:
+            error = self.check_inline_payload(message, payload_size)
+            if error:
+                yield STEP_DISCARD, payload_size
+                yield STEP_SEND, error
+                return
+            message['data']['chunk_data'] = yield STEP_READ, payload_size
+        
+        error = self.check_raw_payload(message)
+        if error:
+            yield STEP_SEND, error
+            yield STEP_CLOSE, None
+            return
+        
+        pipelined = self.can_pipeline(message)
+        if pipelined:
+            yield STEP_ACQUIRE, None
+        
+        future, busy_response = self.dispatcher.submit(
+            message.get('type'), self.serve_message, message, client_socket, address, session
+        )
+        if future is None:
+            if pipelined:
+                yield STEP_RELEASE, None
+            print(f"   ⏳ Rejected {message.get('type')}: {busy_response['reason']}")
+            yield STEP_DISCARD, self.raw_payload_size(message)
+            yield STEP_SEND, self.tag_response(message, busy_response)
+            return
+        
+        if pipelined:
+            yield STEP_PIPELINE, (future, message)
+        else:
+            yield STEP_WAIT, future
+    
+    def can_pipeline(self, message):
+        """True if a request may be answered out of order"""
+        if message.get('request_id') is None or self.raw_payload_size(message):
+            return False
+        spec = self.handlers.get(message.get('type'))
+        return spec is not None and not spec.with_socket
+    
+    def tag_response(self, message, response):
+        """Echo the request's `request_id` so the client can correlate it"""
+        if message.get('request_id') is not None:
+            response['request_id'] = message['request_id']
+        return response
+    
+    def finish_pipelined(self, future, message, client_socket, inflight):
+        """Release a pipelined slot and report handler failures to the client"""
+        inflight.release()
+        error = future.exception()
+        if error is None:
+            return
+        print(f"❌ Error handling {message.get('type')} ({message.get('request_id')}): {error}")
+        try:
+            self.send_response(client_socket, self.tag_response(message, {
+                'type': RESP_ERROR,
+                'success': False,
+                'error': f'Server error: {error}'
+            }))
+        except Exception:
+            pass
+    
+    def negotiate_hello(self, message):
+        """Pick the codec and compression for a HELLO's connection.
+        
+        The client lists the codecs and compression algorithms it supports,
+        most preferred first. The response is still sent with the current
+        settings; the caller switches the connection over once it has been
+        written.
+        """
+        data = message.get('data', {})
+        codec = choose_codec(data.get('codecs'))
+        compression = choose_compression(data.get('compression'))
+        print(f"   🤝 HELLO: using {codec} codec, compression {compression or 'off'}")
+        return codec, compression, self.tag_response(message, {
+            'type': RESP_SUCCESS,
+            'success': True,
+            'codec': codec,
+            'codecs': available_codecs(),
+            'compression': compression,
+            'compression_threshold': COMPRESSION_THRESHOLD
+        })
+    
+    def parse_frame(self, data, address, client_socket, compressed=False):
+        """Decode a received frame, returning None if it is malformed.
+        
+        FrameTooLarge is raised, not swallowed: the connection is closed.
+        """
+        print(f"\n📨 TCP SEGMENT RECEIVED")
+        print(f"   From: {address[0]}:{address[1]}")
+        print(f"   Size: {len(data)} bytes{' (compressed)' if compressed else ''}")
+        print(f"   Protocol: TCP (Reliable, Ordered)")
+        
+        try:
+            message = decode_frame(data, compressed, client_socket.codec, client_socket.compression)
+        except FrameTooLarge:
+            raise
+        except CodecError:
+            return None
+        return message if isinstance(message, dict) else None
+    
+    def frame_too_large(self, address, error):
+        """Error sent before closing a connection whose frame exceeds MAX_FRAME_SIZE"""
+        print(f"⚠️ Closing {address}: {error}")
+        return {
+            'type': RESP_ERROR,
+            'success': False,
+            'code': ERR_BAD_REQUEST,
+            'error': str(error)
+        }
+    
+    def raw_payload_size(self, message):
+        """Number of raw bytes the client streams right after this frame.
+        
+        None if the message declares a payload but its `file_size` is
+        missing, negative or not an integer.
+        """
+        if message.get('type') not in RAW_PAYLOAD_MESSAGES:
+            return 0
+        data = message.get('data')
+        size = data.get('file_size') if isinstance(data, dict) else None
+        if isinstance(size, bool) or not isinstance(size, int) or size < 0:
+            return None
+        return size
+    
+    def check_raw_payload(self, message):
+        """Error response for a raw payload of unknown size, otherwise None"""
+        if self.raw_payload_size(message) is not None:
+            return None
+        return self.tag_response(message, {
+            'type': RESP_ERROR,
+            'success': False,
+            'code': ERR_BAD_REQUEST,
+            'error': 'file_size must be a non-negative integer'
+        })
+    
+    def inline_payload_size(self, message):
+        """Number of raw bytes the reader must collect for this frame before dispatch"""
+        data = message.get('data')
+        if message.get('type') not in INLINE_PAYLOAD_MESSAGES or not isinstance(data, dict):
+            return 0
+        size = data.get('chunk_length')
+        return size if isinstance(size, int) and size > 0 else 0
+    
+    def check_inline_payload(self, message, size):
+        """Error response for a raw chunk too large to buffer, otherwise None"""
+        if size <= TRANSFER_MAX_CHUNK_SIZE:
+            return None
+        return self.tag_response(message, {
+            'type': RESP_ERROR,
+            'success': False,
+            'error': f'Chunk of {size} bytes exceeds {TRANSFER_MAX_CHUNK_SIZE} bytes',
+            'chunk_number': message['data'].get('chunk_number')
+        })
+    
+    def discard_payload(self, client_socket, size):
+        """Read and drop a raw payload so the next frame boundary stays intact"""
+        PayloadStream(client_socket, size).drain()
+    
+    def serve_message(self, message, client_socket, address, session):
+        """Process a decoded message and send its response (runs on a worker)"""
+        msg_type = message.get('type')
+        
+        print(f"   Message Type: {msg_type}")
+        
+        # Handle message based on type
+        response = self.tag_response(message, self.process_message(message, client_socket, address, session))
+        
+        # DEBUG: Print response (excluding large file data)
+        response_summary = response.copy()
+        
+        # Suppress file_data in direct response
+        if 'file_data' in response_summary:
+            response_summary['file_data'] = f"<{len(response['file_data'])} bytes>"
+        
+        # Suppress file_data in submission object
+        if 'submission' in response_summary and isinstance(response_summary['submission'], dict):
+            if 'file_data' in response_summary['submission']:
+                response_summary['submission'] = response_summary['submission'].copy()
+                response_summary['submission']['file_data'] = f"<{len(response['submission']['file_data'])} bytes>"
+        
+        # Suppress file_data in submissions array
+        if 'submissions' in response_summary and isinstance(response_summary['submissions'], list):
+            cleaned_submissions = []
+            for sub in response_summary['submissions']:
+                if isinstance(sub, dict) and 'file_data' in sub:
+                    cleaned_sub = sub.copy()
+                    cleaned_sub['file_data'] = f"<{len(sub['file_data'])} bytes>"
+                    cleaned_submissions.append(cleaned_sub)
+                else:
+                    cleaned_submissions.append(sub)
+            response_summary['submissions'] = cleaned_submissions
+        
+        print(f"   📤 Response: {response_summary}")
+        
+        # Track token for cleanup
+        if msg_type in [MSG_LOGIN, MSG_SIGNUP] and response.get('success'):
+            current_token = response.get('token')
+            session['token'] = current_token
+            session['user_id'] = response.get('user_id')
+            session['auth'] = self.db.sessions.peek(current_token)
+            self.clients[current_token] = (client_socket, response)
+            
+            # Register client with notification system
+            user_id = response.get('user_id')
+            user_data = {
+                'name': response.get('name'),
+                'email': response.get('email'),
+                'role': response.get('role')
+            }
+            self.notifier.register_client(user_id, client_socket, user_data)
+            print(f"📲 Client registered for notifications: {user_data.get('name')} ({user_id})")
+        
+        # Send response with length prefix
+        try:
+            response_frame = encode_frame(response, client_socket.codec, client_socket.compression, label=msg_type)
+            client_socket.sendall(response_frame)
+            
+            print(f"   ✅ Response sent ({len(response_frame) - 4} bytes, {client_socket.codec})\n")
+        except CodecError as e:
+            # Serialization failed (e.g., datetime objects over JSON)
+            print(f"   ❌ Serialization error: {e}")
+            self.send_response(client_socket, {
+                'type': RESP_ERROR,
+                'error': 'Server serialization error'
+            })
+            print(f"   ❌ Error response sent\n")
+    
+    def send_response(self, client_socket, response):
+        """Encode a response with the connection's settings and send it"""
+        client_socket.sendall(encode_frame(response, client_socket.codec, client_socket.compression))
+    
+    def close_session(self, session, client_socket, address):
+        """Release everything tied to a closed connection"""
+        current_token = session.get('token')
+        current_user_id = session.get('user_id')
+        if current_token and current_token in self.clients:
+            del self.clients[current_token]
+        if current_user_id:
+            self.notifier.unregister_client(current_user_id)
+            print(f"📲 Client unregistered from notifications: {current_user_id}")
+        client_socket.close()
+        print(f"👋 Connection closed with {address}\n")
+    
+    def register_handler(self, msg_type, func, auth=True, role=None, denied=None, with_socket=False):
+        """Add or replace a message handler at runtime (e.g. from a plugin)"""
+        self.handlers.register(msg_type, func, auth, role, denied, with_socket)
+    
+    def authenticate(self, token, session=None):
+        """Resolve a token to user data, preferring the connection's bound session.
+        
+        Once a connection has authenticated, its cache entry is bound to the
+        session so later requests skip both the cache and MongoDB; the entry
+        stops matching as soon as it expires or the user logs in elsewhere.
+        """
+        bound = session.get('auth') if session else None
+        if bound and bound['token'] == token and self.db.sessions.is_live(bound):
+            METRICS.increment('sessions.bound_hits')
+            return bound['user']
+        
+        user_data = self.db.verify_token(token)
+        if user_data['success'] and session is not None:
+            session['auth'] = self.db.sessions.peek(token)
+        return user_data
+    
+    def process_message(self, message, client_socket, address, session=None):
         """Process incoming message and return response"""
         msg_type = message.get('type')
         token = message.get('token')
         data = message.get('data', {})
         
-        # Authentication required messages
-        auth_required = [
-            MSG_CREATE_CLASS, MSG_JOIN_CLASS, MSG_VIEW_CLASSES,
-            MSG_CREATE_ASSIGNMENT, MSG_VIEW_ASSIGNMENTS, MSG_SUBMIT_ASSIGNMENT,
-            MSG_VIEW_SUBMISSIONS, MSG_GET_STUDENT_SUBMISSION, MSG_POST_ANNOUNCEMENT, MSG_VIEW_ANNOUNCEMENTS,
-            MSG_POST_COMMENT, MSG_VIEW_COMMENTS, MSG_UPLOAD_FILE,
-            MSG_DOWNLOAD_FILE, MSG_REMOVE_STUDENT, MSG_DELETE_CLASS,
-            MSG_VIEW_STUDENTS, MSG_UPLOAD_MATERIAL, MSG_VIEW_MATERIALS,
-            MSG_GET_TEACHER_SUBMISSIONS, MSG_GET_STUDENT_ALL_ASSIGNMENTS, MSG_START_FILE_TRANSFER, 
-            MSG_FILE_CHUNK, MSG_END_FILE_TRANSFER, MSG_POST_MESSAGE, MSG_GET_MESSAGES, MSG_SUBMIT_ASSIGNMENT_GRIDFS
-        ]
-        
-        # Verify token if required
-        if msg_type in auth_required:
-            user_data = self.db.verify_token(token)
+        spec = self.handlers.get(msg_type)
+        if spec is None:
+            return {'type': RESP_ERROR, 'error': 'Unknown message type'}
+        
+        # Verify token and role centrally
+        if spec.auth:
+            user_data = self.authenticate(token, session)
             if not user_data['success']:
+                self.discard_payload(client_socket, self.raw_payload_size(message))
                 return {'type': RESP_ERROR, 'error': 'Unauthorized'}
+            if spec.role and user_data['role'] != spec.role:
+                self.discard_payload(client_socket, self.raw_payload_size(message))
+                return {'type': RESP_ERROR, 'error': spec.denied}
             data['user_id'] = user_data['user_id']
             data['user_role'] = user_data['role']
             data['user_email'] = user_data['email']
         
-        # Route to appropriate handler
-        if msg_type == MSG_LOGIN:
-            return self.handle_login(data)
-        
-        elif msg_type == MSG_SIGNUP:
-            return self.handle_signup(data)
-        
-        elif msg_type == MSG_CREATE_CLASS:
-            return self.handle_create_class(data)
-        
-        elif msg_type == MSG_JOIN_CLASS:
-            return self.handle_join_class(data)
-        
-        elif msg_type == MSG_VIEW_CLASSES:
-            return self.handle_view_classes(data)
-        
-        elif msg_type == MSG_CREATE_ASSIGNMENT:
-            return self.handle_create_assignment(data)
-        
-        elif msg_type == MSG_VIEW_ASSIGNMENTS:
-            return self.handle_view_assignments(data)
-        
-        elif msg_type == MSG_SUBMIT_ASSIGNMENT:
-            return self.handle_submit_assignment(data)
-        
-        elif msg_type == MSG_VIEW_SUBMISSIONS:
-            return self.handle_view_submissions(data)
-        
-        elif msg_type == MSG_GET_STUDENT_SUBMISSION:
-            return self.handle_get_student_submission(data)
-        
-        elif msg_type == MSG_POST_ANNOUNCEMENT:
-            return self.handle_post_announcement(data)
-        
-        elif msg_type == MSG_VIEW_ANNOUNCEMENTS:
-            return self.handle_view_announcements(data)
-        
-        elif msg_type == MSG_POST_COMMENT:
-            return self.handle_post_comment(data)
-        
-        elif msg_type == MSG_VIEW_COMMENTS:
-            return self.handle_view_comments(data)
-        
-        elif msg_type == MSG_START_FILE_TRANSFER:
-            return self.file_handler.handle_file_upload_start(data, client_socket)
-        
-        elif msg_type == MSG_FILE_CHUNK:
-            return self.file_handler.handle_file_chunk(data)
-        
-        elif msg_type == MSG_END_FILE_TRANSFER:
-            return self.file_handler.handle_file_upload_complete(data)
-        
-        elif msg_type == MSG_DOWNLOAD_FILE:
-            return self.handle_download_file(data, client_socket, address) 
-        
-        elif msg_type == MSG_REMOVE_STUDENT:
-            return self.handle_remove_student(data)
-        
-        elif msg_type == MSG_DELETE_CLASS:
-            return self.handle_delete_class(data)
-        
-        elif msg_type == MSG_VIEW_STUDENTS:
-            return self.handle_view_students(data)
-        
-        elif msg_type == MSG_UPLOAD_MATERIAL:
-            return self.handle_upload_material(data)
-        
-        elif msg_type == MSG_VIEW_MATERIALS:
-            return self.handle_view_materials(data)
-        
-        elif msg_type == MSG_GET_TEACHER_SUBMISSIONS:
-            return self.handle_get_teacher_submissions(data)
-        
-        elif msg_type == MSG_GET_STUDENT_ALL_ASSIGNMENTS:
-            return self.handle_get_student_all_assignments(data)
-        
-        elif msg_type == MSG_GET_NOTIFICATIONS:
-            return self.handle_get_notifications(data)
-        elif msg_type == MSG_SUBMIT_ASSIGNMENT_GRIDFS:
-          return self.handle_submit_assignment_gridfs(data, client_socket, address)
-        
-        elif msg_type == MSG_UPLOAD_MATERIAL_GRIDFS:  # NEW: Add this line
-         return self.handle_upload_material_gridfs(data, client_socket, address)
-        
-
-        elif msg_type == MSG_POST_MESSAGE:
-            try:
-                return self.discussion.send_message_handler(data)
-            except AttributeError as e:
-                # Defensive: if the discussion handler was constructed with the
-                # generic Database lacking `send_message`, recreate a fresh
-                # DiscussionHandler that uses the dedicated DiscussionDB and retry.
-                err = str(e)
-                print(f"[WARN] Discussion handler AttributeError: {err} - recreating handler and retrying")
-                try:
-                    from server.discussion_handler import DiscussionHandler
-                    self.discussion = DiscussionHandler()
-                    return self.discussion.send_message_handler(data)
-                except Exception as e2:
-                    print(f"[ERROR] Failed to recover DiscussionHandler: {e2}")
-                    return {'type': RESP_ERROR, 'error': str(e2)}
-
-        elif msg_type == MSG_GET_MESSAGES:
-            try:
-                return self.discussion.fetch_messages_handler(data)
-            except AttributeError as e:
-                print(f"[WARN] Discussion handler AttributeError on fetch: {e} - recreating handler and retrying")
-                try:
-                    from server.discussion_handler import DiscussionHandler
-                    self.discussion = DiscussionHandler()
-                    return self.discussion.fetch_messages_handler(data)
-                except Exception as e2:
-                    print(f"[ERROR] Failed to recover DiscussionHandler for fetch: {e2}")
-                    return {'type': RESP_ERROR, 'error': str(e2)}
-        
-        else:
-            return {'type': RESP_ERROR, 'error': 'Unknown message type'}
+        if spec.with_socket:
+            return spec.func(data, client_socket, address)
+        return spec.func(data)
     
     # ========== MESSAGE HANDLERS ==========
+    # Each handler is registered with @message_handler; authentication and
+    # role checks are applied in process_message before it is called.
     
+    @message_handler(MSG_LOGIN, auth=False)
     def handle_login(self, data):
         """Handle login request"""
         email = data.get('email')
@@ -383,6 +546,7 @@ class LearnLiveServer:
                 'error': result['error']
             }
     
+    @message_handler(MSG_SIGNUP, auth=False)
     def handle_signup(self, data):
         """Handle signup request"""
         email = data.get('email')
@@ -406,11 +570,9 @@ class LearnLiveServer:
                 'error': result['error']
             }
     
+    @message_handler(MSG_CREATE_CLASS, role='teacher', denied='Only teachers can create classes')
     def handle_create_class(self, data):
         """Handle create class request"""
-        if data['user_role'] != 'teacher':
-            return {'type': RESP_ERROR, 'error': 'Only teachers can create classes'}
-        
         class_name = data.get('class_name')
         section = data.get('section', '')
         subject = data.get('subject', '')
@@ -430,11 +592,9 @@ class LearnLiveServer:
         else:
             return {'type': RESP_ERROR, 'success': False, 'error': result['error']}
     
+    @message_handler(MSG_JOIN_CLASS, role='student', denied='Only students can join classes')
     def handle_join_class(self, data):
         """Handle join class request"""
-        if data['user_role'] != 'student':
-            return {'type': RESP_ERROR, 'error': 'Only students can join classes'}
-        
         class_code = data.get('class_code')
         result = self.db.join_class(data['user_id'], class_code)
         
@@ -450,6 +610,7 @@ class LearnLiveServer:
         else:
             return {'type': RESP_ERROR, 'success': False, 'error': result['error']}
     
+    @message_handler(MSG_VIEW_CLASSES)
     def handle_view_classes(self, data):
         """Handle view classes request"""
         result = self.db.get_user_classes(data['user_id'], data['user_role'])
@@ -463,11 +624,9 @@ class LearnLiveServer:
         else:
             return {'type': RESP_ERROR, 'success': False, 'error': result['error']}
     
+    @message_handler(MSG_CREATE_ASSIGNMENT, role='teacher', denied='Only teachers can create assignments')
     def handle_create_assignment(self, data):
         """Handle create assignment request"""
-        if data['user_role'] != 'teacher':
-            return {'type': RESP_ERROR, 'error': 'Only teachers can create assignments'}
-        
         class_id = data.get('class_id')
         title = data.get('title')
         description = data.get('description')
@@ -506,6 +665,7 @@ class LearnLiveServer:
         else:
             return {'type': RESP_ERROR, 'success': False, 'error': result['error']}
     
+    @message_handler(MSG_VIEW_ASSIGNMENTS)
     def handle_view_assignments(self, data):
         """Handle view assignments request"""
         class_id = data.get('class_id')
@@ -520,22 +680,22 @@ class LearnLiveServer:
         else:
             return {'type': RESP_ERROR, 'success': False, 'error': result['error']}
     
+    @message_handler(MSG_SUBMIT_ASSIGNMENT, role='student', denied='Only students can submit assignments')
     def handle_submit_assignment(self, data):
         """Handle submit assignment request"""
-        if data['user_role'] != 'student':
-            return {'type': RESP_ERROR, 'error': 'Only students can submit assignments'}
-
         assignment_id = data.get('assignment_id')
-        file_data_hex = data.get('file_data')  # This is HEX encoded string from client
+        file_data = data.get('file_data')  # Raw bytes (binary codec) or HEX string (JSON)
         text_content = data.get('text_content', '')
         filename = data.get('filename', '')  # Get original filename
 
         # Convert hex string back to binary
         file_content = None
-        if file_data_hex:
+        if isinstance(file_data, bytes):
+            file_content = file_data
+        elif file_data:
             try:
                 # Decode hex string to binary
-                file_content = bytes.fromhex(file_data_hex)
+                file_content = bytes.fromhex(file_data)
             except Exception as e:
                 return {
                     'type': RESP_ERROR, 
@@ -575,23 +735,26 @@ class LearnLiveServer:
             }
 
 
+    @message_handler(MSG_VIEW_SUBMISSIONS, role='teacher', denied='Only teachers can view submissions')
     def handle_view_submissions(self, data):
         """Handle view submissions request"""
-        if data['user_role'] != 'teacher':
-            return {'type': RESP_ERROR, 'error': 'Only teachers can view submissions'}
-        
         assignment_id = data.get('assignment_id')
-        result = self.db.get_submissions(assignment_id)
+        limit = data.get('limit', LIST_PAGE_SIZE)
+        if not isinstance(limit, int) or not 1 <= limit <= LIST_MAX_PAGE_SIZE:
+            return {'type': RESP_ERROR, 'success': False, 'error': f'limit must be between 1 and {LIST_MAX_PAGE_SIZE}'}
+        result = self.db.get_submissions(assignment_id, limit, data.get('cursor'))
         
         if result['success']:
             return {
                 'type': RESP_SUCCESS,
                 'success': True,
-                'submissions': result['submissions']
+                'submissions': result['submissions'],
+                'next_cursor': result['next_cursor']
             }
         else:
             return {'type': RESP_ERROR, 'success': False, 'error': result['error']}
     
+    @message_handler(MSG_GET_STUDENT_SUBMISSION)
     def handle_get_student_submission(self, data):
         """Handle get student submission request"""
         assignment_id = data.get('assignment_id')
@@ -624,11 +787,9 @@ class LearnLiveServer:
             print(f"[DEBUG SERVER] Sending ERROR response: {response}")
             return response
     
+    @message_handler(MSG_POST_ANNOUNCEMENT, role='teacher', denied='Only teachers can post announcements')
     def handle_post_announcement(self, data):
         """Handle post announcement request"""
-        if data['user_role'] != 'teacher':
-            return {'type': RESP_ERROR, 'error': 'Only teachers can post announcements'}
-        
         class_id = data.get('class_id')
         title = data.get('title')
         content = data.get('content')
@@ -667,6 +828,7 @@ class LearnLiveServer:
         else:
             return {'type': RESP_ERROR, 'success': False, 'error': result['error']}
     
+    @message_handler(MSG_VIEW_ANNOUNCEMENTS)
     def handle_view_announcements(self, data):
         """Handle view announcements request"""
         class_id = data.get('class_id')
@@ -681,6 +843,7 @@ class LearnLiveServer:
         else:
             return {'type': RESP_ERROR, 'success': False, 'error': result['error']}
     
+    @message_handler(MSG_POST_COMMENT)
     def handle_post_comment(self, data):
         """Handle post comment request"""
         item_id = data.get('item_id')
@@ -747,6 +910,7 @@ class LearnLiveServer:
         else:
             return {'type': RESP_ERROR, 'success': False, 'error': result['error']}
     
+    @message_handler(MSG_VIEW_COMMENTS)
     def handle_view_comments(self, data):
         """Handle view comments request"""
         item_id = data.get('item_id')
@@ -762,46 +926,104 @@ class LearnLiveServer:
         else:
             return {'type': RESP_ERROR, 'success': False, 'error': result['error']}
     
+    @message_handler(MSG_START_FILE_TRANSFER, with_socket=True)
+    def handle_start_file_transfer(self, data, client_socket, address):
+        """Handle chunked upload start request"""
+        return self.file_handler.handle_file_upload_start(data, client_socket)
+    
+    @message_handler(MSG_FILE_CHUNK)
+    def handle_file_chunk(self, data):
+        """Handle chunked upload data request"""
+        return self.file_handler.handle_file_chunk(data)
+    
+    @message_handler(MSG_END_FILE_TRANSFER)
+    def handle_end_file_transfer(self, data):
+        """Handle chunked upload completion request"""
+        return self.file_handler.handle_file_upload_complete(data)
+    
+    @message_handler(MSG_QUERY_TRANSFER)
+    def handle_query_transfer(self, data):
+        """Report the missing chunk ranges of a resumable upload"""
+        return self.file_handler.handle_query_transfer(data)
+    
+    @message_handler(MSG_HEAD_FILE)
+    def handle_head_file(self, data):
+        """Describe a file without sending it (clients revalidate their cache with this)"""
+        file_id = data.get('file_id')
+        if not file_id:
+            return {'type': RESP_ERROR, 'error': 'File ID required'}
+
+        result = self.db.get_file_info(file_id)
+        if result['success']:
+            return {'type': RESP_SUCCESS, **result}
+        else:
+            return {'type': RESP_ERROR, 'success': False, 'error': result['error']}
+
+    @message_handler(MSG_DOWNLOAD_FILE, with_socket=True)
     def handle_download_file(self, data, client_socket, address):
-        """Handle file download request - use same protocol as other messages"""
+        """Handle file download request - use same protocol as other messages.
+        
+        Optional `offset` and `length` ask for a byte range (to resume an
+        interrupted download); `size` in the metadata is always the number
+        of raw bytes that follow it.
+        """
         file_id = data.get('file_id')
         request_id = data.get('request_id')
+        offset = data.get('offset', 0)
+        length = data.get('length')
 
         if not file_id:
             return {'type': RESP_ERROR, 'error': 'File ID required'}
+        valid_length = length is None or (isinstance(length, int) and length >= 0)
+        if not isinstance(offset, int) or offset < 0 or not valid_length:
+            return {'type': RESP_ERROR, 'success': False, 'error': 'offset and length must be non-negative integers'}
 
-        result = self.db.download_material_gridfs(file_id)
+        result = self.db.download_material_gridfs(file_id, offset, length)
 
         if result['success']:
-            # Get file content
-           file_content = result['file_content']
+            # Get file stream
+           file_stream = result['file_stream']
            filename = result.get('filename', 'download.bin')
-           size = len(file_content)
+           size = result['size']
     
-           print(f"[SERVER DOWNLOAD] Sending file: {filename}, size: {size} bytes")
+           print(f"[SERVER DOWNLOAD] Sending file: {filename}, {size} of {result['total_size']} bytes from offset {offset}")
     
            # Create metadata
+           range_info = {
+               'offset': offset,
+               'total_size': result['total_size'],
+               'sha256': result['sha256']  # Checksum of the whole file, when known
+           }
            metadata = {
                'type': RESP_SUCCESS,
                'success': True,
                'filename': filename,
                'content_type': result.get('content_type', 'application/octet-stream'),
-               'size': size
+               'size': size,
+               **range_info
            }
         
            if request_id:
                metadata['request_id'] = request_id
     
            # Send metadata using length-prefixed protocol (same as all other messages)
-           json_data = json.dumps(metadata).encode()
-           length_prefix = len(json_data).to_bytes(4, byteorder='big')
-        
-           # Send metadata
-           client_socket.sendall(length_prefix + json_data)
+           metadata_frame = encode_frame(metadata, client_socket.codec, client_socket.compression)
         
-           # Send binary data immediately after
-           print(f"[SERVER DOWNLOAD] Now sending {size} bytes of raw binary...")
-           client_socket.sendall(file_content)
+           # Hold the send lock so no notification lands between the two writes
+           with client_socket.send_lock:
+               # Send metadata
+               client_socket.sendall(metadata_frame)
+            
+               # Send binary data immediately after, one GridFS chunk at a
+               # time. A failure here leaves the client mid-file, so it is
+               # raised and the connection closed rather than answered.
+               print(f"[SERVER DOWNLOAD] Now streaming {size} bytes of raw binary...")
+               sent = 0
+               for chunk in file_stream:
+                   client_socket.sendall(chunk)
+                   sent += len(chunk)
+               if sent != size:
+                   raise ConnectionError(f'GridFS returned {sent} of {size} bytes for {file_id}')
         
            print(f"[SERVER DOWNLOAD] File sent successfully")
         
@@ -811,18 +1033,17 @@ class LearnLiveServer:
                'success': True,
                'message': 'File sent successfully',
                'filename': filename,
-               'size': size
+               'size': size,
+               **range_info
            }
     
         else:
            return {'type': RESP_ERROR, 'success': False, 'error': result['error']}
  
     
+    @message_handler(MSG_REMOVE_STUDENT, role='teacher', denied='Only teachers can remove students')
     def handle_remove_student(self, data):
         """Handle remove student request"""
-        if data['user_role'] != 'teacher':
-            return {'type': RESP_ERROR, 'error': 'Only teachers can remove students'}
-        
         class_id = data.get('class_id')
         student_id = data.get('student_id')
         
@@ -833,11 +1054,9 @@ class LearnLiveServer:
         else:
             return {'type': RESP_ERROR, 'success': False, 'error': result['error']}
     
+    @message_handler(MSG_DELETE_CLASS, role='teacher', denied='Only teachers can delete classes')
     def handle_delete_class(self, data):
         """Handle delete class request"""
-        if data['user_role'] != 'teacher':
-            return {'type': RESP_ERROR, 'error': 'Only teachers can delete classes'}
-        
         class_id = data.get('class_id')
         result = self.db.delete_class(class_id)
         
@@ -846,6 +1065,7 @@ class LearnLiveServer:
         else:
             return {'type': RESP_ERROR, 'success': False, 'error': result['error']}
     
+    @message_handler(MSG_VIEW_STUDENTS)
     def handle_view_students(self, data):
         """Handle view students request"""
         class_id = data.get('class_id')
@@ -862,11 +1082,9 @@ class LearnLiveServer:
         
 
     
+    @message_handler(MSG_UPLOAD_MATERIAL, role='teacher', denied='Only teachers can upload materials')
     def handle_upload_material(self, data):
        """Handle upload material request"""
-       if data['user_role'] != 'teacher':
-           return {'type': RESP_ERROR, 'error': 'Only teachers can upload materials'}
-    
        class_id = data.get('class_id')
        title = data.get('title')
        material_type = data.get('material_type', 'Document')
@@ -886,6 +1104,7 @@ class LearnLiveServer:
 
 
     
+    @message_handler(MSG_VIEW_MATERIALS)
     def handle_view_materials(self, data):
         """Handle view materials request"""
         class_id = data.get('class_id')
@@ -900,40 +1119,50 @@ class LearnLiveServer:
         else:
             return {'type': RESP_ERROR, 'success': False, 'error': result['error']}
     
+    @message_handler(MSG_GET_TEACHER_SUBMISSIONS, role='teacher', denied='Only teachers can view all submissions')
     def handle_get_teacher_submissions(self, data):
         """Handle get all teacher's submissions request"""
-        if data['user_role'] != 'teacher':
-            return {'type': RESP_ERROR, 'error': 'Only teachers can view all submissions'}
-        
         teacher_id = data['user_id']
-        result = self.db.get_teacher_submissions(teacher_id)
+        limit = data.get('limit', LIST_PAGE_SIZE)
+        if not isinstance(limit, int) or not 1 <= limit <= LIST_MAX_PAGE_SIZE:
+            return {'type': RESP_ERROR, 'success': False, 'error': f'limit must be between 1 and {LIST_MAX_PAGE_SIZE}'}
+        result = self.db.get_teacher_submissions(teacher_id, limit, data.get('cursor'))
         
         if result['success']:
             return {
                 'type': RESP_SUCCESS,
                 'success': True,
-                'submissions': result['submissions']
+                'submissions': result['submissions'],
+                'next_cursor': result['next_cursor']
             }
         else:
             return {'type': RESP_ERROR, 'success': False, 'error': result['error']}
     
+    @message_handler(MSG_GET_STUDENT_ALL_ASSIGNMENTS, role='student', denied='Only students can view their assignments')
     def handle_get_student_all_assignments(self, data):
         """Handle get all student's assignments request"""
-        if data['user_role'] != 'student':
-            return {'type': RESP_ERROR, 'error': 'Only students can view their assignments'}
-        
         student_id = data['user_id']
-        result = self.db.get_student_all_assignments(student_id)
+        limit = data.get('limit', LIST_PAGE_SIZE)
+        if not isinstance(limit, int) or not 1 <= limit <= LIST_MAX_PAGE_SIZE:
+            return {'type': RESP_ERROR, 'success': False, 'error': f'limit must be between 1 and {LIST_MAX_PAGE_SIZE}'}
+        due_within_days = data.get('due_within_days')
+        if due_within_days is not None and (not isinstance(due_within_days, int) or due_within_days < 0):
+            return {'type': RESP_ERROR, 'success': False, 'error': 'due_within_days must be a non-negative integer'}
+        result = self.db.get_student_all_assignments(
+            student_id, limit, data.get('cursor'), due_within_days, bool(data.get('not_submitted'))
+        )
         
         if result['success']:
             return {
                 'type': RESP_SUCCESS,
                 'success': True,
-                'assignments': result['assignments']
+                'assignments': result['assignments'],
+                'next_cursor': result['next_cursor']
             }
         else:
             return {'type': RESP_ERROR, 'success': False, 'error': result['error']}
     
+    @message_handler(MSG_GET_NOTIFICATIONS, auth=False)
     def handle_get_notifications(self, data):
         """Handle get notifications request"""
         user_id = data.get('user_id')
@@ -949,16 +1178,33 @@ class LearnLiveServer:
         else:
             return {'type': RESP_ERROR, 'success': False, 'error': result['error']}
         
+    @message_handler(MSG_POST_MESSAGE)
+    def handle_post_message(self, data):
+        """Handle discussion message post request"""
+        return self.discussion.send_message_handler(data)
+    
+    @message_handler(MSG_GET_MESSAGES)
+    def handle_get_messages(self, data):
+        """Handle discussion messages fetch request"""
+        return self.discussion.fetch_messages_handler(data)
+    
+    @message_handler(MSG_GET_METRICS, role='teacher', denied='Only teachers can view server metrics')
+    def handle_get_metrics(self, data):
+        """Handle server metrics request"""
+        return {
+            'type': RESP_SUCCESS,
+            'success': True,
+            'metrics': METRICS.snapshot()
+        }
+    
+    @message_handler(MSG_SUBMIT_ASSIGNMENT_GRIDFS, role='student', denied='Only students can submit assignments', with_socket=True)
     def handle_submit_assignment_gridfs(self, data, client_socket, address):
         """Handle GridFS-based assignment submission with binary protocol"""
-        if data['user_role'] != 'student':
-            return {'type': RESP_ERROR, 'error': 'Only students can submit assignments'}
-    
         assignment_id = data.get('assignment_id')
         user_id = data.get('user_id')
         submission_text = data.get('submission_text', '')
         filename = data.get('filename', '')
-        expected_file_size = data.get('file_size', 0)
+        expected_file_size = data['file_size']  # Checked by frame_steps (see raw_payload_size)
     
         print(f"[SERVER GRIDFS] Starting GridFS submission from {address}")
         print(f"  Assignment ID: {assignment_id}")
@@ -966,31 +1212,22 @@ class LearnLiveServer:
         print(f"  Filename: {filename}")
         print(f"  Expected file size: {expected_file_size} bytes")
     
-        try:
-            # Read binary data directly from socket
-            file_content = b""
-            bytes_received = 0
-        
-            # Read the binary data that follows the JSON message
-            while bytes_received < expected_file_size:
-                chunk_size = min(4096, expected_file_size - bytes_received)
-                chunk = client_socket.recv(chunk_size)
-                if not chunk:
-                    print(f"  ❌ Connection closed prematurely")
-                    break
-                file_content += chunk
-                bytes_received += len(chunk)
-        
-            print(f"[SERVER GRIDFS] Received {len(file_content)} bytes of binary data")
-         
-            # Verify we got all data
-            if len(file_content) != expected_file_size:
-                print(f"  ⚠️ Warning: Expected {expected_file_size} bytes, got {len(file_content)}")
+        # The binary data that follows the JSON message is streamed from the
+        # socket straight into GridFS instead of being collected in memory
+        file_content = PayloadStream(client_socket, expected_file_size)
         
+        try:
             # Now call the database handler for GridFS storage
             result = self.db.submit_assignment_gridfs(
                 assignment_id, user_id, file_content, submission_text, filename
             )
+            file_content.drain()
+        
+            print(f"[SERVER GRIDFS] Received {file_content.received} bytes of binary data")
+        
+            # Verify we got all data
+            if not file_content.complete:
+                print(f"  ⚠️ Warning: Expected {expected_file_size} bytes, got {file_content.received}")
         
             if result['success']:
                 print(f"  ✅ GridFS submission successful: {result['submission_id']}")
@@ -1008,10 +1245,12 @@ class LearnLiveServer:
                 return {
                     'type': RESP_ERROR,
                     'success': False,
+                    'code': result.get('code'),
                     'error': result['error']
                 }
             
         except Exception as e:
+            file_content.drain()
             print(f"  ❌ GridFS handler error: {e}")
             import traceback
             traceback.print_exc()
@@ -1021,17 +1260,15 @@ class LearnLiveServer:
                 'error': f'GridFS submission failed: {str(e)}'
             }
         
+    @message_handler(MSG_UPLOAD_MATERIAL_GRIDFS, role='teacher', denied='Only teachers can upload materials', with_socket=True)
     def handle_upload_material_gridfs(self, data, client_socket, address):
         """Handle GridFS-based material upload with binary protocol"""
-        if data.get('user_role') != 'teacher':
-            return {'type': RESP_ERROR, 'error': 'Only teachers can upload materials'}
-    
         class_id = data.get('class_id')
         teacher_id = data.get('teacher_id')
         title = data.get('title')
         material_type = data.get('material_type', 'Document')
         filename = data.get('filename', '')
-        expected_file_size = data.get('file_size', 0)
+        expected_file_size = data['file_size']  # Checked by frame_steps (see raw_payload_size)
     
         print(f"[SERVER MATERIAL GRIDFS] Starting material upload from {address}")
         print(f"  Class ID: {class_id}")
@@ -1040,31 +1277,22 @@ class LearnLiveServer:
         print(f"  Filename: {filename}")
         print(f"  Expected file size: {expected_file_size} bytes")
     
-        try:
-            # Read binary data directly from socket
-            file_content = b""
-            bytes_received = 0
-        
-            # Read the binary data that follows the JSON message
-            while bytes_received < expected_file_size:
-                chunk_size = min(4096, expected_file_size - bytes_received)
-                chunk = client_socket.recv(chunk_size)
-                if not chunk:
-                    print(f"  ❌ Connection closed prematurely")
-                    break
-                file_content += chunk
-                bytes_received += len(chunk)
-        
-            print(f"[SERVER MATERIAL GRIDFS] Received {len(file_content)} bytes of binary data")
-        
-            # Verify we got all data
-            if len(file_content) != expected_file_size:
-                print(f"  ⚠️ Warning: Expected {expected_file_size} bytes, got {len(file_content)}")
+        # The binary data that follows the JSON message is streamed from the
+        # socket straight into GridFS instead of being collected in memory
+        file_content = PayloadStream(client_socket, expected_file_size)
         
+        try:
             # Call the database handler for GridFS storage
             result = self.db.upload_material_gridfs(
                 class_id, teacher_id, title, material_type, file_content, filename
             )
+            file_content.drain()
+        
+            print(f"[SERVER MATERIAL GRIDFS] Received {file_content.received} bytes of binary data")
+        
+            # Verify we got all data
+            if not file_content.complete:
+                print(f"  ⚠️ Warning: Expected {expected_file_size} bytes, got {file_content.received}")
         
             if result['success']:
                 print(f"  ✅ Material upload successful: {result['material_id']}")
@@ -1086,6 +1314,7 @@ class LearnLiveServer:
                 }
             
         except Exception as e:
+            file_content.drain()
             print(f"  ❌ Material upload handler error: {e}")
             import traceback
             traceback.print_exc()
@@ -1103,13 +1332,30 @@ class LearnLiveServer:
         self.running = False
         if self.server_socket:
             self.server_socket.close()
+        self.file_handler.stop()
+        close_clients()
         print("✅ Server stopped\n")
 
 
 if __name__ == '__main__':
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='LearnLive TCP server')
+    parser.add_argument(
+        '--engine',
+        choices=['threaded', 'asyncio'],
+        default='threaded',
+        help='connection engine: one thread per client (default) or a single asyncio event loop'
+    )
+    args = parser.parse_args()
+    
     server = LearnLiveServer()
     try:
-        server.start()
+        if args.engine == 'asyncio':
+            from server.async_server import AsyncServerEngine
+            AsyncServerEngine(server).run()
+        else:
+            server.start()
     except KeyboardInterrupt:
         print("\n\n⚠️  Keyboard interrupt received")
         server.stop()
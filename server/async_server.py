@@ -0,0 +1,256 @@
+# Asyncio Connection Engine for LearnLive
+#
+# Serves the same 4-byte length-prefixed JSON protocol as the threaded
+# accept loop in server/app.py, but keeps every connection on a single
+# event loop. Idle clients cost a coroutine instead of an OS thread; the
+# blocking MongoDB/GridFS handlers run on the server's bounded dispatcher.
+# What happens to each frame is decided by LearnLiveServer.frame_steps,
+# the same code the threaded engine runs; this module only performs the
+# reads and writes it asks for without blocking the loop.
+
+import asyncio
+import threading
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.config import *
+from protocol.codec import FrameTooLarge, check_frame_length, encode_frame, parse_header
+from server.app import (
+    STEP_ACQUIRE, STEP_CLOSE, STEP_DISCARD, STEP_PIPELINE, STEP_READ, STEP_RELEASE, STEP_SEND,
+    STEP_WAIT
+)
+
+
+class LoopSendLock:
+    """Reentrant lock for worker threads that also holds an asyncio lock on the loop.
+
+    The outermost acquire takes the connection's `write_lock` on the event
+    loop and keeps it until the matching release, so a worker's multi-part
+    write (download metadata + raw bytes) can't be split by a frame the
+    loop itself sends; those wait on `write_lock` in turn.
+    """
+
+    def __init__(self, write_lock, loop):
+        self.write_lock = write_lock
+        self.loop = loop
+        self.lock = threading.RLock()
+        self.depth = 0
+
+    def __enter__(self):
+        self.lock.acquire()
+        if self.depth == 0:
+            try:
+                asyncio.run_coroutine_threadsafe(self.write_lock.acquire(), self.loop).result()
+            except BaseException:
+                self.lock.release()
+                raise
+        self.depth += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        self.depth -= 1
+        if self.depth == 0:
+            self.loop.call_soon_threadsafe(self.write_lock.release)
+        self.lock.release()
+
+
+class StreamSocket:
+    """Blocking socket facade over an asyncio reader/writer pair.
+
+    Message handlers run on dispatcher threads and expect a socket with
+    `recv` and `sendall` (GridFS uploads read raw bytes after the JSON
+    frame, downloads and notifications write directly). Each call is
+    forwarded to the event loop and waited on, so handlers work unchanged.
+    Must never be called from the event loop thread itself.
+    """
+
+    def __init__(self, reader, writer, loop):
+        self.reader = reader
+        self.writer = writer
+        self.loop = loop
+        self.write_lock = asyncio.Lock()
+        # Held by worker threads across multi-part writes (see ClientConnection);
+        # holding it also holds write_lock, which the loop's own sends wait on
+        self.send_lock = LoopSendLock(self.write_lock, loop)
+        self.codec = CODEC_JSON  # Switched by HELLO
+        self.compression = None
+        self.closed = False
+
+    def recv(self, bufsize):
+        """Read up to `bufsize` bytes; returns b'' once the peer has closed"""
+        if self.closed:
+            return b''
+        future = asyncio.run_coroutine_threadsafe(self.reader.read(bufsize), self.loop)
+        return future.result()
+
+    def recv_into(self, buffer, nbytes=0):
+        """Read into a writable buffer, returning the byte count"""
+        view = memoryview(buffer).cast('B')
+        data = self.recv(nbytes or len(view))
+        view[:len(data)] = data
+        return len(data)
+
+    def sendall(self, data):
+        """Write all of `data` and wait until it has been flushed"""
+        if self.closed:
+            raise ConnectionError('Connection closed')
+        with self.send_lock:
+            future = asyncio.run_coroutine_threadsafe(self._write(bytes(data)), self.loop)
+            future.result()
+
+    async def _write(self, data):
+        """Write and drain; the caller holds write_lock"""
+        self.writer.write(data)
+        await self.writer.drain()
+
+    async def send_response(self, response):
+        """Send a response frame from the event loop thread"""
+        async with self.write_lock:
+            await self._write(encode_frame(response, self.codec, self.compression))
+
+    def close(self):
+        """Close the underlying transport (safe from any thread)"""
+        if self.closed:
+            return
+        self.closed = True
+        self.loop.call_soon_threadsafe(self.writer.close)
+
+
+class AsyncServerEngine:
+    def __init__(self, server):
+        """Run a LearnLiveServer's handlers behind an asyncio accept loop"""
+        self.server = server
+        self.loop = None
+        self.connection_count = 0
+
+    def run(self):
+        """Start the event loop and serve until interrupted"""
+        asyncio.run(self.serve())
+
+    async def serve(self):
+        """Accept connections on the configured host/port"""
+        self.loop = asyncio.get_running_loop()
+        tcp_server = await asyncio.start_server(
+            self.handle_connection,
+            self.server.host,
+            self.server.port,
+            backlog=ASYNC_BACKLOG,
+            reuse_address=True
+        )
+        self.server.running = True
+
+        print(f"\n✅ Server started successfully! (asyncio engine)")
+        print(f"🌐 Listening on {self.server.host}:{self.server.port}")
+        print(f"👥 Listen backlog: {ASYNC_BACKLOG}")
+        print(f"🧵 Handler workers: {len(self.server.dispatcher.workers)}")
+        print(f"\n⏳ Waiting for connections...\n")
+
+        async with tcp_server:
+            await tcp_server.serve_forever()
+
+    async def handle_connection(self, reader, writer):
+        """Read frames from one client and hand them to the dispatcher"""
+        address = writer.get_extra_info('peername') or ('unknown', 0)
+        client_socket = StreamSocket(reader, writer, self.loop)
+        session = self.server.new_session()
+        inflight = asyncio.Semaphore(PIPELINE_MAX_INFLIGHT)
+        pending = set()
+        self.connection_count += 1
+
+        print(f"\n========== NEW CONNECTION ==========")
+        print(f"✅ Client connected from {address[0]}:{address[1]}")
+        print(f"🔗 Protocol: TCP (asyncio, {self.connection_count} open)")
+        print(f"====================================\n")
+
+        try:
+            while self.server.running:
+                try:
+                    length_data = await reader.readexactly(4)
+                    message_length, compressed = parse_header(length_data)
+                    check_frame_length(message_length)
+                    data = await reader.readexactly(message_length)
+                except FrameTooLarge as e:
+                    await client_socket.send_response(self.server.frame_too_large(address, e))
+                    return
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    print(f"🔌 Client {address} disconnected")
+                    return
+
+                steps = self.server.frame_steps(data, client_socket, address, session, compressed)
+                try:
+                    if not await self.run_steps(steps, reader, client_socket, inflight, pending):
+                        return
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    print(f"🔌 Client {address} disconnected")
+                    return
+
+        except Exception as e:
+            print(f"❌ Error handling client {address}: {e}")
+
+        finally:
+            self.connection_count -= 1
+            self.server.close_session(session, client_socket, address)
+
+    async def run_steps(self, steps, reader, client_socket, inflight, pending):
+        """Perform one frame's I/O steps (see LearnLiveServer.frame_steps) on the event loop.
+        
+        Returns False if the connection must be closed.
+        """
+        result = None
+        while True:
+            try:
+                step, value = steps.send(result)
+            except StopIteration:
+                return True
+            result = None
+            if step == STEP_SEND:
+                await client_socket.send_response(value)
+            elif step == STEP_READ:
+                result = await reader.readexactly(value)
+            elif step == STEP_DISCARD:
+                await self.discard_payload(reader, value)
+            elif step == STEP_ACQUIRE:
+                await inflight.acquire()
+            elif step == STEP_RELEASE:
+                inflight.release()
+            elif step == STEP_PIPELINE:
+                # Keep reading; the response is sent by the worker when ready
+                future, message = value
+                task = asyncio.ensure_future(self.finish_pipelined(future, message, client_socket, inflight))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            elif step == STEP_WAIT:
+                # Handled strictly in order: a handler may still be reading
+                # raw file bytes off the stream
+                await asyncio.wrap_future(value)
+            elif step == STEP_CLOSE:
+                return False
+
+    async def finish_pipelined(self, future, message, client_socket, inflight):
+        """Wait for a pipelined request and report handler failures"""
+        try:
+            await asyncio.wrap_future(future)
+        except Exception as e:
+            print(f"❌ Error handling {message.get('type')} ({message.get('request_id')}): {e}")
+            response = self.server.tag_response(message, {
+                'type': RESP_ERROR,
+                'success': False,
+                'error': f'Server error: {e}'
+            })
+            try:
+                # Waits on write_lock if a worker is in the middle of a multi-part write
+                await client_socket.send_response(response)
+            except Exception:
+                pass
+        finally:
+            inflight.release()
+
+    async def discard_payload(self, reader, size):
+        """Drop the raw bytes that follow a rejected upload frame"""
+        remaining = size
+        while remaining > 0:
+            chunk = await reader.read(min(BUFFER_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
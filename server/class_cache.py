@@ -0,0 +1,82 @@
+# Assignment -> Class Cache for LearnLive
+#
+# Remembers which class an assignment belongs to (the class's id, name and
+# enrolled students) so a burst of submissions near a deadline resolves
+# the class from memory instead of two queries per upload. Database
+# invalidates a class's entries whenever it writes that class (joins,
+# removals, deletion); an assignment never moves to another class, so its
+# entry needs no other invalidation. The least recently used entry is
+# evicted when the cache is full. Each server process has its own cache.
+#
+# A lookup that raced with a write must not cache what it read before the
+# write: callers take `generation` before querying and pass it to put(),
+# which ignores the result if anything was invalidated in between.
+
+import threading
+from collections import OrderedDict
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.config import *
+from server.metrics import METRICS
+
+
+class AssignmentClassCache:
+    def __init__(self, max_entries=ASSIGNMENT_CLASS_CACHE_SIZE):
+        """Initialize an empty cache"""
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # assignment_id -> class, least recently used first
+        self.class_assignments = {}  # class_id -> assignment_ids cached for it
+        self.generation = 0  # Bumped by every invalidation
+        self.lock = threading.Lock()
+        METRICS.register_gauge('assignment_classes.cached', lambda: len(self.entries))
+
+    def get(self, assignment_id):
+        """Return the cached class of an assignment, or None on a miss"""
+        with self.lock:
+            class_data = self.entries.get(assignment_id)
+            if class_data is None:
+                METRICS.increment('assignment_classes.misses')
+                return None
+            self.entries.move_to_end(assignment_id)
+
+        METRICS.increment('assignment_classes.hits')
+        return class_data
+
+    def put(self, assignment_id, class_data, generation):
+        """Cache the class (`_id` as a string, class_name, students) of an assignment.
+        
+        `generation` is the value of self.generation before the class was
+        read; nothing is cached if an invalidation happened since.
+        """
+        with self.lock:
+            if generation != self.generation:
+                return
+            self._remove(assignment_id)
+            self.entries[assignment_id] = class_data
+            self.class_assignments.setdefault(class_data['_id'], set()).add(assignment_id)
+
+            while len(self.entries) > self.max_entries:
+                self._remove(next(iter(self.entries)))
+                METRICS.increment('assignment_classes.evictions')
+
+    def invalidate_class(self, class_id):
+        """Drop every assignment cached for a class that was written"""
+        with self.lock:
+            self.generation += 1
+            for assignment_id in self.class_assignments.pop(class_id, ()):
+                self.entries.pop(assignment_id, None)
+                METRICS.increment('assignment_classes.invalidations')
+
+    def _remove(self, assignment_id):
+        """Remove one assignment (caller holds the lock)"""
+        class_data = self.entries.pop(assignment_id, None)
+        if class_data is None:
+            return False
+        assignment_ids = self.class_assignments.get(class_data['_id'])
+        if assignment_ids is not None:
+            assignment_ids.discard(assignment_id)
+            if not assignment_ids:
+                del self.class_assignments[class_data['_id']]
+        return True
@@ -0,0 +1,44 @@
+# Client Connection Wrapper for LearnLive
+#
+# Responses, pushed notifications and discussion broadcasts can be written
+# to the same socket from different worker threads (pipelined requests are
+# answered out of order). Every write goes through `send_lock` so frames
+# never interleave; handlers that write several pieces back to back (file
+# download metadata + raw bytes) hold the lock across all of them.
+#
+# `codec` and `compression` are the frame settings agreed with HELLO (JSON,
+# uncompressed until then); anything writing frames to the connection
+# encodes with them.
+
+import threading
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.config import CODEC_JSON
+
+
+class ClientConnection:
+    def __init__(self, sock):
+        """Wrap an accepted socket"""
+        self.sock = sock
+        self.send_lock = threading.RLock()
+        self.codec = CODEC_JSON
+        self.compression = None
+
+    def recv(self, bufsize):
+        """Read up to `bufsize` bytes (only the connection's reader calls this)"""
+        return self.sock.recv(bufsize)
+    
+    def recv_into(self, buffer, nbytes=0):
+        """Read into a writable buffer, returning the byte count"""
+        return self.sock.recv_into(buffer, nbytes)
+
+    def sendall(self, data):
+        """Write all of `data` without interleaving with other writers"""
+        with self.send_lock:
+            self.sock.sendall(data)
+
+    def close(self):
+        """Close the underlying socket"""
+        self.sock.close()
@@ -1,25 +1,48 @@
 # Database Operations for LearnLive
 
-from pymongo import MongoClient
+from pymongo import ReturnDocument
 from bson.objectid import ObjectId
-from datetime import datetime
+from datetime import datetime, timedelta
 from gridfs import GridFS
 from bson import ObjectId
+from bson.errors import InvalidId
 import hashlib
+import io
 import secrets
 import sys
+import time
 import os
 
 # Add parent directory to path to import config
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from config.config import *
+from server.mongo import get_client
+from server.session_cache import SessionCache
+from server.class_cache import AssignmentClassCache
+from server.metrics import METRICS
+from server.indexes import ensure_indexes
+from server.ids import InvalidReference, canonical_refs, to_object_id, to_optional_ref, to_ref
+from server.storage_codec import (
+    choose_storage_codec, iter_stored_range, read_stored_file, storage_compressor, stored_length
+)
+
+# Listings leave out fields that can be large (file bodies from older
+# inline submissions); the To-Get page doesn't show the comment text either
+SUBMISSION_LIST_PROJECTION = {'file_content': 0, 'file_data': 0}
+TEACHER_SUBMISSION_LIST_PROJECTION = {'file_content': 0, 'file_data': 0, 'text_content': 0, 'submission_text': 0}
+
+# Kinds of sort value a page cursor can resume after, in the order a
+# descending MongoDB sort returns them (dates, then strings such as
+# timestamps saved as text by older versions, numbers, null/missing),
+# with the $type each one matches
+PAGE_CURSOR_KINDS = [('date', 'date'), ('str', 'string'), ('num', 'number'), ('null', None)]
 
 
 class Database:
     def __init__(self):
         """Initialize MongoDB connection"""
         try:
-            self.client = MongoClient(MONGODB_URI)
+            self.client = get_client(MONGODB_URI)  # Shared with the rest of the process
             self.db = self.client[DATABASE_NAME]
             
             # Collections
@@ -33,12 +56,15 @@ class Database:
             self.notifications = self.db['notifications']
             from gridfs import GridFS
             self.gridfs = GridFS(self.db)
+            self.gridfs_files = self.db['fs.files']  # GridFS file documents (sha256, refcount)
+            self.gridfs_chunks = self.db['fs.chunks']
+            self.sessions = SessionCache()
+            self.assignment_classes = AssignmentClassCache()
             
-            # Create indexes for performance
-            self.users.create_index('email', unique=True)
-            self.classes.create_index('class_code', unique=True)
-            self.announcements.create_index([('class_id', 1), ('created_at', -1)])  # Speed up announcement queries
-            self.notifications.create_index([('user_id', 1), ('created_at', -1)])  # Speed up notification queries
+            # Create indexes for performance (see server/indexes.py)
+            ensure_indexes(self.db)
+            
+            METRICS.register_gauge('gridfs.dedup', self.dedup_stats)
             
             print("✅ Database connected successfully")
         except Exception as e:
@@ -62,6 +88,91 @@ class Database:
             if not self.classes.find_one({'class_code': code}):
                 return code
     
+    # ========== BATCHED QUERIES ==========
+    
+    def _users_by_id(self, user_ids, fields=('name', 'email')):
+        """Fetch many users with one `$in` query - returns {str(_id): user}.
+        
+        Only `fields` are loaded; ids that aren't valid ObjectIds are skipped.
+        """
+        object_ids = set()
+        for user_id in user_ids:
+            try:
+                object_ids.add(to_object_id(user_id))
+            except InvalidReference:
+                continue
+        if not object_ids:
+            return {}
+        
+        users = self.users.find({'_id': {'$in': list(object_ids)}}, dict.fromkeys(fields, 1))
+        return {str(user['_id']): user for user in users}
+    
+    def _find_page(self, collection, query, projection=None, sort_field='submitted_at',
+                   limit=LIST_PAGE_SIZE, cursor=None):
+        """One page of `query`, newest `sort_field` first - returns (documents, next_cursor).
+        
+        Pages are keyed on (sort_field, _id) rather than skipped through, so
+        every page costs the same however deep it is. `cursor` is the
+        next_cursor of the previous page; next_cursor is None on the last.
+        Raises ValueError for a cursor this method didn't produce.
+        
+        Older documents may hold the sort field as a string (or not at
+        all). MongoDB only compares values of the same type, so the cursor
+        records the kind of the last value: the next page continues within
+        that kind and then takes every kind sorted after it.
+        """
+        if cursor:
+            try:
+                kind, rest = cursor.split('|', 1)
+                last_value, last_id = rest.rsplit('|', 1)
+                last_value, last_id = self._decode_cursor_value(kind, last_value), ObjectId(last_id)
+            except (ValueError, InvalidId, TypeError):
+                raise ValueError('Invalid cursor')
+            kinds = [name for name, _ in PAGE_CURSOR_KINDS]
+            after = [
+                {sort_field: {'$type': bson_type}} if bson_type else {sort_field: None}
+                for _, bson_type in PAGE_CURSOR_KINDS[kinds.index(kind) + 1:]
+            ]
+            if last_value is not None:
+                after.insert(0, {sort_field: {'$lt': last_value}})
+            query = {'$and': [query, {'$or': after + [{sort_field: last_value, '_id': {'$lt': last_id}}]}]}
+        
+        documents = list(
+            collection.find(query, projection)
+            .sort([(sort_field, -1), ('_id', -1)])
+            .limit(limit + 1)  # One extra to learn whether another page follows
+        )
+        next_cursor = None
+        if len(documents) > limit:
+            documents = documents[:limit]
+            last = documents[-1]
+            next_cursor = f"{self._encode_cursor_value(last.get(sort_field))}|{last['_id']}"
+        return documents, next_cursor
+    
+    @staticmethod
+    def _encode_cursor_value(value):
+        """Encode a sort value as 'kind|value' for a page cursor"""
+        if isinstance(value, datetime):
+            return f'date|{value.isoformat()}'
+        if isinstance(value, str):
+            return f'str|{value}'
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return f'num|{value!r}'
+        return 'null|'  # Missing, null, or a type no listing sorts on
+    
+    @staticmethod
+    def _decode_cursor_value(kind, text):
+        """Decode a value written by _encode_cursor_value()"""
+        if kind == 'date':
+            return datetime.fromisoformat(text)
+        if kind == 'str':
+            return text
+        if kind == 'num':
+            return float(text)
+        if kind == 'null' and text == '':
+            return None
+        raise ValueError(f'Unknown cursor kind {kind}')
+    
     # ========== USER OPERATIONS ==========
     
     def create_user(self, email, password, name, role):
@@ -96,6 +207,14 @@ class Database:
                     {'_id': user['_id']},
                     {'$set': {'token': token, 'last_login': datetime.now()}}
                 )
+                # Re-login replaces the stored token, so revoke the cached one
+                self.sessions.put(token, {
+                    'success': True,
+                    'user_id': str(user['_id']),
+                    'name': user['name'],
+                    'email': user['email'],
+                    'role': user['role']
+                })
                 return {
                     'success': True,
                     'user_id': str(user['_id']),
@@ -110,20 +229,36 @@ class Database:
     
     def verify_token(self, token):
         """Verify session token and return user data"""
+        session = self.get_session(token)
+        if session:
+            return session['user']
+        
         try:
             user = self.users.find_one({'token': token})
             if user:
-                return {
+                user_data = {
                     'success': True,
                     'user_id': str(user['_id']),
                     'name': user['name'],
                     'email': user['email'],
                     'role': user['role']
                 }
+                # Valid, and cached, until the token's expiry window (counted from login) ends
+                expires_at = None
+                if isinstance(user.get('last_login'), datetime):
+                    expires_at = user['last_login'].timestamp() + TOKEN_EXPIRY
+                    if expires_at <= time.time():
+                        return {'success': False, 'error': 'Token expired'}
+                self.sessions.put(token, user_data, expires_at)
+                return user_data
             return {'success': False, 'error': 'Invalid token'}
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
+    def get_session(self, token):
+        """Return the cached session entry for a token, or None"""
+        return self.sessions.get(token)
+    
     # ========== CLASS OPERATIONS ==========
     
     def create_class(self, teacher_id, class_name, section='', subject='', room='', description=''):
@@ -137,7 +272,7 @@ class Database:
                 'room': room,
                 'description': description,
                 'class_code': class_code,
-                'teacher_id': teacher_id,
+                'teacher_id': to_ref(teacher_id),
                 'students': [],
                 'created_at': datetime.now()
             }
@@ -153,6 +288,7 @@ class Database:
     def join_class(self, student_id, class_code):
         """Student joins a class using class code"""
         try:
+            student_id = to_ref(student_id)
             class_data = self.classes.find_one({'class_code': class_code})
             if not class_data:
                 return {'success': False, 'error': 'Invalid class code'}
@@ -164,6 +300,7 @@ class Database:
                 {'class_code': class_code},
                 {'$push': {'students': student_id}}
             )
+            self.assignment_classes.invalidate_class(str(class_data['_id']))
             return {'success': True, 'class_id': str(class_data['_id'])}
         except Exception as e:
             return {'success': False, 'error': str(e)}
@@ -172,9 +309,15 @@ class Database:
         """Get all classes for a user (teacher or student)"""
         try:
             if role == 'teacher':
-                classes = list(self.classes.find({'teacher_id': user_id}))
+                classes = list(self.classes.find({'teacher_id': to_ref(user_id)}))
             else:
-                classes = list(self.classes.find({'students': user_id}))
+                classes = list(self.classes.find({'students': to_ref(user_id)}))
+            
+            # Look up every teacher and student in one query instead of one per person
+            people = self._users_by_id(
+                [c['teacher_id'] for c in classes if 'teacher_id' in c] +
+                [student_id for c in classes for student_id in c.get('students', [])]
+            )
             
             # Convert ObjectId and datetime to string for JSON serialization
             # Also add teacher name and student names
@@ -187,15 +330,14 @@ class Database:
                     # Otherwise it's already a string, keep it as is
                 
                 # Add teacher name
-                if 'teacher_id' in c:
-                    teacher = self.users.find_one({'_id': ObjectId(c['teacher_id'])})
-                    if teacher:
-                        c['teacher_name'] = teacher.get('name', 'Teacher')
+                teacher = people.get(str(c.get('teacher_id')))
+                if teacher:
+                    c['teacher_name'] = teacher.get('name', 'Teacher')
                 
                 # Add student names
                 student_list = []
                 for student_id in c.get('students', []):
-                    student = self.users.find_one({'_id': ObjectId(student_id)})
+                    student = people.get(str(student_id))
                     if student:
                         student_list.append({
                             'id': student_id,
@@ -212,9 +354,10 @@ class Database:
         """Remove a student from a class"""
         try:
             self.classes.update_one(
-                {'_id': class_id},
-                {'$pull': {'students': student_id}}
+                {'_id': to_object_id(class_id)},
+                {'$pull': {'students': to_ref(student_id)}}
             )
+            self.assignment_classes.invalidate_class(to_ref(class_id))
             return {'success': True}
         except Exception as e:
             return {'success': False, 'error': str(e)}
@@ -222,7 +365,8 @@ class Database:
     def delete_class(self, class_id):
         """Delete a class"""
         try:
-            self.classes.delete_one({'_id': class_id})
+            self.classes.delete_one({'_id': to_object_id(class_id)})
+            self.assignment_classes.invalidate_class(to_ref(class_id))
             return {'success': True}
         except Exception as e:
             return {'success': False, 'error': str(e)}
@@ -230,15 +374,14 @@ class Database:
     def get_class_students(self, class_id):
         """Get list of students in a class"""
         try:
-            class_data = self.classes.find_one({'_id': class_id})
+            class_data = self.classes.find_one({'_id': to_object_id(class_id)})
             if not class_data:
                 return {'success': False, 'error': 'Class not found'}
             
             student_ids = class_data.get('students', [])
             students = []
             for sid in student_ids:
-                from bson.objectid import ObjectId
-                user = self.users.find_one({'_id': ObjectId(sid)})
+                user = self.users.find_one({'_id': to_object_id(sid)})
                 if user:
                     students.append({
                         'user_id': str(user['_id']),
@@ -256,7 +399,7 @@ class Database:
         """Create a new assignment"""
         try:
             assignment = {
-                'class_id': class_id,
+                'class_id': to_ref(class_id),
                 'title': title,
                 'description': description,
                 'due_date': due_date,
@@ -268,11 +411,52 @@ class Database:
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
+    def resolve_assignment_class(self, assignment_id):
+        """Find the class an assignment belongs to, through the assignment -> class cache.
+        
+        Misses cost two `_id` lookups (a class_code lookup for assignments
+        that stored a class code in class_id). Returns `class` (`_id` as a
+        string, class_name and the enrolled student ids), or a NOT_FOUND
+        error naming the id that didn't resolve (also for a malformed id).
+        """
+        try:
+            assignment_id = to_ref(assignment_id)
+        except InvalidReference:
+            return {'success': False, 'code': ERR_NOT_FOUND, 'error': 'Assignment not found',
+                    'assignment_id': str(assignment_id)}
+        class_data = self.assignment_classes.get(assignment_id)
+        if class_data is not None:
+            return {'success': True, 'class': class_data}
+        
+        generation = self.assignment_classes.generation
+        assignment = self.assignments.find_one({'_id': to_object_id(assignment_id)}, {'class_id': 1})
+        if not assignment:
+            return {'success': False, 'code': ERR_NOT_FOUND, 'error': 'Assignment not found',
+                    'assignment_id': assignment_id}
+        
+        class_id = assignment.get('class_id')
+        fields = {'class_name': 1, 'students': 1}
+        try:
+            class_data = self.classes.find_one({'_id': to_object_id(class_id)}, fields)
+        except InvalidReference:
+            class_data = self.classes.find_one({'class_code': class_id}, fields) if class_id else None
+        if not class_data:
+            return {'success': False, 'code': ERR_NOT_FOUND, 'error': 'Class not found for this assignment',
+                    'assignment_id': assignment_id, 'class_id': str(class_id)}
+        
+        class_data = {
+            '_id': str(class_data['_id']),
+            'class_name': class_data.get('class_name'),
+            'students': [str(sid) for sid in class_data.get('students', [])]
+        }
+        self.assignment_classes.put(assignment_id, class_data, generation)
+        return {'success': True, 'class': class_data}
+    
     def get_assignments(self, class_id):
         """Get all assignments for a class"""
         try:
             # Sort by created_at descending (newest first)
-            assignments = list(self.assignments.find({'class_id': class_id}).sort('created_at', -1))
+            assignments = list(self.assignments.find({'class_id': to_ref(class_id)}).sort('created_at', -1))
             for a in assignments:
                 a['_id'] = str(a['_id'])
                 # Set default max_points if not present (for old assignments)
@@ -295,26 +479,25 @@ class Database:
     def submit_assignment(self, assignment_id, student_id, file_content=None, text_content=None, original_filename=None):
         """Submit an assignment by storing the file in GridFS."""
         try:
+            assignment_id, student_id = to_ref(assignment_id), to_ref(student_id)
             file_id = None
             if file_content:
                  # Store the file content in GridFS with original filename
-                from gridfs import GridFS
-                fs = GridFS(self.db)
                 filename = original_filename if original_filename else "assignment_submission"
-                file_id = fs.put(file_content, filename=filename)  # Store file in GridFS
+                file_id = self.stream_to_gridfs(self.gridfs, file_content, filename=filename)  # Store file in GridFS
 
             # Store the submission metadata in the database
             submission = {
-                'assignment_id': assignment_id,
-                'student_id': student_id,
-                'file_id': file_id,  # Store the file_id (not the content)
+                'assignment_id': to_ref(assignment_id),
+                'student_id': to_ref(student_id),
+                'file_id': to_optional_ref(file_id),  # Store the file_id (not the content)
                 'original_filename': original_filename,
                 'text_content': text_content or '',  # Ensure text_content is not None
                 'submitted_at': datetime.now()
             }
 
             # Insert the submission record into the database
-            result = self.submissions.insert_one(submission)
+            result = self.insert_with_file(self.submissions, submission, file_id)
             return {'success': True, 'submission_id': str(result.inserted_id)}
 
         except Exception as e:
@@ -324,96 +507,50 @@ class Database:
     def submit_assignment_gridfs(self, assignment_id, user_id, file_content, submission_text, filename):
         """Submit assignment using GridFS for file storage"""
         try:
-            from bson import ObjectId
             import gridfs
             from datetime import datetime
         
             print(f"[DATABASE GRIDFS] Debug - Looking for assignment: {assignment_id}")
+            assignment_id, user_id = to_ref(assignment_id), to_ref(user_id)
         
-            # Verify assignment exists
-            assignment = self.db.assignments.find_one({"_id": ObjectId(assignment_id)})
-            if not assignment:
-                return {'success': False, 'error': 'Assignment not found'}
-        
-            print(f"[DATABASE GRIDFS] Assignment found: {assignment}")
-            print(f"[DATABASE GRIDFS] Assignment class_id: {assignment.get('class_id')}")
-        
-            # Get class_id from assignment
-            class_id = assignment.get('class_id')
-            if not class_id:
-                return {'success': False, 'error': 'Assignment has no class_id'}
-        
-            # First, try to find the class
-            class_data = None
-        
-            # Try 1: Direct match (if class_id is ObjectId string)
-            try:
-                class_data = self.db.classes.find_one({"_id": ObjectId(class_id)})
-                if class_data:
-                    print(f"[DATABASE GRIDFS] Found class by ObjectId(_id)")
-            except:
-                pass  # Not a valid ObjectId string
-        
-            # Try 2: If not found, maybe class_id is actually the class_code?
-                if not class_data:
-                  class_data = self.db.classes.find_one({"class_code": class_id})
-                if class_data:
-                    print(f"[DATABASE GRIDFS] Found class by class_code")
-        
-            # Try 3: Search in any string field
-                if not class_data:
-                # This is a fallback - search for class_id in any field
-                 all_classes = list(self.db.classes.find({}))
-                for cls in all_classes:
-                    # Check if class_id appears in any field
-                    for key, value in cls.items():
-                        if str(value) == str(class_id):
-                            class_data = cls
-                            print(f"[DATABASE GRIDFS] Found class by matching field '{key}'")
-                            break
-                    if class_data:
-                        break
-        
-            if not class_data:
-                # Debug: Print all classes to see what's available
-                all_classes = list(self.db.classes.find({}))
-                print(f"[DATABASE GRIDFS DEBUG] All classes: {all_classes}")
-                return {'success': False, 'error': f'Class not found. Assignment class_id: {class_id}'}
-        
+            # Find the class before accepting any bytes
+            resolved = self.resolve_assignment_class(assignment_id)
+            if not resolved['success']:
+                return resolved
+            class_data = resolved['class']
             print(f"[DATABASE GRIDFS] Class found: {class_data.get('class_name')}")
         
-        # Check if user is enrolled
-            student_ids = [str(sid) for sid in class_data.get("students", [])]
-        
-            if user_id not in student_ids:
+            # Check if user is enrolled
+            if user_id not in class_data['students']:
                 return {'success': False, 'error': 'You are not enrolled in this class'}
         
-            # Store in GridFS
+            # Store in GridFS (only now are any bytes accepted)
             fs = gridfs.GridFS(self.db)
         
-            file_id = fs.put(
+            file_id = self.stream_to_gridfs(
+                fs,
                 file_content,
                 filename=filename,
-                assignment_id=ObjectId(assignment_id),
-                student_id=ObjectId(user_id),
-                class_id=str(class_data["_id"]),  # Store the actual class _id
+                assignment_id=assignment_id,
+                student_id=user_id,
+                class_id=class_data['_id'],
                 upload_date=datetime.utcnow(),
                 content_type="application/octet-stream"
             )
          
         # Create submission record
             submission_data = {
-                "assignment_id": ObjectId(assignment_id),
-                "student_id": ObjectId(user_id),
-                "class_id": str(class_data["_id"]),  # Store actual class _id
-                "file_id": file_id,
+                "assignment_id": assignment_id,
+                "student_id": user_id,
+                "class_id": class_data['_id'],
+                "file_id": str(file_id),
                 "filename": filename,
                 "submission_text": submission_text,
                 "submitted_at": datetime.utcnow(),
                 "status": "submitted"
             }
         
-            result = self.db.submissions.insert_one(submission_data)
+            result = self.insert_with_file(self.db.submissions, submission_data, file_id)
         
             return {
                 'success': True,
@@ -421,6 +558,8 @@ class Database:
                 'file_id': str(file_id)
             }
         
+        except InvalidReference as e:
+            return {'success': False, 'code': ERR_NOT_FOUND, 'error': str(e)}
         except Exception as e:
             print(f"[DATABASE GRIDFS ERROR] {e}")
             import traceback
@@ -430,70 +569,57 @@ class Database:
 
 
     
-    def get_submissions(self, assignment_id):
-        """Get all submissions for an assignment - handles both string and ObjectId"""
+    def insert_with_file(self, collection, record, file_id):
+        """Insert a record referencing a just-stored GridFS file.
+        
+        Earlier submissions are kept, and each still holds its own file
+        reference, so the only file a resubmission can orphan is the new one:
+        it is released if the record can't be stored.
+        """
         try:
-            from bson.objectid import ObjectId
-            from bson.errors import InvalidId
+            return collection.insert_one(record)
+        except Exception:
+            if file_id:
+                self.release_gridfs_file(file_id)
+            raise
+    
+    def get_submissions(self, assignment_id, limit=LIST_PAGE_SIZE, cursor=None,
+                        projection=SUBMISSION_LIST_PROJECTION):
+        """Get a page of submissions for an assignment.
         
+        Newest first; pass the returned `next_cursor` back for the next page.
+        """
+        try:
             print(f"[DATABASE DEBUG] Querying submissions for assignment_id: {assignment_id}")
         
-            # Try to convert to ObjectId, but also try string match
-            submissions = []
+            submissions, next_cursor = self._find_page(
+                self.submissions,
+                {'assignment_id': to_ref(assignment_id)},
+                projection, limit=limit, cursor=cursor
+            )
+            print(f"[DATABASE DEBUG] Found {len(submissions)} submissions")
+            for submission in submissions:
+                canonical_refs(submission, 'submissions')  # Documents the id migration hasn't reached
         
-            try:
-                # Try as ObjectId first
-                assignment_obj_id = ObjectId(assignment_id)
-                submissions = list(self.submissions.find({'assignment_id': assignment_obj_id}))
-                print(f"[DATABASE DEBUG] Found {len(submissions)} submissions with ObjectId match")
-            except InvalidId:
-            # assignment_id is not a valid ObjectId, try as string
-                submissions = list(self.submissions.find({'assignment_id': assignment_id}))
-                print(f"[DATABASE DEBUG] Found {len(submissions)} submissions with string match")
-            except Exception as e:
-                print(f"[DATABASE DEBUG] Error querying: {e}")
+            # One query for every student on the page
+            students = self._users_by_id(s.get('student_id') for s in submissions)
         
             # Get student names and enrich submission data
             for submission in submissions:
                 # Convert ObjectId to string
                 submission['_id'] = str(submission['_id'])
             
-                # Convert assignment_id to string (if it's ObjectId)
-                if 'assignment_id' in submission and isinstance(submission['assignment_id'], ObjectId):
-                    submission['assignment_id'] = str(submission['assignment_id'])
-            
-                # Convert student_id to string
-                if 'student_id' in submission:
-                    submission['student_id'] = str(submission['student_id'])
-            
-                # Convert file_id to string if it exists
-                if submission.get('file_id'):
-                    submission['file_id'] = str(submission['file_id'])
-            
-                # Convert datetime to string
-                if 'submitted_at' in submission and submission['submitted_at']:
+                # Convert datetime to string (older documents may already hold one)
+                if isinstance(submission.get('submitted_at'), datetime):
                     submission['submitted_at'] = submission['submitted_at'].isoformat()
             
                 # Get student name
-                student_id = submission.get('student_id')
-                if student_id:
-                    try:
-                        student = self.users.find_one({'_id': ObjectId(student_id)})
-                        if student:
-                            submission['student_name'] = student.get('name', 'Unknown')
-                            submission['student_email'] = student.get('email', '')
-                        else:
-                           submission['student_name'] = 'Unknown'
-                           submission['student_email'] = ''
-                    except:
-                        submission['student_name'] = 'Unknown'
-                        submission['student_email'] = ''
-                else:
-                    submission['student_name'] = 'Unknown'
-                    submission['student_email'] = ''
+                student = students.get(submission.get('student_id'))
+                submission['student_name'] = student.get('name', 'Unknown') if student else 'Unknown'
+                submission['student_email'] = student.get('email', '') if student else ''
         
             print(f"[DATABASE DEBUG] Returning {len(submissions)} enriched submissions")
-            return {'success': True, 'submissions': submissions}
+            return {'success': True, 'submissions': submissions, 'next_cursor': next_cursor}
         
         except Exception as e:
             print(f"[DATABASE ERROR] get_submissions failed: {e}")
@@ -506,10 +632,11 @@ class Database:
         """Get a specific student's submission for an assignment"""
         try:
             submission = self.submissions.find_one({
-                'assignment_id': assignment_id,
-                'student_id': student_id
+                'assignment_id': to_ref(assignment_id),
+                'student_id': to_ref(student_id)
             })
             if submission:
+                canonical_refs(submission, 'submissions')
                 submission['_id'] = str(submission['_id'])
                 return {'success': True, 'submission': submission}
             else:
@@ -517,90 +644,130 @@ class Database:
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
-    def get_teacher_submissions(self, teacher_id):
-        """Get all submissions for all of teacher's assignments"""
+    def get_teacher_submissions(self, teacher_id, limit=LIST_PAGE_SIZE, cursor=None,
+                                projection=TEACHER_SUBMISSION_LIST_PROJECTION):
+        """Get a page of submissions for all of teacher's assignments (newest first)"""
         try:
-            from bson.objectid import ObjectId
-            
             # Get all classes taught by this teacher
-            teacher_classes = list(self.classes.find({'teacher_id': teacher_id}))
-            class_ids = [cls['_id'] for cls in teacher_classes]
+            teacher_classes = list(self.classes.find({'teacher_id': to_ref(teacher_id)}, {'class_name': 1}))
+            classes_by_id = {str(cls['_id']): cls for cls in teacher_classes}
             
             # Get all assignments for these classes
-            assignments = list(self.assignments.find({'class_id': {'$in': [str(cid) for cid in class_ids]}}))
-            assignment_ids = [str(assgn['_id']) for assgn in assignments]
+            assignments = [canonical_refs(assgn, 'assignments') for assgn in self.assignments.find(
+                {'class_id': {'$in': list(classes_by_id)}}, {'title': 1, 'class_id': 1}
+            )]
+            assignments_by_id = {str(assgn['_id']): assgn for assgn in assignments}
             
-            # Get all submissions for these assignments
-            submissions = list(self.submissions.find({'assignment_id': {'$in': assignment_ids}}))
+            # Get one page of submissions for these assignments
+            submissions, next_cursor = self._find_page(
+                self.submissions,
+                {'assignment_id': {'$in': list(assignments_by_id)}},
+                projection, limit=limit, cursor=cursor
+            )
+            students = self._users_by_id((s.get('student_id') for s in submissions), fields=('name',))
             
             # Enrich with student, assignment, and class info
             for s in submissions:
+                canonical_refs(s, 'submissions')
                 s['_id'] = str(s['_id'])
                 
                 # Get student name
-                user = self.users.find_one({'_id': ObjectId(s['student_id'])})
+                user = students.get(s.get('student_id'))
                 if user:
                     s['student_name'] = user['name']
                 
                 # Get assignment title
-                assignment = next((a for a in assignments if str(a['_id']) == s['assignment_id']), None)
+                assignment = assignments_by_id.get(s['assignment_id'])
                 if assignment:
                     s['assignment_title'] = assignment['title']
                     
                     # Get class name
-                    class_obj = next((c for c in teacher_classes if str(c['_id']) == assignment['class_id']), None)
+                    class_obj = classes_by_id.get(assignment['class_id'])
                     if class_obj:
                         s['class_name'] = class_obj['class_name']
                 
                 # Format date
-                if 'submitted_at' in s:
+                if isinstance(s.get('submitted_at'), datetime):
                     s['submitted_at'] = s['submitted_at'].strftime('%Y-%m-%d %H:%M')
             
-            # Sort by submission date (newest first)
-            submissions.sort(key=lambda x: x.get('submitted_at', ''), reverse=True)
-            
-            return {'success': True, 'submissions': submissions}
+            return {'success': True, 'submissions': submissions, 'next_cursor': next_cursor}
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
-    def get_student_all_assignments(self, student_id):
-        """Get all assignments for all of student's classes"""
+    def get_student_all_assignments(self, student_id, limit=LIST_PAGE_SIZE, cursor=None,
+                                    due_within_days=None, not_submitted=False):
+        """Get a page of assignments across all of student's classes (newest first).
+        
+        `due_within_days` keeps assignments due between today and that many
+        days from now (due dates are stored as typed, so only ISO dates such
+        as 2025-12-31 can match); `not_submitted` drops the ones the student
+        has already handed in.
+        """
         try:
-            from bson.objectid import ObjectId
-            
             # Get all classes the student is enrolled in
-            student_classes = list(self.classes.find({'students': student_id}))
-            class_ids = [str(cls['_id']) for cls in student_classes]
+            student_id = to_ref(student_id)
+            student_classes = list(self.classes.find({'students': student_id}, {'class_name': 1}))
+            classes_by_id = {str(cls['_id']): cls for cls in student_classes}
             
-            # Get all assignments for these classes
-            assignments = list(self.assignments.find({'class_id': {'$in': class_ids}}))
+            query = {'class_id': {'$in': list(classes_by_id)}}
+            if due_within_days is not None:
+                today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+                until = today + timedelta(days=due_within_days + 1)
+                query['$or'] = [
+                    {'due_date': {'$gte': today.strftime('%Y-%m-%d'), '$lt': until.strftime('%Y-%m-%d'),
+                                  '$regex': r'^\d{4}-\d{2}-\d{2}'}},
+                    {'due_date': {'$gte': today, '$lt': until}}
+                ]
+            
+            # The student's submissions, found through the (student_id, assignment_id) index
+            if not_submitted:
+                handed_in = []
+                for submission in self.submissions.find({'student_id': student_id}, {'assignment_id': 1}):
+                    try:
+                        handed_in.append(to_object_id(submission['assignment_id']))
+                    except (InvalidReference, KeyError):
+                        continue  # Not a real assignment, so it can't hide one
+                query['_id'] = {'$nin': handed_in}
+            
+            # Get one page of assignments for these classes
+            assignments, next_cursor = self._find_page(
+                self.assignments, query, sort_field='created_at',
+                limit=limit, cursor=cursor
+            )
+            
+            submitted = {}
+            if assignments and not not_submitted:
+                for submission in self.submissions.find(
+                    {'student_id': student_id, 'assignment_id': {'$in': [str(assgn['_id']) for assgn in assignments]}},
+                    {'assignment_id': 1, 'submitted_at': 1}
+                ):
+                    submitted[canonical_refs(submission, 'submissions')['assignment_id']] = submission
             
             # Enrich with class info and submission status
             for assgn in assignments:
+                canonical_refs(assgn, 'assignments')
                 assgn['_id'] = str(assgn['_id'])
                 
                 # Convert datetime to string for JSON serialization
-                if 'created_at' in assgn and assgn['created_at']:
+                if isinstance(assgn.get('created_at'), datetime):
                     assgn['created_at'] = assgn['created_at'].isoformat()
+                if isinstance(assgn.get('due_date'), datetime):
+                    assgn['due_date'] = assgn['due_date'].isoformat()
                 
                 # Get class name
-                class_obj = next((c for c in student_classes if str(c['_id']) == assgn['class_id']), None)
+                class_obj = classes_by_id.get(assgn['class_id'])
                 if class_obj:
                     assgn['class_name'] = class_obj['class_name']
                 
                 # Check if student has submitted
-                submission = self.submissions.find_one({
-                    'assignment_id': str(assgn['_id']),
-                    'student_id': student_id
-                })
+                submission = submitted.get(assgn['_id'])
                 assgn['submitted'] = submission is not None
-                if submission and 'submitted_at' in submission:
+                if submission and isinstance(submission.get('submitted_at'), datetime):
                     assgn['submitted_at'] = submission['submitted_at'].isoformat()
+                elif submission and 'submitted_at' in submission:
+                    assgn['submitted_at'] = submission['submitted_at']
             
-            # Sort by creation date (newest first)
-            assignments.sort(key=lambda x: x.get('created_at', ''), reverse=True)
-            
-            return {'success': True, 'assignments': assignments}
+            return {'success': True, 'assignments': assignments, 'next_cursor': next_cursor}
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
@@ -610,8 +777,8 @@ class Database:
         """Post an announcement"""
         try:
             announcement = {
-                'class_id': class_id,
-                'teacher_id': teacher_id,
+                'class_id': to_ref(class_id),
+                'teacher_id': to_ref(teacher_id),
                 'title': title,
                 'content': content,
                 'file_path': file_path,
@@ -625,7 +792,7 @@ class Database:
     def get_announcements(self, class_id):
         """Get all announcements for a class"""
         try:
-            announcements = list(self.announcements.find({'class_id': class_id}).sort('created_at', -1))
+            announcements = list(self.announcements.find({'class_id': to_ref(class_id)}).sort('created_at', -1))
             for a in announcements:
                 a['_id'] = str(a['_id'])
                 if 'created_at' in a and a['created_at']:
@@ -643,12 +810,12 @@ class Database:
         """Post a comment on an item (announcement, assignment, or material)"""
         try:
             comment = {
-                'item_id': item_id,
+                'item_id': to_ref(item_id),
                 'item_type': item_type,
-                'class_id': class_id,
-                'user_id': user_id,
+                'class_id': to_ref(class_id),
+                'user_id': to_ref(user_id),
                 'comment_text': comment_text,
-                'parent_comment_id': parent_comment_id,
+                'parent_comment_id': to_optional_ref(parent_comment_id),
                 'created_at': datetime.now()
             }
             print(f"[DEBUG] Inserting comment: {comment}")
@@ -663,7 +830,7 @@ class Database:
         """Get all comments for an item"""
         try:
             # Query for new schema comments only
-            query = {'item_id': item_id, 'item_type': item_type}
+            query = {'item_id': to_ref(item_id), 'item_type': item_type}
             
             print(f"[DEBUG] Querying comments with: {query}")
             comments = list(self.comments.find(query).sort('created_at', -1))
@@ -680,8 +847,7 @@ class Database:
                     print(f"[DEBUG] Renamed user_name to commenter_name")
                 else:
                     # Get user name for new structure
-                    from bson.objectid import ObjectId
-                    user = self.users.find_one({'_id': ObjectId(c['user_id'])})
+                    user = self.users.find_one({'_id': to_object_id(c['user_id'])})
                     if user:
                         c['commenter_name'] = user['name']
                     else:
@@ -717,16 +883,15 @@ class Database:
        """Upload class material using GridFS to store the file"""
        try:
            # Use GridFS to store the file content
-           fs = GridFS(self.db)
-           file_id = fs.put(file_content, filename=title)  # Store the file content in GridFS
+           file_id = self.stream_to_gridfs(self.gridfs, file_content, filename=title)  # Store the file content in GridFS
 
            # Create the material document with file_id (instead of file_path)
            material = {
-               'class_id': class_id,
-               'teacher_id': teacher_id,
+               'class_id': to_ref(class_id),
+               'teacher_id': to_ref(teacher_id),
                'title': title,
                'material_type': material_type,
-               'file_id': file_id,  # Store the file_id from GridFS
+               'file_id': str(file_id),  # Store the file_id from GridFS
                'uploaded_at': datetime.now()
            }
            result = self.materials.insert_one(material)  # Insert the material record into the DB
@@ -739,14 +904,9 @@ class Database:
     def get_materials(self, class_id):
         """Get all materials for a class - GridFS ONLY version"""
         try:
-            from bson.objectid import ObjectId
             import datetime
         
-            # Convert string to ObjectId if needed
-            if isinstance(class_id, str):
-               class_id = ObjectId(class_id)
-        
-            materials = list(self.materials.find({'class_id': class_id}).sort('uploaded_at', -1))
+            materials = list(self.materials.find({'class_id': to_ref(class_id)}).sort('uploaded_at', -1))
         
             serializable_materials = []
         
@@ -767,7 +927,7 @@ class Database:
                 if 'teacher_id' in material_data:
                     teacher_id_str = material_data['teacher_id']
                     try:
-                        teacher = self.users.find_one({'_id': ObjectId(teacher_id_str)})
+                        teacher = self.users.find_one({'_id': to_object_id(teacher_id_str)})
                         if teacher:
                             material_data['teacher_name'] = teacher.get('name', 'Unknown Teacher')
                     except:
@@ -778,7 +938,7 @@ class Database:
                     file_id_str = material_data['file_id']
                     try:
                         if hasattr(self, 'gridfs') and self.gridfs:
-                            gridfs_file = self.gridfs.get(ObjectId(file_id_str))
+                            gridfs_file = self.gridfs.get(to_object_id(file_id_str))
                             if gridfs_file:
                                 # Add filename if missing
                                 if 'filename' not in material_data or not material_data['filename']:
@@ -800,8 +960,7 @@ class Database:
     def get_class_by_id(self, class_id):
         """Get class data by class ID"""
         try:
-            from bson.objectid import ObjectId
-            class_data = self.classes.find_one({'_id': ObjectId(class_id)})
+            class_data = self.classes.find_one({'_id': to_object_id(class_id)})
             if class_data:
                 class_data['_id'] = str(class_data['_id'])
                 return {'success': True, 'class': class_data}
@@ -812,8 +971,7 @@ class Database:
     def get_user_by_id(self, user_id):
         """Get user data by user ID"""
         try:
-            from bson.objectid import ObjectId
-            user = self.users.find_one({'_id': ObjectId(user_id)})
+            user = self.users.find_one({'_id': to_object_id(user_id)})
             if user:
                 user['_id'] = str(user['_id'])
                 return {'success': True, 'user': user}
@@ -826,9 +984,8 @@ class Database:
     def save_notification(self, user_id, notification_data):
         """Save notification to database"""
         try:
-            from bson.objectid import ObjectId
             notification = {
-                'user_id': ObjectId(user_id),
+                'user_id': to_ref(user_id),
                 'type': notification_data.get('type'),
                 'class_id': notification_data.get('class_id'),
                 'class_name': notification_data.get('class_name'),
@@ -845,14 +1002,12 @@ class Database:
     def get_user_notifications(self, user_id, limit=50):
         """Get notifications for a user"""
         try:
-            from bson.objectid import ObjectId
             notifications = list(self.db.notifications.find(
-                {'user_id': ObjectId(user_id)}
+                {'user_id': to_ref(user_id)}
             ).sort('created_at', -1).limit(limit))
             
             for notif in notifications:
                 notif['_id'] = str(notif['_id'])
-                notif['user_id'] = str(notif['user_id'])
             
             return {'success': True, 'notifications': notifications}
         except Exception as e:
@@ -861,9 +1016,8 @@ class Database:
     def mark_notification_read(self, notification_id):
         """Mark notification as read"""
         try:
-            from bson.objectid import ObjectId
             self.db.notifications.update_one(
-                {'_id': ObjectId(notification_id)},
+                {'_id': to_object_id(notification_id)},
                 {'$set': {'read': True}}
             )
             return {'success': True}
@@ -874,16 +1028,11 @@ class Database:
     def download_material_from_server(self, file_id):
         """Download a file from GridFS"""
         try:
-            from gridfs import GridFS
-            from bson.objectid import ObjectId
-        
-            fs = GridFS(self.db)
-        
             # Get file from GridFS
-            grid_out = fs.get(ObjectId(file_id))
+            grid_out, content = self.open_gridfs_file(file_id)
         
-            # Read file content
-            file_content = grid_out.read()
+            # Read file content (decompressed if it is stored compressed)
+            file_content = read_stored_file(content)
         
         # Get filename - use what's stored in GridFS
             filename = grid_out.filename
@@ -891,7 +1040,7 @@ class Database:
         # If filename is generic, try to get original filename from submission
             if filename == "assignment_submission":
             # Find submission with this file_id
-                submission = self.submissions.find_one({'file_id': file_id})
+                submission = self.submissions.find_one({'file_id': to_ref(file_id)})
                 if submission and submission.get('original_filename'):
                     filename = submission['original_filename']
         
@@ -900,37 +1049,46 @@ class Database:
                 'file_content': file_content,
                 'filename': filename,
                 'content_type': grid_out.content_type,
-                'size': grid_out.length
+                'size': len(file_content)
             }
         except Exception as e:
             return {'success': False, 'error': str(e)}
         
 
-    def download_material_gridfs(self, file_id):
-        """Download material from GridFS - returns raw binary"""
+    def download_material_gridfs(self, file_id, offset=0, length=None):
+        """Open a GridFS file for download - returns an iterator of its bytes.
+        
+        `offset` and `length` select a byte range of the original content
+        (to the end of the file when `length` is None); `size` is the
+        number of bytes the iterator yields and `total_size` the file's.
+        """
         try:
-            from bson import ObjectId
             import gridfs
         
-            fs = gridfs.GridFS(self.db)
-        
-            # Get file from GridFS
-            grid_file = fs.get(ObjectId(file_id))
-            file_content = grid_file.read()  # RAW binary
+            # Get file from GridFS (chunks are fetched lazily while iterating)
+            grid_file, content = self.open_gridfs_file(file_id)
         
             # Get file metadata
             filename = grid_file.filename
             content_type = grid_file.content_type or 'application/octet-stream'
             upload_date = grid_file.upload_date
         
-            print(f"[DATABASE GRIDFS] Retrieved {len(file_content)} bytes of raw binary")
+            total_size = stored_length(grid_file)
+            if offset > total_size:
+                return {'success': False, 'error': f'Offset {offset} is beyond the end of the file ({total_size} bytes)'}
+            size = total_size - offset if length is None else min(length, total_size - offset)
+            print(f"[DATABASE GRIDFS] Opened {total_size} byte file for streaming "
+                  f"({grid_file.length} bytes stored), sending {size} from offset {offset}")
         
             return {
                 'success': True,
-                'file_content': file_content,  # RAW BINARY
+                'file_stream': iter_stored_range(content, offset, size),  # Original bytes, chunk by chunk
                 'filename': filename,
                 'content_type': content_type,
-                'size': len(file_content),
+                'size': size,
+                'offset': offset,
+                'total_size': total_size,
+                'sha256': getattr(grid_file, 'sha256', None),  # Of the whole file; None for older uploads
                 'upload_date': upload_date.isoformat() if upload_date else None
             }
         
@@ -941,21 +1099,201 @@ class Database:
             import traceback
             traceback.print_exc()
             return {'success': False, 'error': f'Download failed: {str(e)}'}
+
+    def get_file_info(self, file_id):
+        """Metadata of a GridFS file without opening it (one indexed lookup, no chunks).
+
+        `etag` changes whenever the content does: the SHA-256 for files
+        stored through stream_to_gridfs(), otherwise built from the size and
+        upload time (GridFS ids are never reused, so those don't change).
+        """
+        try:
+            info = self.gridfs_files.find_one(
+                {'_id': to_object_id(file_id)},
+                {'filename': 1, 'contentType': 1, 'length': 1, 'raw_length': 1,
+                 'sha256': 1, 'uploadDate': 1}
+            )
+            if info is None:
+                return {'success': False, 'error': 'File not found in GridFS'}
+
+            upload_date = info.get('uploadDate')
+            total_size = info.get('raw_length') or info.get('length', 0)
+            sha256 = info.get('sha256')
+            etag = sha256 or f"{total_size}-{upload_date.timestamp() if upload_date else 0:.3f}"
+            return {
+                'success': True,
+                'filename': info.get('filename'),
+                'content_type': info.get('contentType') or 'application/octet-stream',
+                'total_size': total_size,
+                'sha256': sha256,
+                'etag': etag,
+                'upload_date': upload_date.isoformat() if upload_date else None
+            }
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+
+    def stream_to_gridfs(self, fs, source, **file_args):
+        """Write bytes or a readable stream into a new GridFS file.
+        
+        Streams are copied GRIDFS_STREAM_CHUNK bytes at a time, so memory use
+        stays bounded whatever the file size. If reading fails part way (e.g.
+        the client disconnects) the file is aborted, which deletes the chunks
+        already written, and the error is re-raised.
+        
+        The content is hashed with SHA-256 on the way through. When an
+        identical file is already stored, the new file keeps its own
+        document (filename and owner) but its chunks are dropped in favour
+        of the existing file's, whose refcount is raised; callers must
+        release files with release_gridfs_file() and open them with
+        open_gridfs_file().
+        
+        Compressible content is stored compressed (see server/storage_codec.py);
+        read it back with iter_stored_chunks()/read_stored_file().
+        """
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            source = io.BytesIO(source)
+        
+        digest = hashlib.sha256()
+        raw_length = 0
+        encoder = None
+        grid_in = fs.new_file(**file_args)
+        try:
+            while True:
+                chunk = source.read(GRIDFS_STREAM_CHUNK)
+                if not chunk:
+                    break
+                if raw_length == 0:
+                    # The first block decides whether the file is stored compressed
+                    codec = choose_storage_codec(chunk)
+                    if codec:
+                        encoder = storage_compressor(codec)
+                        grid_in.storage_codec = codec
+                digest.update(chunk)
+                raw_length += len(chunk)
+                grid_in.write(encoder.compress(chunk) if encoder else chunk)
+            if encoder:
+                grid_in.write(encoder.flush())
+            grid_in.sha256 = digest.hexdigest()
+            grid_in.raw_length = raw_length
+            grid_in.refcount = 1
+            grid_in.close()
+        except BaseException:
+            grid_in.abort()
+            raise
+        
+        if encoder:
+            METRICS.increment('gridfs.compressed.files')
+            METRICS.increment('gridfs.compressed.raw_bytes', raw_length)
+            METRICS.increment('gridfs.compressed.stored_bytes', grid_in.length)
+        return self.deduplicate_gridfs_file(fs, grid_in)
+    
+    def deduplicate_gridfs_file(self, fs, grid_in):
+        """Share an older identical file's chunks with a just-written GridFS file, if any.
+        
+        The new file keeps its own document, so each upload is still served
+        under its own filename and metadata; `content_id` points at the file
+        holding the chunks. Only older files are candidates, so two
+        identical uploads finishing at the same time never both defer to
+        each other.
+        """
+        existing = self.gridfs_files.find_one_and_update(
+            {'sha256': grid_in.sha256, '_id': {'$lt': grid_in._id},
+             'content_id': {'$exists': False}, 'refcount': {'$gt': 0}},
+            {'$inc': {'refcount': 1}},
+            sort=[('_id', 1)],
+            projection={'_id': 1}
+        )
+        if existing is None:
+            return grid_in._id
+        
+        self.gridfs_chunks.delete_many({'files_id': grid_in._id})
+        self.gridfs_files.update_one(
+            {'_id': grid_in._id},
+            {'$set': {'content_id': existing['_id']}, '$unset': {'refcount': ''}}
+        )
+        METRICS.increment('gridfs.dedup.hits')
+        METRICS.increment('gridfs.dedup.bytes_saved', grid_in.length)
+        print(f"[DATABASE GRIDFS] Duplicate of {existing['_id']} ({grid_in.length} bytes), sharing its chunks")
+        return grid_in._id
+    
+    def open_gridfs_file(self, file_id):
+        """Open a GridFS file - returns (its own GridOut, the GridOut holding its bytes).
         
+        The two differ for deduplicated uploads: name, type and dates come
+        from the first, content from the second.
+        """
+        grid_file = self.gridfs.get(to_object_id(file_id))
+        content_id = getattr(grid_file, 'content_id', None)
+        return grid_file, self.gridfs.get(content_id) if content_id else grid_file
+    
+    def release_gridfs_file(self, file_id):
+        """Drop one reference to a GridFS file; its chunks go when none are left"""
+        try:
+            document = self.gridfs_files.find_one({'_id': to_object_id(file_id)}, {'content_id': 1})
+            if document is None:
+                return {'success': False, 'error': 'File not found in GridFS'}
+            
+            # A deduplicated upload owns no chunks: drop its document and
+            # release the file it shares them with
+            content_id = document.get('content_id')
+            if content_id is not None:
+                self.gridfs_files.delete_one({'_id': document['_id']})
+            
+            remaining = self.gridfs_files.find_one_and_update(
+                {'_id': content_id or document['_id']},
+                {'$inc': {'refcount': -1}},
+                projection={'refcount': 1},
+                return_document=ReturnDocument.AFTER
+            )
+            if remaining is None:
+                return {'success': True, 'deleted': False}
+            
+            # Files stored before deduplication have no refcount and go at once
+            if remaining['refcount'] <= 0:
+                self.gridfs.delete(remaining['_id'])
+            return {'success': True, 'deleted': remaining['refcount'] <= 0}
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+    
+    def dedup_stats(self):
+        """Shared GridFS files and the bytes deduplication is saving"""
+        totals = list(self.gridfs_files.aggregate([
+            {'$match': {'refcount': {'$gt': 1}}},
+            {'$group': {
+                '_id': None,
+                'shared_files': {'$sum': 1},
+                'references': {'$sum': '$refcount'},
+                'bytes_saved': {'$sum': {'$multiply': ['$length', {'$subtract': ['$refcount', 1]}]}}
+            }}
+        ]))
+        if not totals:
+            return {'shared_files': 0, 'references': 0, 'bytes_saved': 0}
+        totals[0].pop('_id')
+        return totals[0]
+    
     def upload_material_gridfs(self, class_id, teacher_id, title, material_type, file_content, filename=None):
         """Upload material to GridFS - SIMPLIFIED VERSION WITHOUT NOTIFICATIONS"""
         try:
-            from bson.objectid import ObjectId
             import datetime
         
             print(f"[DATABASE MATERIAL GRIDFS] Uploading material to class {class_id}")
         
+            # Validate the class before accepting any bytes
+            try:
+                class_id, teacher_id = to_ref(class_id), to_ref(teacher_id)
+                class_exists = self.classes.find_one({'_id': to_object_id(class_id)}, {'_id': 1})
+            except InvalidReference:
+                class_exists = None
+            if not class_exists:
+                return {'success': False, 'error': 'Class not found'}
+        
             # Generate filename if not provided
             if not filename:
                filename = f"material_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.bin"
         
             # Store file in GridFS
-            file_id = self.gridfs.put(
+            file_id = self.stream_to_gridfs(
+                self.gridfs,
                 file_content,
                 filename=filename,
                 content_type='application/octet-stream'
@@ -965,11 +1303,11 @@ class Database:
         
             # Create material document
             material_doc = {
-                'class_id': ObjectId(class_id) if isinstance(class_id, str) else class_id,
-                'teacher_id': ObjectId(teacher_id) if isinstance(teacher_id, str) else teacher_id,
+                'class_id': class_id,
+                'teacher_id': teacher_id,
                 'title': title,
                 'material_type': material_type,
-                'file_id': file_id,
+                'file_id': str(file_id),
                'filename': filename,
                'uploaded_at': datetime.datetime.now()
             }
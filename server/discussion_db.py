@@ -1,4 +1,4 @@
-from pymongo import MongoClient, ASCENDING, DESCENDING
+from pymongo import ASCENDING, DESCENDING
 from bson.objectid import ObjectId
 from datetime import datetime
 import sys
@@ -7,13 +7,14 @@ import os
 # Add project root to path to import config
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from config.config import MONGODB_URI, DATABASE_NAME
+from server.mongo import get_client
 
 
 class DiscussionDB:
 	"""Small helper to manage discussion messages collection."""
 	def __init__(self, uri: str = None):
 		uri = uri or MONGODB_URI
-		self.client = MongoClient(uri)
+		self.client = get_client(uri)  # The process's shared client and pool
 		self.db = self.client[DATABASE_NAME]
 		self.messages = self.db['messages']
 		# Index to speed up queries by class and time
@@ -50,7 +51,8 @@ class DiscussionDB:
 		cursor = self.messages.find(query).sort('created_at', DESCENDING).limit(limit)
 		out = []
 		for d in cursor:
-			d['msg_id'] = str(d.get('_id'))
+			# ids as strings so the reply can go out over the wire
+			d['_id'] = d['msg_id'] = str(d.get('_id'))
 			# convert datetime to isoformat for safe JSON transfer
 			if isinstance(d.get('created_at'), datetime):
 				d['created_at'] = d['created_at'].isoformat()
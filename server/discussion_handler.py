@@ -1,11 +1,12 @@
 import sys
 import os
 from typing import Optional
-import json
 
 # allow importing project modules
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from server.discussion_db import DiscussionDB
+from config.config import CODEC_JSON
+from protocol.codec import encode_frame
 
 RESP_SUCCESS = 'SUCCESS'
 RESP_ERROR = 'ERROR'
@@ -76,12 +77,14 @@ class DiscussionHandler:
 			try:
 				if _notifier is not None:
 					payload = {'type': 'MESSAGE', 'message': safe_doc}
-					data_bytes = json.dumps(payload).encode()
-					length_prefix = len(data_bytes).to_bytes(4, byteorder='big')
+					frames = {}  # (codec, compression) -> encoded frame, each encoded once
 					# Send to all online sockets
 					for user_id, (sock, user_data) in list(_notifier.online_clients.items()):
 						try:
-							sock.sendall(length_prefix + data_bytes)
+							settings = (getattr(sock, 'codec', CODEC_JSON), getattr(sock, 'compression', None))
+							if settings not in frames:
+								frames[settings] = encode_frame(payload, *settings)
+							sock.sendall(frames[settings])
 						except Exception:
 							# If sending fails, unregister that client from notifier
 							try:
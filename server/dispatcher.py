@@ -0,0 +1,107 @@
+# Request Dispatcher for LearnLive
+#
+# Decoded messages are queued on a bounded queue and executed by a fixed
+# pool of worker threads, so the number of concurrent MongoDB/GridFS
+# operations is capped no matter how many clients are connected. Message
+# types with their own limit (e.g. GridFS uploads) are admitted only while
+# a slot is free. When either limit is hit the request is rejected at once
+# with a structured BUSY error instead of waiting.
+
+import queue
+import threading
+import sys
+import os
+from concurrent.futures import Future
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.config import *
+from server.metrics import METRICS
+
+
+class RequestDispatcher:
+    def __init__(self, workers=DISPATCH_WORKERS, queue_size=DISPATCH_QUEUE_SIZE, type_limits=None):
+        """Start the worker pool"""
+        if type_limits is None:
+            type_limits = DISPATCH_TYPE_LIMITS
+
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.queue_size = queue_size
+        self.type_limits = {
+            msg_type: threading.BoundedSemaphore(limit)
+            for msg_type, limit in type_limits.items()
+        }
+        self.active = 0
+        self.active_lock = threading.Lock()
+        self.workers = []
+
+        for i in range(workers):
+            worker = threading.Thread(target=self._worker, name=f'learnlive-worker-{i}')
+            worker.daemon = True
+            worker.start()
+            self.workers.append(worker)
+
+        METRICS.register_gauge('dispatch.queue_depth', self.queue.qsize)
+        METRICS.register_gauge('dispatch.queue_capacity', lambda: self.queue_size)
+        METRICS.register_gauge('dispatch.workers', lambda: len(self.workers))
+        METRICS.register_gauge('dispatch.active', lambda: self.active)
+
+        print(f"🧵 Dispatcher started: {workers} workers, queue size {queue_size}")
+
+    def submit(self, msg_type, func, *args):
+        """Queue `func(*args)` for a worker.
+
+        Returns (future, None) when admitted, or (None, busy_response) when
+        the per-type limit or the queue is full.
+        """
+        limiter = self.type_limits.get(msg_type)
+        if limiter is not None and not limiter.acquire(blocking=False):
+            METRICS.increment('dispatch.rejected')
+            METRICS.increment(f'dispatch.rejected.{msg_type}')
+            return None, self.busy_response(msg_type, f'Too many concurrent {msg_type} requests')
+
+        future = Future()
+        try:
+            self.queue.put_nowait((future, limiter, func, args))
+        except queue.Full:
+            if limiter is not None:
+                limiter.release()
+            METRICS.increment('dispatch.rejected')
+            METRICS.increment('dispatch.rejected.queue_full')
+            return None, self.busy_response(msg_type, 'Request queue is full')
+
+        METRICS.increment('dispatch.accepted')
+        return future, None
+
+    def busy_response(self, msg_type, reason):
+        """Build the error returned to a client whose request was rejected"""
+        return {
+            'type': RESP_ERROR,
+            'success': False,
+            'code': ERR_BUSY,
+            'error': 'Server is busy, please try again shortly',
+            'reason': reason,
+            'request_type': msg_type,
+            'retry_after': DISPATCH_RETRY_AFTER
+        }
+
+    def _worker(self):
+        """Run queued requests until the process exits"""
+        while True:
+            future, limiter, func, args = self.queue.get()
+            try:
+                if not future.set_running_or_notify_cancel():
+                    continue
+
+                with self.active_lock:
+                    self.active += 1
+                try:
+                    future.set_result(func(*args))
+                except BaseException as e:
+                    future.set_exception(e)
+                finally:
+                    with self.active_lock:
+                        self.active -= 1
+            finally:
+                if limiter is not None:
+                    limiter.release()
+                self.queue.task_done()
@@ -1,12 +1,55 @@
 # File Transfer Handler for LearnLive
+#
+# Chunked uploads are resumable. Every chunk is written at its own offset
+# (chunk_number * chunk_size) into a preallocated .part file, so chunks may
+# arrive in any order or more than once, and a bitmap of received chunks is
+# kept on disk next to it. After a disconnect the client sends
+# START_FILE_TRANSFER (or QUERY_TRANSFER) again with the same transfer_id,
+# gets back the missing chunk ranges and sends only those.
+#
+# Clients keep a window of chunks in flight (negotiated at start along with
+# a larger chunk size) and may spread one transfer over several
+# connections. Each CHUNK_ACK carries a cumulative ACK (every chunk below
+# it is on disk) plus a few SACK blocks of chunks received past it, so a
+# sender can skip anything another stream has already delivered.
+#
+# Current clients send each chunk's bytes raw right after a small
+# FILE_CHUNK header frame (`chunk_length`); the server's reader collects
+# them and they are written straight from that buffer. `chunk_data` inside
+# the message (base64 over JSON) is still accepted from older clients.
+#
+# A background reaper closes idle transfers and deletes (or quarantines)
+# abandoned ones. Every started transfer reserves its full size against a
+# per-user and a global quota; the byte counts are rebuilt from
+# UPLOAD_FOLDER at startup and kept up to date in memory after that.
 
 import os
 import json
+import re
 import sys
 import base64
+import threading
+import time
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from config.config import *
+from server.metrics import METRICS
+
+# Partial files and their state live here until the upload completes
+PARTIAL_FOLDER = os.path.join(UPLOAD_FOLDER, '.partial')
+# Abandoned partial uploads are moved here when TRANSFER_QUARANTINE is set
+QUARANTINE_FOLDER = os.path.join(UPLOAD_FOLDER, '.quarantine')
+TRANSFER_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+
+def _pwrite(fd, data, offset):
+    """Write `data` at `offset` without moving a shared file position"""
+    if hasattr(os, 'pwrite'):
+        os.pwrite(fd, data, offset)
+        return
+    # Windows has no pwrite; callers hold the transfer lock, so seek+write is safe
+    os.lseek(fd, offset, os.SEEK_SET)
+    os.write(fd, data)
 
 
 class FileHandler:
@@ -15,20 +58,277 @@ class FileHandler:
         # Create uploads directory if it doesn't exist
         if not os.path.exists(UPLOAD_FOLDER):
             os.makedirs(UPLOAD_FOLDER)
+        os.makedirs(PARTIAL_FOLDER, exist_ok=True)
+        
+        self.active_transfers = {}  # transfer_id -> file_info (open transfers only)
+        self.lock = threading.Lock()  # Guards active_transfers and the usage counters
+        self.chunk_size = TRANSFER_CHUNK_SIZE
         
-        self.active_transfers = {}  # transfer_id -> file_info
-        self.chunk_size = 8192  # 8KB chunks
+        # Quota accounting: unfinished transfers reserve their full size
+        self.reserved_by_user = {}  # user_id -> bytes
+        self.reserved_bytes = 0
+        self.stored_bytes = 0  # Everything else under UPLOAD_FOLDER
+        self._rebuild_usage()
+        METRICS.register_gauge('transfers', self.usage_snapshot)
+        
+        self.reaper_stop = threading.Event()
+        self.reaper = threading.Thread(target=self._reap, name='learnlive-transfer-reaper')
+        self.reaper.daemon = True
+        self.reaper.start()
         print("📁 File handler initialized")
     
+    def _rebuild_usage(self):
+        """Recount stored and reserved bytes from what is on disk"""
+        for root, _, names in os.walk(UPLOAD_FOLDER):
+            for name in names:
+                path = os.path.join(root, name)
+                if os.path.abspath(root) != os.path.abspath(PARTIAL_FOLDER):
+                    self.stored_bytes += os.path.getsize(path)
+                elif name.endswith('.json'):
+                    try:
+                        with open(path, 'r') as f:
+                            info = json.load(f)
+                        self._reserve(info.get('user_id'), info['filesize'])
+                    except (OSError, ValueError, KeyError) as e:
+                        print(f"   ⚠️  Skipping unreadable transfer state {name}: {e}")
+    
+    def _reserve(self, user_id, size):
+        """Count `size` bytes against a user's unfinished uploads (negative releases)"""
+        self.reserved_by_user[user_id] = self.reserved_by_user.get(user_id, 0) + size
+        if self.reserved_by_user[user_id] <= 0:
+            del self.reserved_by_user[user_id]
+        self.reserved_bytes += size
+    
+    def _quota_error(self, user_id, size):
+        """Why a new upload of `size` bytes can't be accepted, or None"""
+        if self.reserved_by_user.get(user_id, 0) + size > TRANSFER_USER_QUOTA:
+            return (f'Upload quota exceeded: unfinished uploads may total '
+                    f'{TRANSFER_USER_QUOTA / (1024*1024):.0f} MB per user')
+        if self.stored_bytes + self.reserved_bytes + size > UPLOAD_QUOTA:
+            return 'Server upload storage is full'
+        return None
+    
+    def usage_snapshot(self):
+        """Transfer and quota figures for the metrics gauge"""
+        with self.lock:
+            return {
+                'open': len(self.active_transfers),
+                'reserved_bytes': self.reserved_bytes,
+                'stored_bytes': self.stored_bytes,
+                'quota_bytes': UPLOAD_QUOTA,
+                'users_with_uploads': len(self.reserved_by_user)
+            }
+    
+    def _reap(self):
+        """Reaper thread: sweep for idle and abandoned transfers until stopped"""
+        while not self.reaper_stop.wait(TRANSFER_REAP_INTERVAL):
+            try:
+                self.expire_transfers()
+            except Exception as e:
+                print(f"   ❌ Transfer reaper error: {e}")
+    
+    def stop(self):
+        """Stop the reaper and close every open transfer (all stay resumable)"""
+        self.reaper_stop.set()
+        with self.lock:
+            for transfer_id, info in list(self.active_transfers.items()):
+                with info['lock']:
+                    self._close_transfer(transfer_id, info)
+    
+    def _paths(self, transfer_id):
+        """Data, state and bitmap paths for a transfer"""
+        base = os.path.join(PARTIAL_FOLDER, transfer_id)
+        return base + '.part', base + '.json', base + '.bitmap'
+    
+    def _open_transfer(self, transfer_id, info):
+        """Open a transfer's .part and bitmap files and register it"""
+        part_path, _, bitmap_path = self._paths(transfer_id)
+        flags = os.O_RDWR | os.O_CREAT | getattr(os, 'O_BINARY', 0)
+        
+        info['fd'] = os.open(part_path, flags, 0o644)
+        info['bitmap_fd'] = os.open(bitmap_path, flags, 0o644)
+        os.ftruncate(info['fd'], info['filesize'])
+        
+        bitmap_size = (info['total_chunks'] + 7) // 8
+        bitmap = bytearray(os.read(info['bitmap_fd'], bitmap_size))
+        bitmap.extend(b'\x00' * (bitmap_size - len(bitmap)))
+        info['bitmap'] = bitmap
+        info['chunks_received'] = sum(bin(byte).count('1') for byte in bitmap)
+        info['cumulative'] = 0
+        self._advance_cumulative(info)
+        # Highest chunk on disk bounds the SACK scan
+        last_byte = next((i for i in range(bitmap_size - 1, -1, -1) if bitmap[i]), None)
+        info['highest'] = -1 if last_byte is None else last_byte * 8 + bitmap[last_byte].bit_length() - 1
+        info['lock'] = threading.Lock()
+        info['last_activity'] = time.time()
+        
+        self.active_transfers[transfer_id] = info
+        return info
+    
+    def _load_transfer(self, transfer_id):
+        """Return an open transfer, reopening it from disk if needed"""
+        with self.lock:
+            return self._find_transfer(transfer_id)
+    
+    def _find_transfer(self, transfer_id):
+        """_load_transfer() for callers already holding self.lock"""
+        info = self.active_transfers.get(transfer_id)
+        if info is not None:
+            info['last_activity'] = time.time()
+            return info
+        
+        if not isinstance(transfer_id, str) or not TRANSFER_ID_PATTERN.match(transfer_id):
+            return None
+        _, state_path, _ = self._paths(transfer_id)
+        if not os.path.exists(state_path):
+            return None
+        with open(state_path, 'r') as f:
+            info = json.load(f)
+        return self._open_transfer(transfer_id, info)
+    
+    def _close_transfer(self, transfer_id, info):
+        """Close a transfer's file handles (its files stay on disk)"""
+        self.active_transfers.pop(transfer_id, None)
+        for key in ('fd', 'bitmap_fd'):
+            if info.get(key) is not None:
+                os.close(info[key])
+                info[key] = None
+    
+    def _missing_ranges(self, info):
+        """Missing chunks as [start, end) ranges of chunk numbers"""
+        ranges = []
+        start = None
+        bitmap = info['bitmap']
+        for chunk_number in range(info['total_chunks']):
+            have = bitmap[chunk_number // 8] & (1 << (chunk_number % 8))
+            if not have and start is None:
+                start = chunk_number
+            elif have and start is not None:
+                ranges.append([start, chunk_number])
+                start = None
+        if start is not None:
+            ranges.append([start, info['total_chunks']])
+        return ranges
+    
+    def _advance_cumulative(self, info):
+        """Move the cumulative ACK past every chunk received in sequence"""
+        bitmap = info['bitmap']
+        cumulative = info['cumulative']
+        while cumulative < info['total_chunks'] and bitmap[cumulative // 8] & (1 << (cumulative % 8)):
+            cumulative += 1
+        info['cumulative'] = cumulative
+    
+    def _sack_blocks(self, info):
+        """Up to TRANSFER_SACK_BLOCKS [start, end) ranges received past the cumulative ACK"""
+        blocks = []
+        start = None
+        bitmap = info['bitmap']
+        for chunk_number in range(info['cumulative'], info['highest'] + 1):
+            have = bitmap[chunk_number // 8] & (1 << (chunk_number % 8))
+            if have and start is None:
+                start = chunk_number
+            elif not have and start is not None:
+                blocks.append([start, chunk_number])
+                start = None
+                if len(blocks) == TRANSFER_SACK_BLOCKS:
+                    return blocks
+        if start is not None:
+            blocks.append([start, info['highest'] + 1])
+        return blocks
+    
+    def _transfer_status(self, transfer_id, info):
+        """Fields shared by START_FILE_TRANSFER and QUERY_TRANSFER responses"""
+        return {
+            'transfer_id': transfer_id,
+            'chunk_size': info['chunk_size'],
+            'total_chunks': info['total_chunks'],
+            'chunks_received': info['chunks_received'],
+            'cumulative_ack': info['cumulative'],
+            'missing': self._missing_ranges(info),
+            'complete': info['chunks_received'] == info['total_chunks']
+        }
+    
+    def expire_transfers(self):
+        """Close idle transfer handles and remove abandoned partial uploads"""
+        now = time.time()
+        with self.lock:
+            for transfer_id, info in list(self.active_transfers.items()):
+                if now - info['last_activity'] > TRANSFER_IDLE_TIMEOUT:
+                    with info['lock']:
+                        self._close_transfer(transfer_id, info)
+                    print(f"   💤 Closed idle transfer {transfer_id} (resumable)")
+            
+            for name in os.listdir(PARTIAL_FOLDER):
+                if not name.endswith('.json'):
+                    continue
+                transfer_id = name[:-len('.json')]
+                paths = self._paths(transfer_id)
+                # The bitmap is rewritten on every chunk, so its mtime is the last activity
+                last_activity = max(os.path.getmtime(path) for path in paths if os.path.exists(path))
+                if transfer_id in self.active_transfers or now - last_activity < TRANSFER_RETENTION:
+                    continue
+                self._discard_transfer(transfer_id)
+    
+    def _discard_transfer(self, transfer_id):
+        """Delete or quarantine an abandoned transfer's files and release its reservation"""
+        part_path, state_path, bitmap_path = self._paths(transfer_id)
+        try:
+            with open(state_path, 'r') as f:
+                info = json.load(f)
+            self._reserve(info.get('user_id'), -info['filesize'])
+        except (OSError, ValueError, KeyError):
+            pass  # Unreadable state was never counted
+        
+        if TRANSFER_QUARANTINE:
+            os.makedirs(QUARANTINE_FOLDER, exist_ok=True)
+            for path in (part_path, state_path):
+                if os.path.exists(path):
+                    target = os.path.join(QUARANTINE_FOLDER, os.path.basename(path))
+                    os.replace(path, target)
+                    self.stored_bytes += os.path.getsize(target)
+            if os.path.exists(bitmap_path):
+                os.remove(bitmap_path)
+            print(f"   🚧 Quarantined abandoned transfer {transfer_id}")
+            return
+        
+        for path in (part_path, state_path, bitmap_path):
+            if os.path.exists(path):
+                os.remove(path)
+        print(f"   🗑️  Deleted abandoned transfer {transfer_id}")
+    
     def handle_file_upload_start(self, data, client_socket):
-        """Handle file upload initiation"""
+        """Handle file upload initiation, or resume a transfer already on disk"""
         try:
             filename = data.get('filename')
             filesize = data.get('filesize')
             file_type = data.get('file_type')
             transfer_id = data.get('transfer_id')
+            user_id = data.get('user_id')
+            
+            # The client may ask for a bigger window; the server caps it
+            window = data.get('window')
+            if not isinstance(window, int) or window < 1:
+                window = TRANSFER_WINDOW
+            negotiated = {
+                'window': min(window, TRANSFER_MAX_WINDOW),
+                'max_streams': TRANSFER_MAX_STREAMS,
+                'raw_chunks': True  # FILE_CHUNK may carry `chunk_length` raw bytes after the frame
+            }
+            
+            if not TRANSFER_ID_PATTERN.match(str(transfer_id or '')):
+                return {
+                    'type': RESP_ERROR,
+                    'success': False,
+                    'error': 'transfer_id must be 1-64 letters, digits, "-" or "_"'
+                }
             
             # Validate file size
+            if not isinstance(filesize, int) or filesize < 0:
+                return {
+                    'type': RESP_ERROR,
+                    'success': False,
+                    'error': 'filesize must be a non-negative integer'
+                }
             if filesize > MAX_FILE_SIZE:
                 return {
                     'type': RESP_ERROR,
@@ -46,26 +346,70 @@ class FileHandler:
                 }
             
             # Generate unique filename
-            import time
-            unique_filename = f"{int(time.time())}_{filename}"
+            unique_filename = f"{int(time.time())}_{os.path.basename(filename)}"
             file_path = os.path.join(UPLOAD_FOLDER, unique_filename)
             
+            # Larger chunks on request, between the default and TRANSFER_MAX_CHUNK_SIZE
+            # (a resumed transfer keeps the chunk size it started with)
+            chunk_size = data.get('chunk_size')
+            if not isinstance(chunk_size, int):
+                chunk_size = self.chunk_size
+            chunk_size = max(self.chunk_size, min(chunk_size, TRANSFER_MAX_CHUNK_SIZE))
+            
             # Calculate total chunks
-            total_chunks = (filesize + self.chunk_size - 1) // self.chunk_size
+            total_chunks = (filesize + chunk_size - 1) // chunk_size
             
-            # Store transfer info
-            self.active_transfers[transfer_id] = {
+            # Persist transfer info so the upload survives reconnects and restarts
+            info = {
                 'filename': filename,
                 'unique_filename': unique_filename,
                 'filepath': file_path,
                 'filesize': filesize,
                 'file_type': file_type,
-                'received': 0,
-                'file_handle': open(file_path, 'wb'),
-                'expected_chunk': 0,
-                'total_chunks': total_chunks,
-                'chunks_received': []
+                'user_id': user_id,
+                'chunk_size': chunk_size,
+                'total_chunks': total_chunks
             }
+            _, state_path, _ = self._paths(transfer_id)
+            
+            # Look up, check the quota, reserve and register in one critical
+            # section, so two starts with the same new transfer_id can't both
+            # reserve (and open) it, and concurrent starts can't overshoot
+            with self.lock:
+                # Resume an unfinished transfer of the same file
+                existing = self._find_transfer(transfer_id)
+                if existing is not None:
+                    if (existing['filename'] != filename or existing['filesize'] != filesize
+                            or existing.get('user_id') != user_id):
+                        return {
+                            'type': RESP_ERROR,
+                            'success': False,
+                            'error': 'transfer_id is already in use for a different file'
+                        }
+                    
+                    with existing['lock']:
+                        status = self._transfer_status(transfer_id, existing)
+                    print(f"\n📤 Resuming transfer {transfer_id}: {status['chunks_received']}/{status['total_chunks']} chunks on disk")
+                    return {
+                        'type': RESP_SUCCESS,
+                        'success': True,
+                        'message': 'Resuming transfer',
+                        'resumed': True,
+                        **negotiated,
+                        **status
+                    }
+                
+                quota_error = self._quota_error(user_id, filesize)
+                if quota_error:
+                    return {
+                        'type': RESP_ERROR,
+                        'success': False,
+                        'error': quota_error
+                    }
+                with open(state_path, 'w') as f:
+                    json.dump(info, f)
+                self._reserve(user_id, filesize)
+                self._open_transfer(transfer_id, info)
             
             print(f"\n📤 ╔══════════════════════════════════════════╗")
             print(f"📤 ║   FILE UPLOAD STARTED                    ║")
@@ -75,7 +419,7 @@ class FileHandler:
             print(f"   Size: {filesize / 1024:.2f} KB")
             print(f"   Type: {file_type}")
             print(f"   Total Chunks Expected: {total_chunks}")
-            print(f"   Chunk Size: {self.chunk_size} bytes")
+            print(f"   Chunk Size: {chunk_size} bytes, window {negotiated['window']}")
             print(f"   Sequence Numbers: 0 to {total_chunks - 1}")
             
             # Send ready acknowledgment
@@ -83,11 +427,11 @@ class FileHandler:
                 'type': RESP_SUCCESS,
                 'success': True,
                 'message': 'Ready to receive file',
-                'transfer_id': transfer_id,
-                'chunk_size': self.chunk_size,
-                'total_chunks': total_chunks
+                'resumed': False,
+                **negotiated,
+                **self._transfer_status(transfer_id, info)
             }
-            
+        
         except Exception as e:
             return {
                 'type': RESP_ERROR,
@@ -95,17 +439,45 @@ class FileHandler:
                 'error': str(e)
             }
     
+    def handle_query_transfer(self, data):
+        """Report which chunks of a transfer are still missing"""
+        transfer_id = data.get('transfer_id')
+        try:
+            info = self._load_transfer(transfer_id)
+        except Exception as e:
+            return {'type': RESP_ERROR, 'success': False, 'error': str(e)}
+        
+        if info is None:
+            return {
+                'type': RESP_ERROR,
+                'success': False,
+                'error': 'Unknown or expired transfer ID',
+                'transfer_id': transfer_id
+            }
+        if info.get('user_id') != data.get('user_id'):
+            return {
+                'type': RESP_ERROR,
+                'success': False,
+                'error': 'Transfer belongs to another user',
+                'transfer_id': transfer_id
+            }
+        
+        with info['lock']:
+            return {
+                'type': RESP_SUCCESS,
+                'success': True,
+                **self._transfer_status(transfer_id, info)
+            }
+    
     def handle_file_chunk(self, data):
         """Handle incoming file chunk with metadata"""
+        chunk_number = data.get('chunk_number')
         try:
             transfer_id = data.get('transfer_id')
-            chunk_number = data.get('chunk_number')
-            chunk_size = data.get('chunk_size')
-            filename = data.get('filename')
-            file_type = data.get('file_type')
-            chunk_data_b64 = data.get('chunk_data')
+            chunk_data = data.get('chunk_data')
             
-            if transfer_id not in self.active_transfers:
+            info = self._load_transfer(transfer_id)
+            if info is None:
                 print(f"   ❌ Invalid transfer ID: {transfer_id}")
                 return {
                     'type': RESP_ERROR,
@@ -113,50 +485,77 @@ class FileHandler:
                     'error': 'Invalid transfer ID',
                     'chunk_number': chunk_number
                 }
+            if info.get('user_id') != data.get('user_id'):
+                return {
+                    'type': RESP_ERROR,
+                    'success': False,
+                    'error': 'Transfer belongs to another user',
+                    'chunk_number': chunk_number
+                }
             
-            transfer_info = self.active_transfers[transfer_id]
+            if not isinstance(chunk_number, int) or not 0 <= chunk_number < info['total_chunks']:
+                return {
+                    'type': RESP_ERROR,
+                    'success': False,
+                    'error': f"chunk_number must be between 0 and {info['total_chunks'] - 1}",
+                    'chunk_number': chunk_number
+                }
             
-            # Decode chunk data
-            chunk_data = base64.b64decode(chunk_data_b64)
+            # Raw bytes read after the frame or on a binary codec, base64 from older JSON clients
+            if not isinstance(chunk_data, (bytes, bytearray)):
+                chunk_data = base64.b64decode(chunk_data)
             
-            # Verify chunk size
-            if len(chunk_data) != chunk_size:
-                print(f"   ⚠️  Chunk size mismatch: expected {chunk_size}, got {len(chunk_data)}")
+            offset = chunk_number * info['chunk_size']
+            expected = min(info['chunk_size'], info['filesize'] - offset)
+            if len(chunk_data) != expected:
+                return {
+                    'type': RESP_ERROR,
+                    'success': False,
+                    'error': f'Chunk {chunk_number} must be {expected} bytes, got {len(chunk_data)}',
+                    'chunk_number': chunk_number
+                }
             
-            # Write chunk
-            file_handle = transfer_info['file_handle']
-            file_handle.write(chunk_data)
-            transfer_info['received'] += len(chunk_data)
-            transfer_info['chunks_received'].append(chunk_number)
+            while True:
+                with info['lock']:
+                    if info.get('fd') is not None:
+                        # Positional write, then mark the chunk in the on-disk bitmap
+                        # (a duplicate from another stream or a retry is only acknowledged)
+                        byte_index, bit = divmod(chunk_number, 8)
+                        if not info['bitmap'][byte_index] & (1 << bit):
+                            _pwrite(info['fd'], chunk_data, offset)
+                            info['bitmap'][byte_index] |= 1 << bit
+                            info['chunks_received'] += 1
+                            _pwrite(info['bitmap_fd'], bytes([info['bitmap'][byte_index]]), byte_index)
+                            info['highest'] = max(info['highest'], chunk_number)
+                            self._advance_cumulative(info)
+                        info['last_activity'] = time.time()
+                        chunks_received = info['chunks_received']
+                        cumulative = info['cumulative']
+                        sack = self._sack_blocks(info)
+                        break
+                
+                # Closed as idle (or completed) while this chunk waited
+                info = self._load_transfer(transfer_id)
+                if info is None:
+                    raise ValueError('Transfer is no longer active')
             
-            progress = (transfer_info['received'] / transfer_info['filesize']) * 100
+            progress = (chunks_received / info['total_chunks']) * 100
             
-            print(f"   📦 ═══════════════════════════════════════════")
-            print(f"   📥 RECEIVED CHUNK: SEQ #{chunk_number}")
-            print(f"   📦 ═══════════════════════════════════════════")
-            print(f"      Filename: {filename}")
-            print(f"      File Type: {file_type}")
-            print(f"      Chunk Size: {chunk_size} bytes")
-            print(f"      Received: {len(chunk_data)} bytes")
-            print(f"      Progress: {progress:.1f}% ({transfer_info['received']}/{transfer_info['filesize']} bytes)")
-            print(f"      Total Chunks Received: {len(transfer_info['chunks_received']) + 1}/{transfer_info['total_chunks']}")
+            print(f"   📥 RECEIVED CHUNK: SEQ #{chunk_number} ({len(chunk_data)} bytes) - "
+                  f"{chunks_received}/{info['total_chunks']} chunks, {progress:.1f}%")
             
             # Send acknowledgment for this chunk
-            ack_response = {
-                'type': 'CHUNK_ACK',
+            return {
+                'type': MSG_CHUNK_ACK,
                 'success': True,
                 'transfer_id': transfer_id,
                 'chunk_number': chunk_number,
-                'received': transfer_info['received'],
+                'chunks_received': chunks_received,
+                'cumulative_ack': cumulative,
+                'sack': sack,
                 'progress': progress
             }
-            
-            print(f"   ✅ ─────────────────────────────────────────")
-            print(f"   ✅ SENDING ACK: SEQ #{chunk_number}")
-            print(f"   ✅ ─────────────────────────────────────────")
-            
-            return ack_response
-            
+        
         except Exception as e:
             print(f"   ❌ Error processing chunk: {e}")
             return {
@@ -171,48 +570,66 @@ class FileHandler:
         try:
             transfer_id = data.get('transfer_id')
             
-            if transfer_id not in self.active_transfers:
+            info = self._load_transfer(transfer_id)
+            if info is None:
                 return {
                     'type': RESP_ERROR,
                     'success': False,
                     'error': 'Invalid transfer ID'
                 }
+            if info.get('user_id') != data.get('user_id'):
+                return {
+                    'type': RESP_ERROR,
+                    'success': False,
+                    'error': 'Transfer belongs to another user'
+                }
             
-            transfer_info = self.active_transfers[transfer_id]
-            
-            # Close file
-            transfer_info['file_handle'].close()
+            with self.lock, info['lock']:
+                missing = self._missing_ranges(info)
+                if missing:
+                    # Keep the transfer so the client can send what is missing
+                    return {
+                        'type': RESP_ERROR,
+                        'success': False,
+                        'error': 'Upload incomplete',
+                        'transfer_id': transfer_id,
+                        'missing': missing
+                    }
+                
+                self._close_transfer(transfer_id, info)
+                
+                part_path, state_path, bitmap_path = self._paths(transfer_id)
+                os.replace(part_path, info['filepath'])
+                os.remove(state_path)
+                os.remove(bitmap_path)
+                
+                # The reservation becomes stored bytes
+                self._reserve(info.get('user_id'), -info['filesize'])
+                self.stored_bytes += info['filesize']
             
             print(f"\n✅ ╔══════════════════════════════════════════╗")
             print(f"✅ ║   FILE UPLOAD COMPLETE                   ║")
             print(f"✅ ╚══════════════════════════════════════════╝")
-            print(f"   Filename: {transfer_info['filename']}")
-            print(f"   Unique Filename: {transfer_info['unique_filename']}")
-            print(f"   Total Size: {transfer_info['received'] / 1024:.2f} KB")
-            print(f"   Total Chunks Received: {len(transfer_info['chunks_received'])}/{transfer_info['total_chunks']}")
-            print(f"   All Sequence Numbers: {sorted(transfer_info['chunks_received'])}")
-            print(f"   Path: {transfer_info['filepath']}")
+            print(f"   Filename: {info['filename']}")
+            print(f"   Unique Filename: {info['unique_filename']}")
+            print(f"   Total Size: {info['filesize'] / 1024:.2f} KB")
+            print(f"   Total Chunks Received: {info['chunks_received']}/{info['total_chunks']}")
+            print(f"   Path: {info['filepath']}")
             print(f"\n🎉 ═══════════════════════════════════════════")
             print(f"🎉 FINAL ACK SENT - UPLOAD SUCCESS")
             print(f"🎉 ═══════════════════════════════════════════\n")
             
-            # Get file path
-            file_path = transfer_info['filepath']
-            
-            # Cleanup
-            del self.active_transfers[transfer_id]
-            
             # Send final acknowledgment
             return {
-                'type': 'UPLOAD_COMPLETE_ACK',
+                'type': MSG_UPLOAD_COMPLETE_ACK,
                 'success': True,
                 'transfer_id': transfer_id,
-                'filepath': file_path,
-                'filename': transfer_info['unique_filename'],
-                'total_chunks': len(transfer_info['chunks_received']),
-                'total_bytes': transfer_info['received']
+                'filepath': info['filepath'],
+                'filename': info['unique_filename'],
+                'total_chunks': info['chunks_received'],
+                'total_bytes': info['filesize']
             }
-            
+        
         except Exception as e:
             print(f"   ❌ Error completing upload: {e}")
             return {
@@ -235,7 +652,7 @@ class FileHandler:
                 'filename': os.path.basename(filepath),
                 'size': len(file_data)
             }
-            
+        
         except Exception as e:
             print(f"❌ Error reading file: {e}")
             return None
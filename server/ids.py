@@ -0,0 +1,66 @@
+# ID Codec for LearnLive
+#
+# Documents keep ObjectId `_id`s, and every field that refers to another
+# document (a class's teacher_id and students, a submission's assignment_id,
+# ...) stores that id as its 24-character hex string, which is also how ids
+# travel to and from clients. Database converts ids with to_ref() before
+# writing or matching a reference field and with to_object_id() before
+# matching an `_id`, so each lookup is one equality match on one type.
+# REFERENCE_FIELDS lists the reference fields per collection; documents
+# written before this convention are rewritten by server.migrate_ids, and
+# listings pass what they read through canonical_refs() so a document the
+# migration hasn't reached yet is still served with string references.
+
+from bson import ObjectId
+
+# collection -> fields holding references (`students` holds a list of them)
+REFERENCE_FIELDS = {
+    'classes': ('teacher_id', 'students'),
+    'assignments': ('class_id',),
+    'submissions': ('assignment_id', 'student_id', 'class_id', 'file_id'),
+    'announcements': ('class_id', 'teacher_id'),
+    'comments': ('item_id', 'class_id', 'user_id', 'parent_comment_id'),
+    'materials': ('class_id', 'teacher_id', 'file_id'),
+    'notifications': ('user_id',),
+    'fs.files': ('assignment_id', 'student_id', 'class_id'),  # Metadata of submitted files
+}
+
+
+class InvalidReference(ValueError):
+    """A value that isn't an ObjectId or its hex string"""
+
+
+def to_object_id(value):
+    """An id as the ObjectId an `_id` holds"""
+    if isinstance(value, ObjectId):
+        return value
+    if isinstance(value, str) and len(value) == 24 and ObjectId.is_valid(value):
+        return ObjectId(value)
+    raise InvalidReference(f'Invalid id: {value!r}')
+
+
+def to_ref(value):
+    """An id as a reference field stores it (hex string)"""
+    return str(to_object_id(value))
+
+
+def to_optional_ref(value):
+    """to_ref(), passing None (an optional reference that isn't set) through"""
+    return None if value is None else to_ref(value)
+
+
+def canonical(value):
+    """`value` with every ObjectId in it (or in a list of them) as its hex string"""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, list):
+        return [canonical(item) for item in value]
+    return value
+
+
+def canonical_refs(document, collection):
+    """Convert a document's reference fields (see REFERENCE_FIELDS) to strings in place"""
+    for field in REFERENCE_FIELDS[collection]:
+        if field in document:
+            document[field] = canonical(document[field])
+    return document
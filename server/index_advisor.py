@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Explain the queries behind each Database read method and flag collection scans.
+
+Each method is called once with ids sampled from the database (or made-up
+ones if a collection is empty). A pymongo command listener captures every
+find, aggregate, count and findAndModify it sends, and each captured command
+is run again through `explain` to see the plan MongoDB picks. Plans that
+read a whole collection (COLLSCAN) are flagged together with the method
+that caused them; add an entry to server/indexes.py to fix one.
+
+Opening the Database applies the index manifest first, as the server does
+at startup, so only queries the manifest doesn't cover are reported. Exits
+with status 1 if any query scans a collection.
+
+Usage: python -m server.index_advisor [--method NAME]
+"""
+
+import argparse
+import contextlib
+import io
+import sys
+import os
+
+from bson import ObjectId
+from pymongo import monitoring
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from server.database import Database
+from server.discussion_db import DiscussionDB
+
+EXPLAINED_COMMANDS = {'find', 'aggregate', 'count', 'distinct', 'findAndModify'}
+
+# Fields the driver adds to a command that `explain` doesn't accept
+SESSION_FIELDS = {'lsid', 'txnNumber', 'autocommit', 'startTransaction', 'readConcern', 'writeConcern'}
+
+
+class CommandRecorder(monitoring.CommandListener):
+    """Keep the explainable commands sent while `recording` is on"""
+
+    def __init__(self):
+        self.recording = False
+        self.commands = []
+
+    def started(self, event):
+        if self.recording and event.command_name in EXPLAINED_COMMANDS:
+            command = {key: value for key, value in event.command.items()
+                       if not key.startswith('$') and key not in SESSION_FIELDS}
+            self.commands.append(command)
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+def sample_ids(db):
+    """Real ids to query with, so plans reflect real data (placeholders if none)"""
+    def first(collection, query=None, field='_id'):
+        document = collection.find_one(query or {}, {field: 1})
+        value = document.get(field) if document else None
+        return str(value) if value is not None else str(ObjectId())
+
+    comment = db.comments.find_one({}, {'item_id': 1, 'item_type': 1}) or {}
+    user = db.users.find_one({'token': {'$exists': True}}, {'email': 1, 'token': 1}) or {}
+    return {
+        'teacher_id': first(db.users, {'role': 'teacher'}),
+        'student_id': first(db.users, {'role': 'student'}),
+        'class_id': first(db.classes),
+        'assignment_id': first(db.assignments),
+        'file_id': first(db.gridfs_files),
+        'email': user.get('email', 'nobody@example.com'),
+        'token': user.get('token', 'no-such-token'),
+        'item_id': str(comment.get('item_id', ObjectId())),
+        'item_type': comment.get('item_type', 'announcement'),
+    }
+
+
+def read_methods(db, discussion, ids):
+    """(name, call) for every Database and DiscussionDB method that serves a read request"""
+    return [
+        ('authenticate_user', lambda: db.authenticate_user(ids['email'], 'not-the-password')),
+        ('verify_token', lambda: db.verify_token(ids['token'])),
+        ('get_user_classes (teacher)', lambda: db.get_user_classes(ids['teacher_id'], 'teacher')),
+        ('get_user_classes (student)', lambda: db.get_user_classes(ids['student_id'], 'student')),
+        ('get_class_students', lambda: db.get_class_students(ids['class_id'])),
+        ('get_class_by_id', lambda: db.get_class_by_id(ids['class_id'])),
+        ('get_assignments', lambda: db.get_assignments(ids['class_id'])),
+        ('get_submissions', lambda: db.get_submissions(ids['assignment_id'])),
+        ('resolve_assignment_class', lambda: db.resolve_assignment_class(ids['assignment_id'])),
+        ('get_student_submission', lambda: db.get_student_submission(ids['assignment_id'], ids['student_id'])),
+        ('get_teacher_submissions', lambda: db.get_teacher_submissions(ids['teacher_id'])),
+        ('get_student_all_assignments', lambda: db.get_student_all_assignments(ids['student_id'])),
+        ('get_student_all_assignments (filtered)',
+         lambda: db.get_student_all_assignments(ids['student_id'], due_within_days=7, not_submitted=True)),
+        ('get_announcements', lambda: db.get_announcements(ids['class_id'])),
+        ('get_comments', lambda: db.get_comments(ids['item_id'], ids['item_type'])),
+        ('get_materials', lambda: db.get_materials(ids['class_id'])),
+        ('get_user_notifications', lambda: db.get_user_notifications(ids['student_id'])),
+        ('get_file_info', lambda: db.get_file_info(ids['file_id'])),
+        ('DiscussionDB.fetch_messages', lambda: discussion.fetch_messages(ids['class_id'])),
+    ]
+
+
+def plan_stages(plan):
+    """Every stage name in an explain plan, outermost first"""
+    stages = []
+    if isinstance(plan, dict):
+        if 'stage' in plan:
+            stages.append(plan['stage'])
+        for value in plan.values():
+            stages.extend(plan_stages(value))
+    elif isinstance(plan, list):
+        for value in plan:
+            stages.extend(plan_stages(value))
+    return stages
+
+
+def index_names(plan):
+    """Names of the indexes an explain plan reads"""
+    names = []
+    if isinstance(plan, dict):
+        if plan.get('indexName'):
+            names.append(plan['indexName'])
+        for value in plan.values():
+            names.extend(index_names(value))
+    elif isinstance(plan, list):
+        for value in plan:
+            names.extend(index_names(value))
+    return names
+
+
+def explain(db, command):
+    """Winning plans for one captured command (aggregations can have one per stage)"""
+    result = db.command({'explain': command, 'verbosity': 'queryPlanner'})
+    if 'queryPlanner' in result:
+        return [result['queryPlanner']['winningPlan']]
+    # Aggregations report per pipeline stage, $lookup sub-queries included
+    return [stage['$cursor']['queryPlanner']['winningPlan']
+            for stage in result.get('stages', []) if '$cursor' in stage]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Flag LearnLive queries that scan whole collections')
+    parser.add_argument('--method', help='Only explain methods whose name contains this')
+    args = parser.parse_args()
+
+    recorder = CommandRecorder()
+    monitoring.register(recorder)  # Applies to clients created from here on
+
+    with contextlib.redirect_stdout(io.StringIO()):  # The Database methods log every query
+        database = Database()
+        discussion = DiscussionDB()
+    ids = sample_ids(database)
+
+    scans = 0
+    print(f"{'method':<40}  {'collection':<14}  plan")
+    for name, call in read_methods(database, discussion, ids):
+        if args.method and args.method not in name:
+            continue
+
+        recorder.commands = []
+        recorder.recording = True
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                call()
+        finally:
+            recorder.recording = False
+
+        for command in recorder.commands:
+            collection = next(iter(command.values()))
+            for plan in explain(database.db, command):
+                stages = plan_stages(plan)
+                if 'COLLSCAN' in stages:
+                    scans += 1
+                    verdict = '⚠️ COLLSCAN'
+                elif stages == ['EOF']:
+                    verdict = 'empty collection'
+                else:
+                    names = list(dict.fromkeys(index_names(plan)))
+                    verdict = f"IXSCAN {', '.join(names)}" if names else ' > '.join(stages)  # e.g. IDHACK
+                print(f"{name:<40}  {collection:<14}  {verdict}")
+                if 'COLLSCAN' in stages:
+                    print(f"{'':<40}  {'':<14}  filter: {command.get('filter', command.get('pipeline', command.get('query')))}")
+
+    print(f"\n{scans} collection scan(s)" if scans else "\nEvery query uses an index")
+    sys.exit(1 if scans else 0)
+
+
+if __name__ == '__main__':
+    main()
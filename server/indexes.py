@@ -0,0 +1,82 @@
+# MongoDB Index Manifest for LearnLive
+#
+# Every index the server's queries rely on, in one place. ensure_indexes()
+# applies the manifest at startup; create_index is a no-op for an index
+# that already exists with the same keys and options, so this is safe to
+# run on every start. Indexes keep MongoDB's default names, which also
+# match the ones earlier versions created one by one. An index that exists
+# with different options (e.g. email not unique) is reported and left as
+# it is rather than dropped. Run `python -m server.index_advisor` to check
+# which queries still scan a whole collection.
+
+from collections import namedtuple
+import sys
+import os
+
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.config import *
+
+# `reason` names the queries the index serves
+IndexSpec = namedtuple('IndexSpec', ['collection', 'keys', 'options', 'reason'])
+
+INDEX_MANIFEST = [
+    IndexSpec(USERS_COLLECTION, [('email', ASCENDING)], {'unique': True},
+              'authenticate_user, unique sign-ups'),
+    IndexSpec(USERS_COLLECTION, [('token', ASCENDING)], {'sparse': True},
+              'verify_token on session cache misses'),
+
+    IndexSpec(CLASSES_COLLECTION, [('class_code', ASCENDING)], {'unique': True},
+              'join_class, generate_class_code'),
+    IndexSpec(CLASSES_COLLECTION, [('teacher_id', ASCENDING)], {},
+              'get_user_classes and get_teacher_submissions for teachers'),
+    IndexSpec(CLASSES_COLLECTION, [('students', ASCENDING)], {},
+              'get_user_classes and get_student_all_assignments for students'),
+
+    IndexSpec(ASSIGNMENTS_COLLECTION, [('class_id', ASCENDING), ('created_at', DESCENDING)], {},
+              'get_assignments, get_student_all_assignments pages'),
+
+    IndexSpec(SUBMISSIONS_COLLECTION, [('assignment_id', ASCENDING), ('student_id', ASCENDING)], {},
+              'get_student_submission'),
+    IndexSpec(SUBMISSIONS_COLLECTION, [('assignment_id', ASCENDING), ('submitted_at', DESCENDING)], {},
+              'get_submissions and get_teacher_submissions pages'),
+    IndexSpec(SUBMISSIONS_COLLECTION, [('student_id', ASCENDING), ('assignment_id', ASCENDING)], {},
+              "get_student_all_assignments (a student's hand-ins)"),
+    IndexSpec(SUBMISSIONS_COLLECTION, [('file_id', ASCENDING)], {'sparse': True},
+              'download_material_from_server filename lookup'),
+
+    IndexSpec(ANNOUNCEMENTS_COLLECTION, [('class_id', ASCENDING), ('created_at', DESCENDING)], {},
+              'get_announcements'),
+    IndexSpec(COMMENTS_COLLECTION,
+              [('item_id', ASCENDING), ('item_type', ASCENDING), ('created_at', DESCENDING)], {},
+              'get_comments'),
+    IndexSpec(MATERIALS_COLLECTION, [('class_id', ASCENDING), ('uploaded_at', DESCENDING)], {},
+              'get_materials'),
+    IndexSpec('notifications', [('user_id', ASCENDING), ('created_at', DESCENDING)], {},
+              'get_user_notifications'),
+    IndexSpec('messages', [('class_id', ASCENDING), ('created_at', DESCENDING)], {},
+              'DiscussionDB.fetch_messages'),
+
+    IndexSpec('fs.files', [('sha256', ASCENDING)], {'sparse': True},
+              'stream_to_gridfs deduplication'),
+]
+
+
+def ensure_indexes(db, manifest=INDEX_MANIFEST):
+    """Create any index in `manifest` that `db` lacks.
+
+    Returns:
+        dict: `ensured` (index names now in place) and `conflicts`
+        (collection, keys and error of indexes that couldn't be created)
+    """
+    ensured, conflicts = [], []
+    for spec in manifest:
+        try:
+            ensured.append(db[spec.collection].create_index(spec.keys, **spec.options))
+        except OperationFailure as e:
+            # Same keys with other options, or a unique index over duplicate data
+            print(f"⚠️ Index {spec.collection}{spec.keys} not created: {e}")
+            conflicts.append({'collection': spec.collection, 'keys': spec.keys, 'error': str(e)})
+    return {'ensured': ensured, 'conflicts': conflicts}
@@ -0,0 +1,54 @@
+# Runtime Metrics for LearnLive
+#
+# A process-wide registry of counters and gauges. Components record into
+# the shared METRICS instance; the snapshot is returned to clients through
+# the GET_METRICS message.
+
+import threading
+import time
+
+
+class Metrics:
+    def __init__(self):
+        """Initialize an empty metrics registry"""
+        self.lock = threading.Lock()
+        self.counters = {}  # name -> int
+        self.gauges = {}  # name -> value or zero-argument callable
+        self.started_at = time.time()
+
+    def increment(self, name, amount=1):
+        """Add `amount` to a counter, creating it on first use"""
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def set_gauge(self, name, value):
+        """Record the current value of a gauge"""
+        with self.lock:
+            self.gauges[name] = value
+
+    def register_gauge(self, name, func):
+        """Register a callable evaluated each time a snapshot is taken"""
+        with self.lock:
+            self.gauges[name] = func
+
+    def snapshot(self):
+        """Return a JSON-serializable copy of every metric"""
+        with self.lock:
+            counters = dict(self.counters)
+            gauges = dict(self.gauges)
+
+        for name, value in gauges.items():
+            if callable(value):
+                try:
+                    gauges[name] = value()
+                except Exception as e:
+                    gauges[name] = f'error: {e}'
+
+        return {
+            'uptime_seconds': round(time.time() - self.started_at, 1),
+            'counters': counters,
+            'gauges': gauges
+        }
+
+
+METRICS = Metrics()
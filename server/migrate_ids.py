@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Rewrite reference fields stored as ObjectIds to the hex strings Database uses.
+
+Earlier versions wrote some references (submissions made through GridFS,
+GridFS materials, notifications) as ObjectIds and the rest as strings, so
+queries had to match both forms. Database now writes and matches strings
+only (see server/ids.py); run this once against existing data so older
+documents are found again. For every field in REFERENCE_FIELDS the
+documents still holding an ObjectId are read through a projection and
+rewritten with unordered bulk updates of --batch-size documents, so a
+large collection costs a handful of round trips per batch rather than one
+per document. Running it again finds nothing left to do.
+
+Values that aren't ids at all (e.g. a class code typed into class_id) are
+counted but left alone.
+
+Usage: python -m server.migrate_ids [--dry-run] [--batch-size N]
+"""
+
+import argparse
+import contextlib
+import io
+import sys
+import os
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from server.database import Database
+from server.ids import REFERENCE_FIELDS, canonical
+
+# A string that to_ref() would reject
+NOT_AN_ID = {'$type': 'string', '$not': {'$regex': '^[0-9a-f]{24}$'}}
+
+
+def migrate_field(collection, field, batch_size, dry_run=False):
+    """Rewrite `field` wherever it holds an ObjectId - returns the number of documents changed"""
+    # Matches a plain ObjectId and any array holding one
+    pending = collection.find({field: {'$type': 'objectId'}}, {field: 1}, batch_size=batch_size)
+
+    changed, batch = 0, []
+    for document in pending:
+        changed += 1
+        if dry_run:
+            continue
+        batch.append(UpdateOne({'_id': document['_id']}, {'$set': {field: canonical(document[field])}}))
+        if len(batch) >= batch_size:
+            collection.bulk_write(batch, ordered=False)
+            batch = []
+    if batch:
+        collection.bulk_write(batch, ordered=False)
+    return changed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Store every LearnLive reference field as a hex string')
+    parser.add_argument('--dry-run', action='store_true', help='Count the documents to rewrite without changing them')
+    parser.add_argument('--batch-size', type=int, default=1000, help='Documents per bulk write')
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(io.StringIO()):  # Database logs its startup
+        db = Database().db
+
+    total = 0
+    print(f"{'collection':<14}  {'field':<18}  {'rewritten':>9}  {'not ids':>7}")
+    for collection_name, fields in REFERENCE_FIELDS.items():
+        collection = db[collection_name]
+        for field in fields:
+            changed = migrate_field(collection, field, args.batch_size, args.dry_run)
+            invalid = collection.count_documents({field: NOT_AN_ID})
+            total += changed
+            print(f"{collection_name:<14}  {field:<18}  {changed:>9}  {invalid:>7}")
+
+    verb = 'to rewrite' if args.dry_run else 'rewritten'
+    print(f"\n{total} field(s) {verb}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+# Shared MongoDB Clients for LearnLive
+#
+# A MongoClient owns a connection pool and background monitor threads, so
+# each process should create one per URI and share it. get_client() keeps
+# that registry: Database, DiscussionDB and the command-line tools all
+# call it instead of constructing MongoClient themselves. Pool size and
+# timeouts come from the MONGO_* settings in config/config.py.
+#
+# POOL_MONITOR times each pool checkout (how long a query waited for a
+# free connection) and reports it with the other server metrics under
+# `mongo.pool`; waits that grow under load mean MONGO_MAX_POOL_SIZE is too
+# small for the number of handlers running at once.
+
+import threading
+import time
+import sys
+import os
+
+from pymongo import MongoClient, monitoring
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.config import *
+from server.metrics import METRICS
+
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """Record how long checkouts from the connection pools wait"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.waiting = threading.local()  # Checkouts run on the thread that asked for them
+        self.checkouts = 0
+        self.failures = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.open_connections = 0
+
+    def connection_check_out_started(self, event):
+        self.waiting.started = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        wait = self._waited()
+        with self.lock:
+            self.checkouts += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+    def connection_check_out_failed(self, event):
+        self._waited()
+        with self.lock:
+            self.failures += 1
+        METRICS.increment(f'mongo.pool.checkout_failed.{event.reason}')
+
+    def connection_created(self, event):
+        with self.lock:
+            self.open_connections += 1
+
+    def connection_closed(self, event):
+        with self.lock:
+            self.open_connections -= 1
+
+    def connection_checked_in(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def stats(self):
+        """Checkout counts and wait times so far (for the metrics snapshot)"""
+        with self.lock:
+            return {
+                'checkouts': self.checkouts,
+                'checkout_failures': self.failures,
+                'avg_wait_ms': round(self.total_wait / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                'max_wait_ms': round(self.max_wait * 1000, 3),
+                'open_connections': self.open_connections
+            }
+
+    def _waited(self):
+        """Seconds since this thread's checkout started"""
+        started = getattr(self.waiting, 'started', None)
+        self.waiting.started = None
+        return time.perf_counter() - started if started is not None else 0.0
+
+
+POOL_MONITOR = PoolMonitor()
+METRICS.register_gauge('mongo.pool', POOL_MONITOR.stats)
+
+_clients = {}  # uri -> MongoClient
+_clients_lock = threading.Lock()
+
+
+def get_client(uri=None):
+    """The process's MongoClient for `uri` (MONGODB_URI by default), created on first use"""
+    uri = uri or MONGODB_URI
+    with _clients_lock:
+        client = _clients.get(uri)
+        if client is None:
+            client = MongoClient(
+                uri,
+                maxPoolSize=MONGO_MAX_POOL_SIZE,
+                minPoolSize=MONGO_MIN_POOL_SIZE,
+                waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+                connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+                serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+                socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS,
+                event_listeners=[POOL_MONITOR]
+            )
+            _clients[uri] = client
+        return client
+
+
+def close_clients():
+    """Close every shared client (their pools and monitor threads)"""
+    with _clients_lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        client.close()
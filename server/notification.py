@@ -3,7 +3,6 @@
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-import json
 import sys
 import os
 from datetime import datetime
@@ -11,6 +10,8 @@ from bson.objectid import ObjectId
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from config.config import *
+from protocol.codec import encode_frame
+from server.ids import to_object_id
 
 
 class NotificationHandler:
@@ -52,10 +53,11 @@ class NotificationHandler:
                     'type': 'NOTIFICATION',
                     'notification': notification_data
                 }
-                message_data = json.dumps(message).encode()
-                message_length = len(message_data)
-                length_prefix = message_length.to_bytes(4, byteorder='big')
-                socket.sendall(length_prefix + message_data)
+                socket.sendall(encode_frame(
+                    message,
+                    getattr(socket, 'codec', CODEC_JSON),
+                    getattr(socket, 'compression', None)
+                ))
                 print(f"📲 TCP notification sent to user {user_id}")
                 return True
             except Exception as e:
@@ -338,7 +340,7 @@ Login to LearnLive to view details and submit.
                 return False
             
             # Get class details to find the teacher
-            class_data = self.db.classes.find_one({'_id': assignment['class_id']})
+            class_data = self.db.classes.find_one({'_id': to_object_id(assignment['class_id'])})
             if not class_data:
                 print(f"❌ Class not found for assignment")
                 return False
@@ -0,0 +1,57 @@
+# Message Handler Registry for LearnLive
+#
+# Handlers declare the message type they serve, whether a session token is
+# required and which role may call them. The server dispatches with a single
+# dict lookup and enforces authentication and roles in one place, so plugins
+# can add message types without touching the dispatch code.
+
+from collections import namedtuple
+
+
+HandlerSpec = namedtuple('HandlerSpec', [
+    'msg_type',     # Protocol message type, e.g. MSG_CREATE_CLASS
+    'func',         # Bound callable
+    'auth',         # Requires a valid session token
+    'role',         # 'teacher', 'student' or None for any authenticated user
+    'denied',       # Error returned when the caller has the wrong role
+    'with_socket',  # Called as func(data, client_socket, address)
+])
+
+
+def message_handler(msg_type, auth=True, role=None, denied=None, with_socket=False):
+    """Declare a server method as the handler for `msg_type`"""
+    def decorator(func):
+        declared = list(getattr(func, '_message_handlers', []))
+        declared.append((msg_type, auth, role, denied, with_socket))
+        func._message_handlers = declared
+        return func
+    return decorator
+
+
+class HandlerRegistry:
+    def __init__(self):
+        """Initialize an empty registry"""
+        self.handlers = {}  # msg_type -> HandlerSpec
+
+    def register(self, msg_type, func, auth=True, role=None, denied=None, with_socket=False):
+        """Register (or replace) the handler for a message type"""
+        if role and not denied:
+            denied = f'Only {role}s can perform {msg_type}'
+        self.handlers[msg_type] = HandlerSpec(msg_type, func, auth, role, denied, with_socket)
+
+    def collect(self, owner):
+        """Register every method of `owner` decorated with @message_handler"""
+        for name in dir(type(owner)):
+            declared = getattr(getattr(type(owner), name, None), '_message_handlers', None)
+            if not declared:
+                continue
+            method = getattr(owner, name)
+            for msg_type, auth, role, denied, with_socket in declared:
+                self.register(msg_type, method, auth, role, denied, with_socket)
+
+    def get(self, msg_type):
+        """Return the HandlerSpec for a message type, or None"""
+        return self.handlers.get(msg_type)
+
+    def __contains__(self, msg_type):
+        return msg_type in self.handlers
@@ -0,0 +1,105 @@
+# Session Cache for LearnLive
+#
+# Keeps recently verified session tokens in memory so authenticated
+# requests don't need a `users.find_one({'token': ...})` round trip.
+# Entries expire with TOKEN_EXPIRY, the least recently used entry is
+# evicted when the cache is full, and logging in again revokes the
+# user's previous token.
+
+import threading
+import time
+from collections import OrderedDict
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.config import *
+from server.metrics import METRICS
+
+
+class SessionCache:
+    def __init__(self, ttl=TOKEN_EXPIRY, max_entries=SESSION_CACHE_SIZE):
+        """Initialize an empty cache"""
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # token -> entry, least recently used first
+        self.user_tokens = {}  # user_id -> token
+        self.lock = threading.Lock()
+        METRICS.register_gauge('sessions.cached', lambda: len(self.entries))
+
+    def get(self, token):
+        """Return the live entry for `token`, or None on a miss"""
+        if not token:
+            return None
+
+        with self.lock:
+            entry = self.entries.get(token)
+            if entry is not None and not self.is_live(entry):
+                self._remove(token)
+                METRICS.increment('sessions.expired')
+                entry = None
+            if entry is None:
+                METRICS.increment('sessions.misses')
+                return None
+            self.entries.move_to_end(token)
+
+        METRICS.increment('sessions.hits')
+        return entry
+
+    def peek(self, token):
+        """Return the cached entry without touching LRU order or counters"""
+        with self.lock:
+            return self.entries.get(token)
+
+    def put(self, token, user, expires_at=None):
+        """Cache a verified session.
+
+        `user` is the verify_token result (success, user_id, name, email,
+        role). Any other token cached for the same user is revoked, since
+        logging in replaces the stored token. Returns the new entry, or None
+        if it has already expired.
+        """
+        if expires_at is None:
+            expires_at = time.time() + self.ttl
+        if expires_at <= time.time():
+            return None
+
+        entry = {
+            'token': token,
+            'user': user,
+            'expires_at': expires_at,
+            'revoked': False
+        }
+
+        with self.lock:
+            previous = self.user_tokens.get(user['user_id'])
+            if previous and previous != token:
+                self._remove(previous)
+                METRICS.increment('sessions.invalidations')
+
+            self._remove(token)
+            self.entries[token] = entry
+            self.user_tokens[user['user_id']] = token
+
+            while len(self.entries) > self.max_entries:
+                oldest = next(iter(self.entries))
+                self._remove(oldest)
+                METRICS.increment('sessions.evictions')
+
+        return entry
+
+    def is_live(self, entry):
+        """True while an entry (possibly bound to a connection) is still valid"""
+        return not entry['revoked'] and entry['expires_at'] > time.time()
+
+    def _remove(self, token):
+        """Remove a token and mark its entry revoked (caller holds the lock)"""
+        entry = self.entries.pop(token, None)
+        if entry is None:
+            return False
+        # Connections that bound this entry see the revocation immediately
+        entry['revoked'] = True
+        user_id = entry['user']['user_id']
+        if self.user_tokens.get(user_id) == token:
+            del self.user_tokens[user_id]
+        return True
@@ -0,0 +1,134 @@
+# Storage Codecs for LearnLive
+#
+# Files written to GridFS through Database.stream_to_gridfs() may be stored
+# compressed. The first block of an upload decides: formats that are
+# already compressed (JPEG, PNG, ZIP and the Office formats built on it,
+# ...) are recognised by their magic bytes and stored as they are; anything
+# else is compressed only if a trial on that block saves at least
+# GRIDFS_COMPRESSION_MIN_SAVING. The codec is recorded in the GridFS file
+# document (`storage_codec`, with the original size in `raw_length`) and
+# undone on the fly when the file is read back.
+
+import zlib
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.config import (
+    COMPRESSION_ZLIB, COMPRESSION_ZSTD, GRIDFS_COMPRESSION, GRIDFS_COMPRESSION_MIN_SAVING
+)
+
+try:
+    import zstandard
+except ImportError:  # Optional dependency
+    zstandard = None
+
+# Leading bytes of formats that don't compress any further
+COMPRESSED_MAGIC = (
+    b'\xff\xd8\xff',  # JPEG
+    b'\x89PNG\r\n\x1a\n',  # PNG
+    b'GIF8',  # GIF
+    b'PK\x03\x04',  # ZIP, DOCX, PPTX, XLSX
+    b'\x1f\x8b',  # gzip
+    b'(\xb5/\xfd',  # zstd
+    b'7z\xbc\xaf\x27\x1c',  # 7-Zip
+    b'Rar!\x1a\x07',  # RAR
+    b'BZh',  # bzip2
+    b'\xfd7zXZ\x00',  # xz
+)
+
+
+def is_compressed_format(head):
+    """True if `head` starts like an already-compressed file"""
+    return head.startswith(COMPRESSED_MAGIC) or head[4:8] == b'ftyp'  # MP4/MOV/HEIC
+
+
+def choose_storage_codec(head):
+    """Codec to store a file whose first block is `head`, or None to store it raw"""
+    if not GRIDFS_COMPRESSION or not head or is_compressed_format(head):
+        return None
+    codec = COMPRESSION_ZSTD if zstandard is not None else COMPRESSION_ZLIB
+    trial = storage_compressor(codec)
+    packed = len(trial.compress(head)) + len(trial.flush())
+    if packed > len(head) * (1 - GRIDFS_COMPRESSION_MIN_SAVING):
+        return None
+    return codec
+
+
+def storage_compressor(codec):
+    """Streaming compressor with compress(data) and flush()"""
+    if codec == COMPRESSION_ZSTD:
+        return zstandard.ZstdCompressor().compressobj()
+    return zlib.compressobj()
+
+
+def storage_decompressor(codec):
+    """Streaming decompressor with decompress(data)"""
+    if codec == COMPRESSION_ZSTD:
+        if zstandard is None:
+            raise RuntimeError('File is stored with zstd but zstandard is not installed')
+        return zstandard.ZstdDecompressor().decompressobj()
+    return zlib.decompressobj()
+
+
+def stored_codec(grid_out):
+    """Storage codec of a GridFS file (None if it is stored raw)"""
+    return getattr(grid_out, 'storage_codec', None)
+
+
+def stored_length(grid_out):
+    """Size of a GridFS file's original content"""
+    return getattr(grid_out, 'raw_length', None) or grid_out.length
+
+
+def iter_stored_chunks(grid_out):
+    """Yield a GridFS file's original content one stored chunk at a time"""
+    codec = stored_codec(grid_out)
+    if codec is None:
+        yield from grid_out
+        return
+    decoder = storage_decompressor(codec)
+    for chunk in grid_out:
+        data = decoder.decompress(chunk)
+        if data:
+            yield data
+
+
+def iter_stored_range(grid_out, offset=0, length=None):
+    """Yield up to `length` bytes of a GridFS file's original content from `offset`.
+    
+    Raw files seek straight to the offset. Compressed streams can't seek,
+    so they are decompressed from the start and the leading bytes dropped.
+    """
+    end = stored_length(grid_out)
+    if length is not None:
+        end = min(end, offset + length)
+    
+    if stored_codec(grid_out) is None:
+        grid_out.seek(offset)
+        remaining = end - offset
+        while remaining > 0:
+            chunk = grid_out.readchunk()  # Rest of the GridFS chunk at the current position
+            if not chunk:
+                break
+            if len(chunk) > remaining:
+                chunk = chunk[:remaining]
+            remaining -= len(chunk)
+            yield chunk
+        return
+    
+    position = 0
+    for chunk in iter_stored_chunks(grid_out):
+        start, stop = max(offset - position, 0), min(end - position, len(chunk))
+        if start < stop:
+            yield chunk[start:stop] if start or stop < len(chunk) else chunk
+        position += len(chunk)
+        if position >= end:
+            return
+
+
+def read_stored_file(grid_out):
+    """Read a GridFS file's whole original content"""
+    if stored_codec(grid_out) is None:
+        return grid_out.read()
+    return b''.join(iter_stored_chunks(grid_out))
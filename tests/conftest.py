@@ -0,0 +1,201 @@
+# Shared pytest fixtures for LearnLive
+#
+# MongoDB is replaced by mongomock (with its GridFS support), so Database,
+# DiscussionDB and the whole server run in-process without a MongoDB
+# server. Uploads go to a temporary directory.
+
+import asyncio
+import os
+import socket
+import sys
+import threading
+
+import mongomock
+import mongomock.gridfs
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import server.file_handler as file_handler
+import server.mongo as mongo
+from protocol.codec import decode_frame, encode_frame, parse_header
+from protocol.framing import recv_exact_into
+
+mongomock.gridfs.enable_gridfs_integration()
+
+
+@pytest.fixture
+def mongo_client(monkeypatch):
+    """A fresh in-memory MongoDB that get_client() hands out"""
+    client = mongomock.MongoClient()
+    monkeypatch.setattr(mongo, '_clients', {})
+    monkeypatch.setattr(mongo, 'MongoClient', lambda uri, **options: client)
+    return client
+
+
+@pytest.fixture
+def db(mongo_client):
+    """A Database on the in-memory MongoDB"""
+    from server.database import Database
+    return Database()
+
+
+@pytest.fixture
+def upload_folder(tmp_path, monkeypatch):
+    """Point the file handler's upload folders at a temporary directory"""
+    folder = tmp_path / 'uploads'
+    monkeypatch.setattr(file_handler, 'UPLOAD_FOLDER', str(folder))
+    monkeypatch.setattr(file_handler, 'PARTIAL_FOLDER', str(folder / '.partial'))
+    monkeypatch.setattr(file_handler, 'QUARANTINE_FOLDER', str(folder / '.quarantine'))
+    return folder
+
+
+@pytest.fixture
+def learnlive_server(mongo_client, upload_folder):
+    """A LearnLiveServer that isn't listening yet"""
+    from server.app import LearnLiveServer
+    instance = LearnLiveServer()
+    instance.running = True
+    yield instance
+    instance.running = False
+    instance.file_handler.stop()
+
+
+class WireClient:
+    """Blocking test client speaking the length-prefixed frame protocol"""
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.sock.settimeout(10)
+        self.codec = 'json'
+        self.compression = None
+
+    def send(self, message, payload=b''):
+        self.sock.sendall(encode_frame(message, self.codec, self.compression) + payload)
+
+    def send_raw(self, data):
+        self.sock.sendall(data)
+
+    def receive(self):
+        header = bytearray(4)
+        assert recv_exact_into(self.sock, memoryview(header)) == 4, 'connection closed'
+        length, compressed = parse_header(header)
+        data = bytearray(length)
+        assert recv_exact_into(self.sock, memoryview(data)) == length, 'connection closed'
+        return decode_frame(data, compressed, self.codec, self.compression)
+
+    def call(self, message, payload=b''):
+        self.send(message, payload)
+        return self.receive()
+
+    def close(self):
+        self.sock.close()
+
+
+def _serve_threaded(server_instance):
+    """Connect a WireClient to handle_client over a socket pair"""
+    from server.connection import ClientConnection
+    server_side, client_side = socket.socketpair()
+    thread = threading.Thread(
+        target=server_instance.handle_client,
+        args=(ClientConnection(server_side), ('127.0.0.1', 0)),
+        daemon=True
+    )
+    thread.start()
+    return WireClient(client_side), lambda: None
+
+
+def _listen_asyncio(server_instance):
+    """Serve on an ephemeral port with an AsyncServerEngine - returns (port, stop)"""
+    from server.async_server import AsyncServerEngine
+    engine = AsyncServerEngine(server_instance)
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+    address = {}
+
+    async def listen():
+        engine.loop = asyncio.get_running_loop()
+        tcp_server = await asyncio.start_server(engine.handle_connection, '127.0.0.1', 0)
+        address['port'] = tcp_server.sockets[0].getsockname()[1]
+        started.set()
+
+    async def shutdown():
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stop():
+        asyncio.run_coroutine_threadsafe(shutdown(), loop).result(5)
+        loop.call_soon_threadsafe(loop.stop)
+
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    asyncio.run_coroutine_threadsafe(listen(), loop)
+    assert started.wait(5)
+    return address['port'], stop
+
+
+def _serve_asyncio(server_instance):
+    """Connect a WireClient to an AsyncServerEngine on a background event loop"""
+    port, stop = _listen_asyncio(server_instance)
+    return WireClient(socket.create_connection(('127.0.0.1', port))), stop
+
+
+@pytest.fixture(params=['threaded', 'asyncio'])
+def wire(request, learnlive_server):
+    """A client connected to the server through each engine in turn"""
+    serve = _serve_threaded if request.param == 'threaded' else _serve_asyncio
+    client, stop = serve(learnlive_server)
+    yield client
+    client.close()
+    stop()
+
+
+@pytest.fixture
+def server_port(learnlive_server):
+    """Port of the server listening on localhost (asyncio engine)"""
+    port, stop = _listen_asyncio(learnlive_server)
+    yield port
+    stop()
+
+
+@pytest.fixture
+def connect(server_port):
+    """Connect LearnLiveClients to the server - call with a login result to authenticate"""
+    from client.utility import LearnLiveClient
+    clients = []
+
+    def connect_client(login=None):
+        client = LearnLiveClient()
+        assert client.connect('127.0.0.1', server_port)['success']
+        if login:
+            client.token = login['token']
+            client.user_data = login
+        clients.append(client)
+        return client
+
+    yield connect_client
+    for client in clients:
+        client.disconnect()
+
+
+def sign_up(db, email, role, name=None, password='secret'):
+    """Create a user and log in - returns the login result (user_id, token, ...)"""
+    db.create_user(email, password, name or email.split('@')[0], role)
+    return db.authenticate_user(email, password)
+
+
+@pytest.fixture
+def classroom(db):
+    """A teacher's class with one enrolled student and one assignment"""
+    teacher = sign_up(db, 'teacher@example.com', 'teacher')
+    student = sign_up(db, 'student@example.com', 'student')
+    created = db.create_class(teacher['user_id'], 'Biology')
+    db.join_class(student['user_id'], created['class_code'])
+    assignment = db.create_assignment(created['class_id'], 'Essay', 'Write it', '2030-01-01')
+    return {
+        'teacher': teacher,
+        'student': student,
+        'class_id': created['class_id'],
+        'class_code': created['class_code'],
+        'assignment_id': assignment['assignment_id']
+    }
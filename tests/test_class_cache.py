@@ -0,0 +1,73 @@
+# The assignment -> class cache (server/class_cache.py) and
+# Database.resolve_assignment_class, which reads through it.
+
+from config.config import ERR_NOT_FOUND
+from server.class_cache import AssignmentClassCache
+from conftest import sign_up
+
+
+def klass(class_id, students=()):
+    return {'_id': class_id, 'class_name': class_id, 'students': list(students)}
+
+
+def test_put_get_and_lru_eviction():
+    cache = AssignmentClassCache(max_entries=2)
+    cache.put('a1', klass('c1'), cache.generation)
+    cache.put('a2', klass('c1'), cache.generation)
+    assert cache.get('a1')['_id'] == 'c1'
+
+    cache.put('a3', klass('c2'), cache.generation)
+    assert cache.get('a2') is None  # Least recently used
+    assert cache.get('a1') is not None and cache.get('a3') is not None
+
+
+def test_stale_generation_is_not_cached():
+    cache = AssignmentClassCache()
+    generation = cache.generation
+    cache.invalidate_class('c1')  # A write landed while the lookup ran
+    cache.put('a1', klass('c1'), generation)
+    assert cache.get('a1') is None
+
+
+def test_invalidate_class_drops_its_assignments_only():
+    cache = AssignmentClassCache()
+    cache.put('a1', klass('c1'), cache.generation)
+    cache.put('a2', klass('c1'), cache.generation)
+    cache.put('a3', klass('c2'), cache.generation)
+    cache.invalidate_class('c1')
+    assert cache.get('a1') is None and cache.get('a2') is None
+    assert cache.get('a3') is not None
+
+
+def test_resolve_is_cached_until_the_class_changes(db, classroom):
+    first = db.resolve_assignment_class(classroom['assignment_id'])
+    assert first['success']
+    assert first['class']['students'] == [classroom['student']['user_id']]
+    assert db.assignment_classes.get(classroom['assignment_id']) is not None
+
+    # A new student joining invalidates the entry, so they can submit at once
+    newcomer = sign_up(db, 'new@example.com', 'student')
+    db.join_class(newcomer['user_id'], classroom['class_code'])
+    resolved = db.resolve_assignment_class(classroom['assignment_id'])
+    assert newcomer['user_id'] in resolved['class']['students']
+    result = db.submit_assignment_gridfs(classroom['assignment_id'], newcomer['user_id'], b'hi', '', 'hi.txt')
+    assert result['success']
+
+
+def test_deleting_a_class_drops_only_the_class(db, classroom):
+    assert db.resolve_assignment_class(classroom['assignment_id'])['success']
+    assert db.delete_class(classroom['class_id'])['success']
+
+    assert db.assignment_classes.get(classroom['assignment_id']) is None
+    assert db.resolve_assignment_class(classroom['assignment_id'])['code'] == ERR_NOT_FOUND
+    assert db.assignments.count_documents({'class_id': classroom['class_id']}) == 1
+
+
+def test_resolve_unknown_and_malformed_ids_are_not_found(db, classroom):
+    for assignment_id in ('f' * 24, 'not-an-id', None):
+        resolved = db.resolve_assignment_class(assignment_id)
+        assert resolved['success'] is False
+        assert resolved['code'] == ERR_NOT_FOUND
+
+    result = db.submit_assignment_gridfs('not-an-id', classroom['student']['user_id'], b'x', '', 'x.txt')
+    assert result['code'] == ERR_NOT_FOUND
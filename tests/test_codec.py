@@ -0,0 +1,54 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from config.config import *
+from protocol import codec
+from protocol.codec import CodecError, choose_codec, decode, encode
+from conftest import sign_up
+
+
+def test_choose_codec_takes_first_supported():
+    assert choose_codec([CODEC_MSGPACK, CODEC_JSON]) == CODEC_MSGPACK
+    assert choose_codec(['cbor', CODEC_JSON]) == CODEC_JSON
+    assert choose_codec(['cbor']) == CODEC_JSON
+    assert choose_codec(None) == CODEC_JSON
+
+
+def test_json_is_the_fallback_without_msgpack(monkeypatch):
+    monkeypatch.setattr(codec, 'msgpack', None)
+    assert codec.available_codecs() == [CODEC_JSON]
+    assert choose_codec([CODEC_MSGPACK, CODEC_JSON]) == CODEC_JSON
+
+
+def test_msgpack_carries_bytes_and_datetimes():
+    sent_at = datetime(2030, 1, 2, 3, 4, 5)
+    message = {'type': 'FILE', 'data': b'\x00\xff' * 10, 'sent_at': sent_at, 'raw': bytearray(b'ab')}
+    decoded = decode(encode(message, CODEC_MSGPACK), CODEC_MSGPACK)
+
+    assert decoded['data'] == b'\x00\xff' * 10
+    assert decoded['raw'] == b'ab'
+    assert decoded['sent_at'] == sent_at.replace(tzinfo=timezone.utc)
+
+
+def test_json_round_trip_from_memoryview():
+    payload = encode({'type': 'PING', 'n': [1, 2]})
+    assert decode(memoryview(payload)) == {'type': 'PING', 'n': [1, 2]}
+
+
+@pytest.mark.parametrize('name', [CODEC_JSON, CODEC_MSGPACK])
+def test_bad_frames_raise_codec_error(name):
+    with pytest.raises(CodecError):
+        decode(b'\xc1not a frame', name)
+    with pytest.raises(CodecError):
+        encode({'value': object()}, name)
+
+
+def test_client_negotiates_msgpack(connect, learnlive_server):
+    login = sign_up(learnlive_server.db, 'codec@example.com', 'teacher')
+    client = connect(login)
+    assert client.codec == CODEC_MSGPACK
+
+    learnlive_server.db.create_class(login['user_id'], 'History')
+    response = client.request(MSG_VIEW_CLASSES).result(timeout=5)
+    assert [c['class_name'] for c in response['classes']] == ['History']
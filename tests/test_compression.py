@@ -0,0 +1,92 @@
+import os
+import zlib
+
+import pytest
+
+from config.config import *
+import protocol.codec as codec
+from protocol.codec import (
+    COMPRESSION_STATS, CodecError, FrameTooLarge, choose_compression, decode_frame, decompress,
+    encode_frame, parse_header
+)
+from conftest import sign_up
+
+
+def split(frame):
+    length, compressed = parse_header(frame[:4])
+    assert length == len(frame) - 4
+    return frame[4:], compressed
+
+
+def test_choose_compression():
+    assert choose_compression([COMPRESSION_ZLIB]) == COMPRESSION_ZLIB
+    assert choose_compression(['brotli']) is None
+    assert choose_compression(None) is None
+
+
+def test_small_frames_are_not_compressed():
+    _, compressed = split(encode_frame({'type': 'PING'}, compression=COMPRESSION_ZLIB))
+    assert not compressed
+
+
+def test_large_frames_are_compressed_and_flagged():
+    message = {'type': 'BIG_LIST', 'items': ['same text'] * 5000}
+    payload, compressed = split(encode_frame(message, compression=COMPRESSION_ZLIB))
+    assert compressed
+    assert len(payload) < COMPRESSION_THRESHOLD
+    assert decode_frame(payload, compressed, CODEC_JSON, COMPRESSION_ZLIB) == message
+
+    stats = COMPRESSION_STATS.snapshot()['BIG_LIST']
+    assert stats['frames'] >= 1 and stats['ratio'] > 1
+    assert stats['decompressed_frames'] >= 1
+
+
+def test_incompressible_frames_are_sent_raw():
+    message = {'type': 'NOISE', 'data': os.urandom(COMPRESSION_THRESHOLD)}
+    payload, compressed = split(encode_frame(message, CODEC_MSGPACK, COMPRESSION_ZLIB))
+    assert not compressed
+    assert decode_frame(payload, compressed, CODEC_MSGPACK, COMPRESSION_ZLIB) == message
+
+
+def test_compressed_frame_without_negotiation_is_rejected():
+    payload, compressed = split(encode_frame({'type': 'X', 'items': ['a'] * 5000}, compression=COMPRESSION_ZLIB))
+    with pytest.raises(CodecError):
+        decode_frame(payload, compressed)
+    with pytest.raises(CodecError):
+        decode_frame(b'not zlib', True, CODEC_JSON, COMPRESSION_ZLIB)
+
+
+def test_decompression_is_capped():
+    packed = zlib.compress(b'\0' * 1000)
+    assert decompress(packed, COMPRESSION_ZLIB, max_size=1000) == b'\0' * 1000
+    with pytest.raises(FrameTooLarge):
+        decompress(packed, COMPRESSION_ZLIB, max_size=999)
+    with pytest.raises(CodecError):
+        decode_frame(packed[:-4], True, CODEC_JSON, COMPRESSION_ZLIB)  # Truncated
+
+
+def test_decompression_bomb_closes_the_connection(wire, monkeypatch):
+    response = wire.call({'type': MSG_HELLO, 'data': {'codecs': [CODEC_JSON], 'compression': [COMPRESSION_ZLIB]}})
+    wire.compression = response['compression']
+    monkeypatch.setattr(codec, 'MAX_FRAME_SIZE', 10000)
+
+    bomb = zlib.compress(b'[' + b' ' * 20000 + b']')
+    wire.send_raw((len(bomb) | codec.COMPRESSED_FLAG).to_bytes(4, byteorder='big') + bomb)
+    response = wire.receive()
+    assert response['code'] == ERR_BAD_REQUEST
+    assert wire.sock.recv(1) == b''
+
+
+def test_large_listing_over_compressed_connection(wire, learnlive_server):
+    response = wire.call({'type': MSG_HELLO, 'data': {'codecs': [CODEC_JSON], 'compression': [COMPRESSION_ZLIB]}})
+    assert response['compression'] == COMPRESSION_ZLIB
+    wire.compression = COMPRESSION_ZLIB
+
+    login = sign_up(learnlive_server.db, 'zip@example.com', 'teacher')
+    for n in range(80):
+        learnlive_server.db.create_class(login['user_id'], f'Class {n}', description='x' * 200)
+
+    before = COMPRESSION_STATS.snapshot().get(MSG_VIEW_CLASSES, {}).get('frames', 0)
+    classes = wire.call({'type': MSG_VIEW_CLASSES, 'token': login['token'], 'data': {}})
+    assert len(classes['classes']) == 80
+    assert COMPRESSION_STATS.snapshot()[MSG_VIEW_CLASSES]['frames'] == before + 1
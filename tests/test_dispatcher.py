@@ -0,0 +1,68 @@
+import threading
+
+from config.config import *
+from server.dispatcher import RequestDispatcher
+
+
+def test_submit_runs_on_a_worker():
+    dispatcher = RequestDispatcher(workers=2, queue_size=4, type_limits={})
+    future, busy = dispatcher.submit('PING', lambda a, b: a + b, 2, 3)
+    assert busy is None
+    assert future.result(timeout=5) == 5
+
+
+def test_exceptions_are_set_on_the_future():
+    dispatcher = RequestDispatcher(workers=1, queue_size=4, type_limits={})
+
+    def fail():
+        raise RuntimeError('boom')
+
+    future, _ = dispatcher.submit('PING', fail)
+    assert isinstance(future.exception(timeout=5), RuntimeError)
+
+
+def test_type_limit_rejects_with_busy():
+    release = threading.Event()
+    dispatcher = RequestDispatcher(workers=2, queue_size=4, type_limits={'UPLOAD': 1})
+    first, _ = dispatcher.submit('UPLOAD', release.wait)
+
+    future, busy = dispatcher.submit('UPLOAD', release.wait)
+    assert future is None
+    assert busy['code'] == ERR_BUSY
+    assert busy['request_type'] == 'UPLOAD'
+    assert busy['retry_after'] == DISPATCH_RETRY_AFTER
+
+    # Other types are not affected by the UPLOAD limit
+    other, busy = dispatcher.submit('PING', lambda: 'ok')
+    assert busy is None and other.result(timeout=5) == 'ok'
+
+    # The slot is released once the request finishes
+    release.set()
+    first.result(timeout=5)
+    future, busy = dispatcher.submit('UPLOAD', lambda: 'done')
+    assert busy is None and future.result(timeout=5) == 'done'
+
+
+def test_full_queue_rejects_with_busy():
+    release = threading.Event()
+    started = threading.Event()
+
+    def block():
+        started.set()
+        release.wait()
+
+    dispatcher = RequestDispatcher(workers=1, queue_size=1, type_limits={'UPLOAD': 5})
+    running, _ = dispatcher.submit('PING', block)
+    started.wait(timeout=5)
+    queued, _ = dispatcher.submit('PING', lambda: None)
+
+    future, busy = dispatcher.submit('UPLOAD', lambda: None)
+    assert future is None
+    assert busy['reason'] == 'Request queue is full'
+
+    # The rejected request gave its UPLOAD slot back
+    assert dispatcher.type_limits['UPLOAD']._value == 5
+
+    release.set()
+    running.result(timeout=5)
+    queued.result(timeout=5)
@@ -0,0 +1,82 @@
+import os
+import threading
+
+from config.config import *
+from protocol.framing import recv_exact_into
+
+
+def upload(db, classroom, content, filename='notes.bin'):
+    result = db.upload_material_gridfs(
+        classroom['class_id'], classroom['teacher']['user_id'], 'Notes', 'file', content, filename
+    )
+    assert result['success']
+    return result['file_id']
+
+
+def download(wire, token, data):
+    """Send DOWNLOAD_FILE and read metadata, raw bytes and the final reply"""
+    wire.send({'type': MSG_DOWNLOAD_FILE, 'token': token, 'data': data})
+    metadata = wire.receive()
+    if not metadata.get('success'):
+        return metadata, None, None
+    content = bytearray(metadata['size'])
+    assert recv_exact_into(wire.sock, memoryview(content)) == metadata['size']
+    return metadata, bytes(content), wire.receive()
+
+
+def test_file_is_streamed_chunk_by_chunk(db, classroom):
+    content = os.urandom(GRIDFS_STREAM_CHUNK * 2 + 100)
+    result = db.download_material_gridfs(upload(db, classroom, content))
+
+    chunks = list(result['file_stream'])
+    assert len(chunks) == 3
+    assert max(len(chunk) for chunk in chunks) <= GRIDFS_STREAM_CHUNK
+    assert b''.join(chunks) == content
+
+
+def test_download_over_the_wire(wire, learnlive_server, classroom):
+    content = os.urandom(GRIDFS_STREAM_CHUNK + 1234)
+    file_id = upload(learnlive_server.db, classroom, content)
+
+    metadata, received, final = download(wire, classroom['student']['token'], {'file_id': file_id, 'request_id': 'dl'})
+    assert metadata['filename'] == 'notes.bin'
+    assert metadata['request_id'] == 'dl'
+    assert metadata['size'] == metadata['total_size'] == len(content)
+    assert received == content
+    assert final['message'] == 'File sent successfully'
+
+    # The raw bytes were exactly `size`, so the next frame still parses
+    assert wire.call({'type': 'NO_SUCH_MESSAGE', 'data': {}})['error'] == 'Unknown message type'
+
+
+def test_missing_file_sends_no_payload(wire, classroom):
+    metadata, received, _ = download(wire, classroom['student']['token'], {'file_id': 'f' * 24})
+    assert metadata['type'] == RESP_ERROR
+    assert received is None
+    assert wire.call({'type': 'NO_SUCH_MESSAGE', 'data': {}})['error'] == 'Unknown message type'
+
+
+def test_client_streams_download_to_a_file(connect, learnlive_server, classroom):
+    content = os.urandom(100 * 1024)
+    file_id = upload(learnlive_server.db, classroom, content)
+
+    client = connect(classroom['student'])
+    done = threading.Event()
+    completed = {}
+    progress = []
+
+    def on_message(message):
+        if message.get('type') == 'FILE_DOWNLOAD_COMPLETE':
+            completed.update(message)
+            done.set()
+
+    client.set_message_callback(on_message)
+    started = client.download_file_binary(file_id, lambda received, total: progress.append(received), use_cache=False)
+    assert started['success']
+    assert done.wait(5)
+
+    assert completed['size'] == len(content)
+    with open(completed['file_path'], 'rb') as f:
+        assert f.read() == content
+    os.remove(completed['file_path'])
+    assert progress[-1] == len(content)
@@ -0,0 +1,79 @@
+# Both server engines (threaded and asyncio) share frame_steps, so every
+# test here runs against each of them through the `wire` fixture.
+
+import struct
+
+from config.config import *
+from conftest import sign_up
+
+
+def test_malformed_frame_gets_error(wire):
+    wire.send_raw(struct.pack('>I', 5) + b'nope!')
+    response = wire.receive()
+    assert response['type'] == RESP_ERROR
+    assert response['error'] == 'Invalid message format'
+
+
+def test_unknown_message_type(wire):
+    response = wire.call({'type': 'NO_SUCH_MESSAGE', 'data': {}})
+    assert response['error'] == 'Unknown message type'
+
+
+def test_unauthorized_without_token(wire):
+    response = wire.call({'type': MSG_VIEW_CLASSES, 'data': {}})
+    assert response['error'] == 'Unauthorized'
+
+
+def test_hello_switches_codec(wire):
+    response = wire.call({'type': MSG_HELLO, 'data': {'codecs': [CODEC_MSGPACK, CODEC_JSON]}})
+    assert response['success']
+    assert response['codec'] == CODEC_MSGPACK
+
+    # The following frames are msgpack in both directions
+    wire.codec = CODEC_MSGPACK
+    response = wire.call({'type': 'NO_SUCH_MESSAGE', 'data': {}})
+    assert response['error'] == 'Unknown message type'
+
+
+def test_signup_login_and_authenticated_request(wire, learnlive_server):
+    response = wire.call({'type': MSG_SIGNUP, 'data': {
+        'email': 'ada@example.com', 'password': 'secret', 'name': 'Ada', 'role': 'teacher'
+    }})
+    assert response['success']
+
+    login = wire.call({'type': MSG_LOGIN, 'data': {'email': 'ada@example.com', 'password': 'secret'}})
+    assert login['success']
+
+    response = wire.call({'type': MSG_CREATE_CLASS, 'token': login['token'], 'data': {'class_name': 'Algebra'}})
+    assert response['success']
+    classes = wire.call({'type': MSG_VIEW_CLASSES, 'token': login['token'], 'data': {}})
+    assert [c['class_name'] for c in classes['classes']] == ['Algebra']
+
+
+def test_pipelined_requests_echo_request_id(wire, learnlive_server):
+    login = sign_up(learnlive_server.db, 'pip@example.com', 'teacher')
+    for request_id in range(5):
+        wire.send({'type': MSG_VIEW_CLASSES, 'token': login['token'], 'request_id': request_id, 'data': {}})
+    responses = [wire.receive() for _ in range(5)]
+    assert sorted(r['request_id'] for r in responses) == list(range(5))
+    assert all(r['success'] for r in responses)
+
+
+def test_oversized_inline_chunk_is_rejected_and_skipped(wire):
+    size = TRANSFER_MAX_CHUNK_SIZE + 1
+    wire.send({'type': MSG_FILE_CHUNK, 'data': {'chunk_length': size, 'chunk_number': 3}}, b'\0' * size)
+    response = wire.receive()
+    assert response['chunk_number'] == 3
+    assert 'exceeds' in response['error']
+
+    # The payload was drained, so the next frame still parses
+    response = wire.call({'type': 'NO_SUCH_MESSAGE', 'data': {}})
+    assert response['error'] == 'Unknown message type'
+
+
+def test_oversized_frame_closes_the_connection(wire):
+    wire.send_raw(struct.pack('>I', MAX_FRAME_SIZE + 1))
+    response = wire.receive()
+    assert response['code'] == ERR_BAD_REQUEST
+    assert 'exceeds' in response['error']
+    assert wire.sock.recv(1) == b''
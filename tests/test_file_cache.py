@@ -0,0 +1,114 @@
+import itertools
+import os
+import threading
+
+import pytest
+
+import client.file_cache as file_cache
+from client.file_cache import FileCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Strictly increasing time.time() so LRU order never ties"""
+    ticks = itertools.count(1000)
+    monkeypatch.setattr(file_cache.time, 'time', lambda: next(ticks))
+
+
+def download(tmp_path, name, content):
+    path = tmp_path / name
+    path.write_bytes(content)
+    return str(path)
+
+
+def test_hit_and_stale_etag(tmp_path):
+    cache = FileCache(str(tmp_path / 'cache'), max_bytes=1000)
+    path = cache.put('f1', 'etag-1', download(tmp_path, 'a.txt', b'hello'), 'a.txt')
+    assert os.path.basename(path) == 'a.txt'
+    assert not os.path.exists(tmp_path / 'a.txt')  # Moved, not copied
+
+    entry = cache.get('f1', 'etag-1')
+    assert entry['size'] == 5
+    with open(entry['path'], 'rb') as f:
+        assert f.read() == b'hello'
+
+    assert cache.get('f1', 'etag-2') is None
+    assert cache.get('f1', 'etag-1') is None  # The stale copy was dropped
+    assert not os.path.exists(path)
+
+
+def test_damaged_copy_is_a_miss(tmp_path):
+    cache = FileCache(str(tmp_path / 'cache'), max_bytes=1000)
+    path = cache.put('f1', 'e', download(tmp_path, 'a.txt', b'hello'), 'a.txt')
+    with open(path, 'ab') as f:
+        f.write(b'!')
+    assert cache.get('f1', 'e') is None
+
+
+def test_least_recently_used_is_evicted(tmp_path, clock):
+    cache = FileCache(str(tmp_path / 'cache'), max_bytes=10)
+    cache.put('f1', 'e', download(tmp_path, '1', b'aaaa'), '1')
+    cache.put('f2', 'e', download(tmp_path, '2', b'bbbb'), '2')
+    cache.get('f1', 'e')
+    cache.put('f3', 'e', download(tmp_path, '3', b'cccc'), '3')
+
+    assert cache.get('f2', 'e') is None
+    assert cache.get('f1', 'e') and cache.get('f3', 'e')
+    assert cache.usage() == {'files': 2, 'bytes': 8, 'max_bytes': 10}
+
+
+def test_file_too_large_is_not_cached(tmp_path):
+    cache = FileCache(str(tmp_path / 'cache'), max_bytes=3)
+    source = download(tmp_path, 'big', b'abcdef')
+    assert cache.put('f1', 'e', source, 'big') is None
+    assert os.path.exists(source)
+
+
+def test_index_survives_restart_and_orphans_are_removed(tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    FileCache(cache_dir).put('f1', 'e', download(tmp_path, 'a.txt', b'hello'), 'a.txt')
+    os.makedirs(os.path.join(cache_dir, 'orphan'))
+
+    reopened = FileCache(cache_dir)
+    assert reopened.get('f1', 'e')['filename'] == 'a.txt'
+    assert not os.path.exists(os.path.join(cache_dir, 'orphan'))
+
+    reopened.clear()
+    assert FileCache(cache_dir).usage()['files'] == 0
+
+
+def test_second_download_is_served_from_cache(connect, learnlive_server, classroom, tmp_path, monkeypatch):
+    result = learnlive_server.db.upload_material_gridfs(
+        classroom['class_id'], classroom['teacher']['user_id'], 'Notes', 'file', b'cached bytes', 'notes.txt'
+    )
+    client = connect(classroom['student'])
+    client.file_cache = FileCache(str(tmp_path / 'cache'))
+    downloads = []
+    original = learnlive_server.db.download_material_gridfs
+    monkeypatch.setattr(learnlive_server.db, 'download_material_gridfs',
+                        lambda *args: downloads.append(args) or original(*args))
+
+    def fetch():
+        done = threading.Event()
+        completed = {}
+
+        def on_message(message):
+            if message.get('type') == 'FILE_DOWNLOAD_COMPLETE':
+                completed.update(message)
+                done.set()
+
+        client.set_message_callback(on_message)
+        assert client.download_file_binary(result['file_id'])['success']
+        assert done.wait(5)
+        return completed
+
+    first = fetch()
+    assert first['cached']
+    cached_path = first['file_path']
+
+    # Nothing is downloaded the second time; the same cached file is handed back
+    second = fetch()
+    assert second['file_path'] == cached_path
+    assert len(downloads) == 1
+    with open(cached_path, 'rb') as f:
+        assert f.read() == b'cached bytes'
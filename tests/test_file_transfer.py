@@ -0,0 +1,149 @@
+# Resumable chunked uploads (FileHandler): windowed chunks with
+# cumulative/selective ACKs, resume after a restart, and ownership.
+
+import os
+import threading
+import time
+
+import pytest
+
+from config.config import *
+from server.file_handler import FileHandler
+
+CHUNK = TRANSFER_CHUNK_SIZE
+
+
+@pytest.fixture
+def handler(upload_folder):
+    handler = FileHandler()
+    yield handler
+    handler.stop()
+
+
+def start(handler, transfer_id='t1', user_id='alice', size=CHUNK * 4 + 10):
+    return handler.handle_file_upload_start({
+        'transfer_id': transfer_id, 'user_id': user_id, 'filename': 'notes.txt',
+        'filesize': size, 'file_type': 'text/plain'
+    }, None)
+
+
+def chunk(handler, number, size=CHUNK * 4 + 10, transfer_id='t1', user_id='alice'):
+    length = min(CHUNK, size - number * CHUNK)
+    return handler.handle_file_chunk({
+        'transfer_id': transfer_id, 'user_id': user_id, 'chunk_number': number,
+        'chunk_data': bytes([number]) * length
+    })
+
+
+def test_out_of_order_chunks_are_acked_with_sack(handler):
+    assert start(handler)['total_chunks'] == 5
+    assert chunk(handler, 0)['cumulative_ack'] == 1
+
+    ack = chunk(handler, 2)
+    assert ack['cumulative_ack'] == 1
+    assert ack['sack'] == [[2, 3]]
+
+    ack = chunk(handler, 4)
+    assert ack['sack'] == [[2, 3], [4, 5]]
+
+    # A duplicate is acknowledged without being counted again
+    assert chunk(handler, 2)['chunks_received'] == 3
+
+    ack = chunk(handler, 1)
+    assert ack['cumulative_ack'] == 3
+    assert ack['sack'] == [[4, 5]]
+
+
+def test_incomplete_upload_reports_missing_ranges(handler):
+    start(handler)
+    chunk(handler, 0)
+    chunk(handler, 3)
+    response = handler.handle_file_upload_complete({'transfer_id': 't1', 'user_id': 'alice'})
+    assert response['success'] is False
+    assert response['missing'] == [[1, 3], [4, 5]]
+
+
+def test_completed_upload_is_assembled(handler, upload_folder):
+    start(handler)
+    for number in (4, 2, 0, 3, 1):
+        chunk(handler, number)
+    response = handler.handle_file_upload_complete({'transfer_id': 't1', 'user_id': 'alice'})
+    assert response['success']
+
+    with open(response['filepath'], 'rb') as f:
+        content = f.read()
+    assert content == b''.join(bytes([n]) * CHUNK for n in range(4)) + b'\x04' * 10
+    assert os.listdir(upload_folder / '.partial') == []
+    assert handler.reserved_bytes == 0
+
+
+def test_transfer_resumes_after_restart(handler, upload_folder):
+    start(handler)
+    chunk(handler, 0)
+    chunk(handler, 1)
+    handler.stop()
+
+    restarted = FileHandler()
+    try:
+        assert restarted.reserved_bytes == CHUNK * 4 + 10
+        response = start(restarted)
+        assert response['resumed']
+        assert response['missing'] == [[2, 5]]
+    finally:
+        restarted.stop()
+
+
+def test_chunk_of_wrong_size_is_rejected(handler):
+    start(handler)
+    response = handler.handle_file_chunk({
+        'transfer_id': 't1', 'user_id': 'alice', 'chunk_number': 0, 'chunk_data': b'short'
+    })
+    assert response['success'] is False
+
+
+def test_per_user_quota(handler, monkeypatch):
+    import server.file_handler as file_handler
+    monkeypatch.setattr(file_handler, 'TRANSFER_USER_QUOTA', CHUNK * 6)
+    assert start(handler, 't1')['success']
+    assert start(handler, 't2')['success'] is False
+    assert start(handler, 't3', user_id='bob')['success']
+
+
+def test_other_users_cannot_touch_a_transfer(handler):
+    start(handler)
+    chunk(handler, 0)
+
+    # Resuming, querying, sending chunks and completing all check the owner
+    assert start(handler, user_id='mallory')['success'] is False
+    assert handler.handle_query_transfer({'transfer_id': 't1', 'user_id': 'mallory'})['success'] is False
+    assert chunk(handler, 1, user_id='mallory')['success'] is False
+    assert handler.handle_file_upload_complete({'transfer_id': 't1', 'user_id': 'mallory'})['success'] is False
+
+    status = handler.handle_query_transfer({'transfer_id': 't1', 'user_id': 'alice'})
+    assert status['chunks_received'] == 1
+
+
+def test_concurrent_starts_of_one_transfer_reserve_once(handler, monkeypatch):
+    check_quota = handler._quota_error
+
+    def slow_quota_check(user_id, size):
+        time.sleep(0.05)  # Widen the gap between looking the transfer up and registering it
+        return check_quota(user_id, size)
+    monkeypatch.setattr(handler, '_quota_error', slow_quota_check)
+
+    barrier = threading.Barrier(4)
+    results = []
+
+    def start_together():
+        barrier.wait()
+        results.append(start(handler))
+    threads = [threading.Thread(target=start_together) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert all(result['success'] for result in results)
+    assert sum(not result.get('resumed') for result in results) == 1
+    assert handler.reserved_bytes == CHUNK * 4 + 10
+    assert list(handler.active_transfers) == ['t1']
@@ -0,0 +1,124 @@
+import socket
+import threading
+
+import pytest
+
+from config.config import BUFFER_SIZE, FRAME_BUFFER_LIMIT, MAX_FRAME_SIZE
+from protocol.codec import FrameTooLarge, decode_frame, encode_frame
+from protocol.framing import FrameReader, PayloadStream, recv_exact_into
+
+
+@pytest.fixture
+def pair():
+    left, right = socket.socketpair()
+    left.settimeout(5)
+    right.settimeout(5)
+    yield left, right
+    left.close()
+    right.close()
+
+
+def send_in_background(sock, data):
+    """sendall from a thread so payloads larger than the socket buffer don't block the test"""
+    thread = threading.Thread(target=sock.sendall, args=(data,), daemon=True)
+    thread.start()
+    return thread
+
+
+def test_recv_exact_into_collects_split_writes(pair):
+    left, right = pair
+    left.sendall(b'abc')
+    left.sendall(b'def')
+    view = memoryview(bytearray(6))
+    assert recv_exact_into(right, view) == 6
+    assert bytes(view) == b'abcdef'
+
+    left.sendall(b'xy')
+    left.shutdown(socket.SHUT_WR)
+    assert recv_exact_into(right, memoryview(bytearray(4))) == 2
+
+
+def test_frames_reuse_the_connection_buffer(pair):
+    left, right = pair
+    reader = FrameReader(right)
+    buffer = reader.buffer
+    left.sendall(encode_frame({'n': 1}) + encode_frame({'n': 2}))
+
+    for n in (1, 2):
+        payload, compressed = reader.read_frame()
+        assert payload.obj is buffer
+        assert decode_frame(payload, compressed) == {'n': n}
+
+
+def test_larger_frames_grow_the_buffer_up_to_the_limit(pair):
+    left, right = pair
+    reader = FrameReader(right)
+
+    message = {'blob': 'x' * (BUFFER_SIZE * 2)}
+    send_in_background(left, encode_frame(message))
+    payload, compressed = reader.read_frame()
+    assert decode_frame(payload, compressed) == message
+    assert len(reader.buffer) >= BUFFER_SIZE * 2
+
+    grown = reader.buffer
+    message = {'blob': 'y' * (FRAME_BUFFER_LIMIT + 1)}
+    thread = send_in_background(left, encode_frame(message))
+    payload, compressed = reader.read_frame()
+    thread.join()
+    assert decode_frame(payload, compressed) == message
+    assert reader.buffer is grown  # Oversized frames get a one-off buffer
+
+
+def test_read_frame_returns_none_at_eof(pair):
+    left, right = pair
+    reader = FrameReader(right)
+    left.sendall(encode_frame({'n': 1})[:6])
+    left.shutdown(socket.SHUT_WR)
+    assert reader.read_frame() is None
+
+
+def test_oversized_frame_is_refused_before_reading_it(pair):
+    left, right = pair
+    reader = FrameReader(right)
+    left.sendall((MAX_FRAME_SIZE + 1).to_bytes(4, byteorder='big'))
+    with pytest.raises(FrameTooLarge):
+        reader.read_frame()
+    assert len(reader.buffer) == BUFFER_SIZE
+
+
+def test_payload_stream_reads_exactly_its_payload(pair):
+    left, right = pair
+    left.sendall(b'0123456789' + encode_frame({'next': True}))
+
+    stream = PayloadStream(right, 10)
+    assert stream.read(4) == b'0123'
+    assert bytes(stream.read_all()) == b'456789'
+    assert stream.complete
+    assert stream.read(4) == b''
+
+    payload, compressed = FrameReader(right).read_frame()
+    assert decode_frame(payload, compressed) == {'next': True}
+
+
+def test_payload_stream_drain_leaves_next_frame(pair):
+    left, right = pair
+    left.sendall(b'z' * 5000 + encode_frame({'next': True}))
+
+    stream = PayloadStream(right, 5000)
+    stream.read(10)
+    stream.drain()
+    assert stream.complete
+    payload, compressed = FrameReader(right).read_frame()
+    assert decode_frame(payload, compressed) == {'next': True}
+
+
+def test_payload_stream_raises_when_peer_closes_early(pair):
+    left, right = pair
+    left.sendall(b'short')
+    left.shutdown(socket.SHUT_WR)
+
+    stream = PayloadStream(right, 100)
+    with pytest.raises(ConnectionError):
+        stream.read(100)
+    assert not stream.complete
+    assert stream.read(10) == b''
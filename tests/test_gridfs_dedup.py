@@ -0,0 +1,77 @@
+# GridFS deduplication: identical uploads share chunks but keep their own
+# file documents, and references are released when nothing uses them.
+
+import pytest
+from bson import ObjectId
+
+from conftest import sign_up
+
+ESSAY = b'The same essay, word for word. ' * 100
+
+
+@pytest.fixture
+def second_student(db, classroom):
+    student = sign_up(db, 'bob@example.com', 'student')
+    db.join_class(student['user_id'], classroom['class_code'])
+    return student
+
+
+def submit(db, classroom, student, filename, content=ESSAY):
+    result = db.submit_assignment_gridfs(classroom['assignment_id'], student['user_id'], content, '', filename)
+    assert result['success'], result
+    return result
+
+
+def read(db, file_id):
+    download = db.download_material_gridfs(file_id)
+    return download['filename'], b''.join(download['file_stream'])
+
+
+def test_duplicate_upload_keeps_its_own_name_and_owner(db, classroom, second_student):
+    alice = submit(db, classroom, classroom['student'], 'alice_essay.txt')
+    bob = submit(db, classroom, second_student, 'bob_essay.txt')
+
+    assert bob['file_id'] != alice['file_id']
+    assert read(db, alice['file_id']) == ('alice_essay.txt', ESSAY)
+    assert read(db, bob['file_id']) == ('bob_essay.txt', ESSAY)
+    assert db.get_file_info(bob['file_id'])['filename'] == 'bob_essay.txt'
+    assert db.download_material_from_server(bob['file_id'])['file_content'] == ESSAY
+
+    bob_document = db.gridfs_files.find_one({'filename': 'bob_essay.txt'})
+    assert bob_document['student_id'] == second_student['user_id']
+
+    # Only the first upload holds chunks
+    assert db.gridfs_chunks.count_documents({'files_id': bob_document['_id']}) == 0
+    assert db.dedup_stats()['shared_files'] == 1
+
+
+def test_resubmission_keeps_earlier_submissions(db, classroom, second_student):
+    alice = submit(db, classroom, classroom['student'], 'alice_essay.txt')
+    bob = submit(db, classroom, second_student, 'bob_essay.txt')
+
+    # Alice resubmits something else: her first submission and its file stay
+    submit(db, classroom, classroom['student'], 'alice_v2.txt', b'completely different')
+    assert db.submissions.count_documents({'student_id': classroom['student']['user_id']}) == 2
+    assert read(db, alice['file_id']) == ('alice_essay.txt', ESSAY)
+    assert read(db, bob['file_id']) == ('bob_essay.txt', ESSAY)
+
+
+def test_file_is_released_when_its_submission_cannot_be_stored(db, classroom, second_student, monkeypatch):
+    alice = submit(db, classroom, classroom['student'], 'alice_essay.txt')
+
+    def fail(record):
+        raise RuntimeError('write failed')
+    monkeypatch.setattr(db.db.submissions, 'insert_one', fail)
+
+    result = db.submit_assignment_gridfs(classroom['assignment_id'], second_student['user_id'], ESSAY, '', 'bob.txt')
+    assert not result['success']
+    assert db.gridfs_files.count_documents({'filename': 'bob.txt'}) == 0
+    assert db.gridfs_files.find_one({'_id': ObjectId(alice['file_id'])})['refcount'] == 1
+    assert read(db, alice['file_id']) == ('alice_essay.txt', ESSAY)
+
+
+def test_release_of_unshared_file_deletes_it(db, classroom):
+    result = submit(db, classroom, classroom['student'], 'solo.txt', b'only me')
+    assert db.release_gridfs_file(result['file_id']) == {'success': True, 'deleted': True}
+    assert db.gridfs_files.count_documents({}) == 0
+    assert db.gridfs_chunks.count_documents({}) == 0
@@ -0,0 +1,47 @@
+# GridFS uploads: the JSON frame declares `file_size` and that many raw
+# bytes follow it on the socket.
+
+import pytest
+
+from config.config import *
+
+
+def submit(wire, classroom, file_size, payload=b''):
+    wire.send({'type': MSG_SUBMIT_ASSIGNMENT_GRIDFS, 'token': classroom['student']['token'], 'data': {
+        'assignment_id': classroom['assignment_id'],
+        'filename': 'essay.txt',
+        'file_size': file_size
+    }}, payload)
+    return wire.receive()
+
+
+def test_submission_streams_declared_bytes(wire, classroom, learnlive_server):
+    response = submit(wire, classroom, 10, b'0123456789')
+    assert response['success']
+
+    download = learnlive_server.db.download_material_gridfs(response['file_id'])
+    assert b''.join(download['file_stream']) == b'0123456789'
+
+    # The stream is still framed correctly afterwards
+    assert wire.call({'type': 'NO_SUCH_MESSAGE', 'data': {}})['error'] == 'Unknown message type'
+
+
+@pytest.mark.parametrize('file_size', ['10', -1, 2.5, None, True])
+def test_invalid_file_size_is_rejected_before_reading(wire, classroom, learnlive_server, file_size):
+    response = submit(wire, classroom, file_size, b'0123456789')
+    assert response['success'] is False
+    assert response['code'] == ERR_BAD_REQUEST
+
+    # Nothing was stored, and the connection is closed because the raw
+    # bytes can't be separated from the next frame
+    assert learnlive_server.db.db.submissions.count_documents({}) == 0
+    try:
+        assert wire.sock.recv(1) == b''
+    except ConnectionResetError:
+        pass  # Closed with the unread payload still buffered
+
+
+def test_unknown_assignment_is_not_found(wire, classroom):
+    classroom['assignment_id'] = 'f' * 24
+    response = submit(wire, classroom, 3, b'abc')
+    assert response['code'] == ERR_NOT_FOUND
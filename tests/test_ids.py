@@ -0,0 +1,77 @@
+# Reference fields are stored as hex strings (server/ids.py); older
+# documents are rewritten by server.migrate_ids and listings cope with the
+# ones it hasn't reached.
+
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from server.ids import InvalidReference, canonical_refs, to_object_id, to_optional_ref, to_ref
+from server.migrate_ids import migrate_field
+
+
+def test_to_ref_and_to_object_id_round_trip():
+    oid = ObjectId()
+    assert to_ref(oid) == to_ref(str(oid)) == str(oid)
+    assert to_object_id(str(oid)) == oid
+    assert to_optional_ref(None) is None
+
+
+@pytest.mark.parametrize('value', ['ABC123', 'z' * 24, 42, None, b'x' * 12])
+def test_malformed_ids_are_rejected(value):
+    with pytest.raises(InvalidReference):
+        to_object_id(value)
+
+
+def test_canonical_refs_converts_lists_and_leaves_other_fields():
+    oid = ObjectId()
+    document = {'_id': oid, 'teacher_id': oid, 'students': [oid, str(oid)], 'class_name': 'x'}
+    canonical_refs(document, 'classes')
+    assert document == {'_id': oid, 'teacher_id': str(oid), 'students': [str(oid), str(oid)], 'class_name': 'x'}
+
+
+def test_migrate_field_rewrites_object_ids_in_batches(mongo_client):
+    collection = mongo_client['migration']['classes']
+    oids = [ObjectId() for _ in range(5)]
+    collection.insert_many([{'teacher_id': oid, 'students': [oid]} for oid in oids])
+    collection.insert_one({'teacher_id': 'CLASS-CODE', 'students': []})
+
+    assert migrate_field(collection, 'teacher_id', batch_size=2, dry_run=True) == 5
+    assert collection.count_documents({'teacher_id': {'$type': 'objectId'}}) == 5
+
+    assert migrate_field(collection, 'teacher_id', batch_size=2) == 5
+    assert migrate_field(collection, 'students', batch_size=2) == 5
+    assert sorted(d['teacher_id'] for d in collection.find()) == sorted([str(o) for o in oids] + ['CLASS-CODE'])
+    assert all(isinstance(s, str) for d in collection.find() for s in d['students'])
+
+    # Nothing left on a second run
+    assert migrate_field(collection, 'teacher_id', batch_size=2) == 0
+
+
+def test_listings_serve_unmigrated_documents(db, classroom):
+    student_id = classroom['student']['user_id']
+    assignment_id = classroom['assignment_id']
+    db.submissions.insert_one({
+        'assignment_id': assignment_id,
+        'student_id': ObjectId(student_id),  # Written before references were strings
+        'file_id': ObjectId(),
+        'submitted_at': datetime.now()
+    })
+    # A submission whose assignment_id was never an id at all
+    db.submissions.insert_one({'assignment_id': 'not-an-id', 'student_id': student_id, 'submitted_at': datetime.now()})
+
+    page = db.get_submissions(assignment_id)
+    assert page['success']
+    [submission] = page['submissions']
+    assert submission['student_id'] == student_id
+    assert isinstance(submission['file_id'], str)
+    assert submission['student_name'] == 'student'
+
+    teacher_page = db.get_teacher_submissions(classroom['teacher']['user_id'])
+    assert teacher_page['success']
+    assert teacher_page['submissions'][0]['assignment_title'] == 'Essay'
+
+    todo = db.get_student_all_assignments(student_id, not_submitted=True)
+    assert todo['success']
+    assert [a['title'] for a in todo['assignments']] == ['Essay']
@@ -0,0 +1,43 @@
+import mongomock
+import pytest
+from pymongo import ASCENDING
+
+from server.indexes import INDEX_MANIFEST, IndexSpec, ensure_indexes
+
+
+@pytest.fixture
+def fresh_db():
+    return mongomock.MongoClient()['learnlive_test']
+
+
+def index_keys(database, collection):
+    return [info['key'] for info in database[collection].index_information().values()]
+
+
+def test_database_applies_the_manifest(db):
+    for spec in INDEX_MANIFEST:
+        assert spec.keys in index_keys(db.db, spec.collection), spec.reason
+
+
+def test_manifest_is_idempotent(fresh_db):
+    first = ensure_indexes(fresh_db)
+    second = ensure_indexes(fresh_db)
+    assert first == second
+    assert first['conflicts'] == []
+    assert len(first['ensured']) == len(INDEX_MANIFEST)
+
+
+def test_unique_index_over_duplicates_is_reported(fresh_db):
+    fresh_db.users.insert_many([{'email': 'twin@example.com'}, {'email': 'twin@example.com'}])
+    manifest = [IndexSpec('users', [('email', ASCENDING)], {'unique': True}, 'test')]
+
+    result = ensure_indexes(fresh_db, manifest)
+    assert result['ensured'] == []
+    assert result['conflicts'][0]['collection'] == 'users'
+    assert fresh_db.users.count_documents({}) == 2
+
+
+def test_every_spec_names_its_queries():
+    for spec in INDEX_MANIFEST:
+        assert spec.reason
+        assert spec.keys and all(direction in (1, -1) for _, direction in spec.keys)
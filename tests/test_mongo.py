@@ -0,0 +1,77 @@
+from types import SimpleNamespace
+
+import mongomock
+import pytest
+
+import server.mongo as mongo
+from config.config import *
+from server.mongo import PoolMonitor, close_clients, get_client
+
+
+@pytest.fixture
+def created(monkeypatch):
+    """Record every MongoClient get_client() constructs"""
+    clients = []
+
+    def make_client(uri, **options):
+        client = mongomock.MongoClient()
+        client.uri, client.options, client.closed = uri, options, False
+        client.close = lambda: setattr(client, 'closed', True)
+        clients.append(client)
+        return client
+
+    monkeypatch.setattr(mongo, '_clients', {})
+    monkeypatch.setattr(mongo, 'MongoClient', make_client)
+    return clients
+
+
+def test_one_client_per_uri(created):
+    assert get_client() is get_client(MONGODB_URI)
+    assert get_client('mongodb://other:27017') is not get_client()
+    assert [client.uri for client in created] == [MONGODB_URI, 'mongodb://other:27017']
+
+
+def test_client_uses_pool_settings(created):
+    options = get_client().options
+    assert options['maxPoolSize'] == MONGO_MAX_POOL_SIZE
+    assert options['minPoolSize'] == MONGO_MIN_POOL_SIZE
+    assert options['waitQueueTimeoutMS'] == MONGO_WAIT_QUEUE_TIMEOUT_MS
+    assert options['event_listeners'] == [mongo.POOL_MONITOR]
+
+
+def test_close_clients_closes_and_forgets(created):
+    first = get_client()
+    close_clients()
+    assert first.closed
+    assert get_client() is not first
+
+
+def test_database_and_discussions_share_the_client(created):
+    from server.database import Database
+    from server.discussion_db import DiscussionDB
+    assert Database().client is DiscussionDB().client
+    assert len(created) == 1
+
+
+def test_pool_monitor_stats():
+    monitor = PoolMonitor()
+    monitor.connection_created(None)
+    monitor.connection_created(None)
+    monitor.connection_closed(None)
+    for _ in range(2):
+        monitor.connection_check_out_started(None)
+        monitor.connection_checked_out(None)
+    monitor.connection_check_out_started(None)
+    monitor.connection_check_out_failed(SimpleNamespace(reason='timeout'))
+
+    stats = monitor.stats()
+    assert stats['checkouts'] == 2
+    assert stats['checkout_failures'] == 1
+    assert stats['open_connections'] == 1
+    assert 0 <= stats['avg_wait_ms'] <= stats['max_wait_ms']
+
+
+def test_checkout_without_start_counts_no_wait():
+    monitor = PoolMonitor()
+    monitor.connection_checked_out(None)
+    assert monitor.stats()['max_wait_ms'] == 0.0
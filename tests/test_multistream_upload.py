@@ -0,0 +1,74 @@
+import os
+
+from client.utility import _ChunkSchedule
+from config.config import *
+from conftest import sign_up
+
+
+def test_schedule_hands_out_missing_chunks_in_order():
+    schedule = _ChunkSchedule([[1, 3], [5, 6]], 6)
+    assert schedule.chunks_received == 3
+    assert [schedule.next_chunk() for _ in range(4)] == [1, 2, 5, None]
+
+
+def test_given_back_chunks_are_sent_first():
+    schedule = _ChunkSchedule([[0, 4]], 4)
+    schedule.next_chunk()
+    schedule.next_chunk()
+    schedule.give_back([0, 1])
+    assert [schedule.next_chunk() for _ in range(4)] == [0, 1, 2, 3]
+
+
+def test_acknowledged_chunks_are_skipped():
+    schedule = _ChunkSchedule([[0, 6]], 6)
+    schedule.next_chunk()
+    received = schedule.acknowledge({'chunk_number': 0, 'cumulative_ack': 2, 'sack': [[4, 5]], 'chunks_received': 3})
+    assert received == 3
+    assert schedule.has_pending()
+    assert [schedule.next_chunk() for _ in range(4)] == [2, 3, 5, None]
+
+    schedule.give_back([2, 3, 5])
+    schedule.acknowledge({'chunk_number': 3, 'cumulative_ack': 6, 'chunks_received': 6})
+    assert not schedule.has_pending()
+
+
+def test_upload_over_several_streams(connect, learnlive_server, tmp_path):
+    login = sign_up(learnlive_server.db, 'streams@example.com', 'student')
+    client = connect(login)
+    content = os.urandom(TRANSFER_CHUNK_SIZE * 20 + 17)
+    source = tmp_path / 'lecture.txt'
+    source.write_bytes(content)
+
+    progress = []
+    response = client.upload_file(str(source), streams=3, window=4,
+                                  progress_callback=lambda received, total: progress.append((received, total)))
+    assert response['success'], response
+    with open(response['filepath'], 'rb') as f:
+        assert f.read() == content
+    assert progress[-1] == (21, 21)
+
+
+def test_interrupted_upload_resumes(connect, learnlive_server, tmp_path):
+    login = sign_up(learnlive_server.db, 'resume@example.com', 'student')
+    content = os.urandom(TRANSFER_CHUNK_SIZE * 6)
+    source = tmp_path / 'resume.txt'
+    source.write_bytes(content)
+
+    # Send half the chunks by hand, as if the connection dropped part way
+    first = connect(login)
+    start = first.request(MSG_START_FILE_TRANSFER, {
+        'transfer_id': 'resume-1', 'filename': 'resume.txt', 'filesize': len(content), 'file_type': 'txt'
+    }).result(timeout=5)
+    for number in (0, 2, 4):
+        piece = content[number * TRANSFER_CHUNK_SIZE:(number + 1) * TRANSFER_CHUNK_SIZE]
+        first.request(MSG_FILE_CHUNK, {'transfer_id': 'resume-1', 'chunk_number': number, 'chunk_length': len(piece)},
+                      payload=piece).result(timeout=5)
+    first.disconnect()
+    assert start['total_chunks'] == 6
+
+    second = connect(login)
+    assert second.query_transfer('resume-1')['missing'] == [[1, 2], [3, 4], [5, 6]]
+    response = second.upload_file(str(source), transfer_id='resume-1', streams=2)
+    assert response['success'], response
+    with open(response['filepath'], 'rb') as f:
+        assert f.read() == content
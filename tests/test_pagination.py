@@ -0,0 +1,128 @@
+# Cursor-paged listings (VIEW_SUBMISSIONS, GET_TEACHER_SUBMISSIONS,
+# GET_STUDENT_ALL_ASSIGNMENTS) and the client helper that follows
+# next_cursor to the last page.
+
+from datetime import datetime
+
+import pytest
+
+import server.app as app
+from conftest import sign_up
+
+
+@pytest.fixture
+def small_pages(monkeypatch):
+    monkeypatch.setattr(app, 'LIST_PAGE_SIZE', 3)
+
+
+@pytest.fixture
+def busy_class(db, classroom):
+    """Seven students who all submitted the classroom's assignment"""
+    for n in range(7):
+        student = sign_up(db, f'student{n}@example.com', 'student')
+        db.join_class(student['user_id'], classroom['class_code'])
+        db.submit_assignment_gridfs(classroom['assignment_id'], student['user_id'], f'essay {n}'.encode(), '', f'{n}.txt')
+    return classroom
+
+
+def test_pages_cover_every_submission_once(db, busy_class):
+    seen = []
+    cursor = None
+    while True:
+        page = db.get_submissions(busy_class['assignment_id'], limit=3, cursor=cursor)
+        assert page['success']
+        seen += [s['_id'] for s in page['submissions']]
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+    assert len(seen) == len(set(seen)) == 7
+
+
+def test_invalid_cursor_is_an_error(db, busy_class):
+    assert db.get_submissions(busy_class['assignment_id'], cursor='garbage')['success'] is False
+
+
+def test_pages_cover_mixed_type_sort_values(db, classroom):
+    """Older documents hold submitted_at as a string, or not at all"""
+    values = [datetime(2024, 5, day) for day in (1, 2, 3)] + ['2023-01-01 10:00', '2023-02-01 10:00', None]
+    db.submissions.insert_many([
+        {'assignment_id': classroom['assignment_id'], 'student_id': classroom['student']['user_id'],
+         'filename': f'{n}.txt', **({'submitted_at': value} if value else {})}
+        for n, value in enumerate(values)
+    ])
+
+    seen = []
+    cursor = None
+    while True:
+        page = db.get_submissions(classroom['assignment_id'], limit=2, cursor=cursor)
+        assert page['success'], page
+        seen += [s['filename'] for s in page['submissions']]
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+    # Dates newest first, then the strings, then the one without a date
+    assert seen == ['2.txt', '1.txt', '0.txt', '4.txt', '3.txt', '5.txt']
+
+
+def test_client_follows_next_cursor(connect, busy_class, small_pages):
+    client = connect(busy_class['teacher'])
+    response = client.request_all_pages(
+        'VIEW_SUBMISSIONS', {'assignment_id': busy_class['assignment_id']}, 'submissions'
+    ).result(10)
+    assert response['success']
+    assert sorted(s['filename'] for s in response['submissions']) == [f'{n}.txt' for n in range(7)]
+    assert response['next_cursor'] is None
+
+    response = client.request_all_pages('GET_TEACHER_SUBMISSIONS', {}, 'submissions').result(10)
+    assert len(response['submissions']) == 7
+    assert all(s['class_name'] == 'Biology' for s in response['submissions'])
+
+
+def test_client_stops_at_an_error_page(connect, busy_class):
+    client = connect(busy_class['teacher'])
+    response = client.request_all_pages('VIEW_SUBMISSIONS', {
+        'assignment_id': busy_class['assignment_id'], 'limit': 0
+    }, 'submissions').result(10)
+    assert response['success'] is False
+    assert 'limit' in response['error']
+
+
+@pytest.fixture
+def todo(db, classroom):
+    """Assignments due at different times; the student handed in the first"""
+    from datetime import datetime, timedelta
+    today = datetime.now()
+    ids = {'essay': classroom['assignment_id']}
+    for name, days in (('soon', 2), ('later', 20), ('past', -3)):
+        created = db.create_assignment(classroom['class_id'], name, '', (today + timedelta(days=days)).strftime('%Y-%m-%d'))
+        ids[name] = created['assignment_id']
+    db.submit_assignment_gridfs(ids['soon'], classroom['student']['user_id'], b'done', '', 'soon.txt')
+    return classroom, ids
+
+
+def titles(response):
+    assert response['success'], response
+    return sorted(a['title'] for a in response['assignments'])
+
+
+def test_todo_filters(db, todo):
+    classroom, ids = todo
+    student_id = classroom['student']['user_id']
+    assert titles(db.get_student_all_assignments(student_id)) == ['Essay', 'later', 'past', 'soon']
+    assert titles(db.get_student_all_assignments(student_id, due_within_days=7)) == ['soon']
+    assert titles(db.get_student_all_assignments(student_id, due_within_days=30)) == ['later', 'soon']
+    assert titles(db.get_student_all_assignments(student_id, not_submitted=True)) == ['Essay', 'later', 'past']
+    assert titles(db.get_student_all_assignments(student_id, due_within_days=30, not_submitted=True)) == ['later']
+
+    submitted = {a['title']: a['submitted'] for a in db.get_student_all_assignments(student_id)['assignments']}
+    assert submitted == {'Essay': False, 'soon': True, 'later': False, 'past': False}
+
+
+def test_todo_pages_through_client_with_filters(connect, todo, small_pages):
+    classroom, ids = todo
+    client = connect(classroom['student'])
+    response = client.request_all_pages('GET_STUDENT_ALL_ASSIGNMENTS', {'not_submitted': True}, 'assignments').result(10)
+    assert titles(response) == ['Essay', 'later', 'past']
+
+    response = client.request_all_pages('GET_STUDENT_ALL_ASSIGNMENTS', {'due_within_days': -1}, 'assignments').result(10)
+    assert response['success'] is False
@@ -0,0 +1,118 @@
+import asyncio
+import socket
+import threading
+import time
+
+from config.config import *
+from protocol.codec import encode_frame
+from protocol.framing import recv_exact_into
+from server.async_server import StreamSocket
+from conftest import sign_up
+
+
+def slow_handlers(learnlive_server):
+    """Register SLOW, which is held until the returned event is set, and FAST"""
+    release = threading.Event()
+
+    def slow(data):
+        release.wait(5)
+        return {'type': 'SLOW', 'success': True}
+
+    def fast(data):
+        return {'type': 'FAST', 'success': True}
+
+    learnlive_server.register_handler('SLOW', slow, auth=False)
+    learnlive_server.register_handler('FAST', fast, auth=False)
+    return release
+
+
+def test_responses_arrive_out_of_order(wire, learnlive_server):
+    release = slow_handlers(learnlive_server)
+    wire.send({'type': 'SLOW', 'request_id': 'a', 'data': {}})
+    wire.send({'type': 'FAST', 'request_id': 'b', 'data': {}})
+
+    # FAST is answered while SLOW is still running
+    first = wire.receive()
+    assert (first['request_id'], first['type']) == ('b', 'FAST')
+    release.set()
+    second = wire.receive()
+    assert (second['request_id'], second['type']) == ('a', 'SLOW')
+
+
+def test_request_without_id_gets_none_back(wire):
+    response = wire.call({'type': 'NO_SUCH_MESSAGE', 'data': {}})
+    assert 'request_id' not in response
+
+
+def test_client_futures_match_their_responses(connect, learnlive_server):
+    release = slow_handlers(learnlive_server)
+    client = connect()
+
+    slow = client.request('SLOW')
+    fast = client.request('FAST')
+    assert fast.result(timeout=5)['type'] == 'FAST'
+    assert not slow.done()
+    release.set()
+    assert slow.result(timeout=5)['type'] == 'SLOW'
+    assert client.pending_requests == {}
+
+
+def test_many_requests_in_flight(connect, learnlive_server):
+    login = sign_up(learnlive_server.db, 'many@example.com', 'teacher')
+    learnlive_server.db.create_class(login['user_id'], 'Physics')
+    client = connect(login)
+
+    futures = [client.request(MSG_VIEW_CLASSES) for _ in range(20)]
+    for future in futures:
+        response = future.result(timeout=5)
+        assert response['success']
+        assert [c['class_name'] for c in response['classes']] == ['Physics']
+
+
+def test_disconnect_fails_pending_requests(connect, learnlive_server):
+    started = threading.Event()
+    release = threading.Event()
+
+    def hang(data):
+        started.set()
+        release.wait(5)
+        return {'type': 'HANG'}
+
+    learnlive_server.register_handler('HANG', hang, auth=False)
+    client = connect()
+    future = client.request('HANG')
+    assert started.wait(5)
+
+    client.disconnect()
+    assert future.result(timeout=5)['type'] == 'ERROR'
+    release.set()
+
+
+def test_loop_sends_wait_for_a_workers_multi_part_write():
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    server_side, client_side = socket.socketpair()
+
+    async def open_stream():
+        reader, writer = await asyncio.open_connection(sock=server_side)
+        return StreamSocket(reader, writer, loop)
+
+    stream = asyncio.run_coroutine_threadsafe(open_stream(), loop).result(5)
+    try:
+        # A worker holds send_lock across two writes; a frame the loop sends meanwhile waits
+        with stream.send_lock:
+            stream.sendall(b'head')
+            sent = asyncio.run_coroutine_threadsafe(stream.send_response({'type': 'LOOP'}), loop)
+            time.sleep(0.1)
+            assert not sent.done()
+            stream.sendall(b'tail')
+        sent.result(5)
+
+        expected = b'headtail' + encode_frame({'type': 'LOOP'})
+        received = bytearray(len(expected))
+        assert recv_exact_into(client_side, memoryview(received)) == len(expected)
+        assert received == expected
+    finally:
+        stream.close()
+        client_side.close()
+        loop.call_soon_threadsafe(loop.stop)
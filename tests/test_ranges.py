@@ -0,0 +1,90 @@
+# Byte-range downloads (`offset`/`length` on DOWNLOAD_FILE), HEAD_FILE and
+# the resumable DownloadManager built on them.
+
+import hashlib
+import json
+import os
+
+import pytest
+
+from client.utility import DownloadManager
+from config.config import *
+from protocol.framing import recv_exact_into
+
+CONTENT = os.urandom(GRIDFS_STREAM_CHUNK + 5000)
+
+
+@pytest.fixture
+def file_id(db, classroom):
+    result = db.upload_material_gridfs(
+        classroom['class_id'], classroom['teacher']['user_id'], 'Slides', 'file', CONTENT, 'slides.bin'
+    )
+    return result['file_id']
+
+
+def download(wire, token, data):
+    wire.send({'type': MSG_DOWNLOAD_FILE, 'token': token, 'data': data})
+    metadata = wire.receive()
+    if not metadata.get('success'):
+        return metadata, None
+    content = bytearray(metadata['size'])
+    assert recv_exact_into(wire.sock, memoryview(content)) == metadata['size']
+    assert wire.receive()['success']
+    return metadata, bytes(content)
+
+
+@pytest.mark.parametrize('offset, length', [(0, 0), (10, 100), (GRIDFS_STREAM_CHUNK - 1, 2), (5000, None)])
+def test_range_over_the_wire(wire, classroom, file_id, offset, length):
+    data = {'file_id': file_id, 'offset': offset}
+    if length is not None:
+        data['length'] = length
+    metadata, content = download(wire, classroom['student']['token'], data)
+
+    end = len(CONTENT) if length is None else offset + length
+    assert content == CONTENT[offset:end]
+    assert metadata['offset'] == offset
+    assert metadata['total_size'] == len(CONTENT)
+    assert metadata['sha256'] == hashlib.sha256(CONTENT).hexdigest()
+
+
+@pytest.mark.parametrize('data', [{'offset': -1}, {'offset': '5'}, {'length': -3}, {'offset': len(CONTENT) + 1}])
+def test_bad_ranges_are_rejected(wire, classroom, file_id, data):
+    metadata, content = download(wire, classroom['student']['token'], {'file_id': file_id, **data})
+    assert metadata['success'] is False
+    assert content is None
+
+
+def test_head_file_etag(db, file_id):
+    info = db.get_file_info(file_id)
+    assert info['etag'] == info['sha256'] == hashlib.sha256(CONTENT).hexdigest()
+    assert info['total_size'] == len(CONTENT)
+    assert info['filename'] == 'slides.bin'
+    assert not db.get_file_info('f' * 24)['success']
+
+
+def test_download_manager_resumes_partial_file(connect, classroom, file_id, tmp_path):
+    dest = str(tmp_path / 'slides.bin')
+    with open(dest + '.part', 'wb') as f:
+        f.write(CONTENT[:1000])
+    with open(dest + '.part.json', 'w') as f:
+        json.dump({'file_id': file_id, 'total_size': len(CONTENT), 'sha256': hashlib.sha256(CONTENT).hexdigest()}, f)
+
+    progress = []
+    result = DownloadManager(connect(classroom['student'])).download(
+        file_id, dest, lambda on_disk, total: progress.append(on_disk))
+    assert result['success'], result
+    with open(dest, 'rb') as f:
+        assert f.read() == CONTENT
+    assert not os.path.exists(dest + '.part')
+    assert progress[0] > 1000 and progress[-1] == len(CONTENT)
+
+
+def test_download_manager_restarts_partial_of_another_file(connect, classroom, file_id, tmp_path):
+    dest = str(tmp_path / 'slides.bin')
+    with open(dest + '.part', 'wb') as f:
+        f.write(b'stale bytes from some other file')
+
+    result = DownloadManager(connect(classroom['student'])).download(file_id, dest)
+    assert result['success'], result
+    with open(dest, 'rb') as f:
+        assert f.read() == CONTENT
@@ -0,0 +1,65 @@
+# FILE_CHUNK with `chunk_length`: the chunk's raw bytes follow the header
+# frame instead of travelling base64-encoded inside it.
+
+import base64
+import os
+
+from config.config import *
+from conftest import sign_up
+
+CHUNK = TRANSFER_CHUNK_SIZE
+
+
+def start(wire, token, size):
+    response = wire.call({'type': MSG_START_FILE_TRANSFER, 'token': token, 'data': {
+        'transfer_id': 'raw-1', 'filename': 'notes.txt', 'filesize': size, 'file_type': 'txt'
+    }})
+    assert response['success']
+    return response
+
+
+def test_raw_chunks_are_advertised_and_accepted(wire, learnlive_server):
+    token = sign_up(learnlive_server.db, 'raw@example.com', 'student')['token']
+    content = os.urandom(CHUNK * 2 + 5)
+    assert start(wire, token, len(content))['raw_chunks']
+
+    for number in range(3):
+        piece = content[number * CHUNK:(number + 1) * CHUNK]
+        ack = wire.call({'type': MSG_FILE_CHUNK, 'token': token, 'request_id': number, 'data': {
+            'transfer_id': 'raw-1', 'chunk_number': number, 'chunk_length': len(piece)
+        }}, piece)
+        assert ack['success'] and ack['request_id'] == number
+
+    response = wire.call({'type': MSG_END_FILE_TRANSFER, 'token': token, 'data': {'transfer_id': 'raw-1'}})
+    assert response['success']
+    with open(response['filepath'], 'rb') as f:
+        assert f.read() == content
+
+
+def test_base64_chunks_still_work(wire, learnlive_server):
+    token = sign_up(learnlive_server.db, 'b64@example.com', 'student')['token']
+    start(wire, token, 10)
+    ack = wire.call({'type': MSG_FILE_CHUNK, 'token': token, 'data': {
+        'transfer_id': 'raw-1', 'chunk_number': 0, 'chunk_data': base64.b64encode(b'0123456789').decode()
+    }})
+    assert ack['success'] and ack['chunks_received'] == 1
+
+
+def test_wrong_length_is_rejected_and_stream_stays_framed(wire, learnlive_server):
+    token = sign_up(learnlive_server.db, 'short@example.com', 'student')['token']
+    start(wire, token, CHUNK * 2)
+    ack = wire.call({'type': MSG_FILE_CHUNK, 'token': token, 'data': {
+        'transfer_id': 'raw-1', 'chunk_number': 0, 'chunk_length': 100
+    }}, b'x' * 100)
+    assert ack['success'] is False
+    assert 'must be' in ack['error']
+
+    assert wire.call({'type': 'NO_SUCH_MESSAGE', 'data': {}})['error'] == 'Unknown message type'
+
+
+def test_unauthorized_raw_chunk_is_drained(wire):
+    response = wire.call({'type': MSG_FILE_CHUNK, 'data': {
+        'transfer_id': 'raw-1', 'chunk_number': 0, 'chunk_length': 1000
+    }}, b'x' * 1000)
+    assert response['error'] == 'Unauthorized'
+    assert wire.call({'type': 'NO_SUCH_MESSAGE', 'data': {}})['error'] == 'Unknown message type'
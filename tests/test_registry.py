@@ -0,0 +1,75 @@
+from config.config import *
+from server.registry import HandlerRegistry, message_handler
+from conftest import sign_up
+
+
+class Plugin:
+    @message_handler('PING', auth=False)
+    @message_handler('PING_TOO', auth=False)
+    def ping(self, data):
+        return {'type': 'PONG'}
+
+    @message_handler('GRADE', role='teacher')
+    def grade(self, data):
+        return {'type': 'GRADED'}
+
+    def helper(self):
+        pass
+
+
+def test_collect_registers_decorated_methods():
+    plugin = Plugin()
+    registry = HandlerRegistry()
+    registry.collect(plugin)
+
+    assert 'PING' in registry and 'PING_TOO' in registry and 'GRADE' in registry
+    assert len(registry.handlers) == 3
+    assert registry.get('PING').func({}) == {'type': 'PONG'}
+    assert registry.get('nothing') is None
+
+
+def test_role_gets_default_denied_message():
+    registry = HandlerRegistry()
+    registry.collect(Plugin())
+    spec = registry.get('GRADE')
+    assert spec.auth and spec.role == 'teacher'
+    assert spec.denied == 'Only teachers can perform GRADE'
+
+
+def test_registered_handler_is_dispatched(learnlive_server):
+    learnlive_server.register_handler('ECHO', lambda data: {'type': 'ECHO', 'data': data}, auth=False)
+    response = learnlive_server.process_message({'type': 'ECHO', 'data': {'x': 1}}, None, None)
+    assert response == {'type': 'ECHO', 'data': {'x': 1}}
+
+
+def test_role_is_enforced_centrally(learnlive_server):
+    login = sign_up(learnlive_server.db, 'student@example.com', 'student')
+    response = learnlive_server.process_message(
+        {'type': MSG_CREATE_CLASS, 'token': login['token'], 'data': {'class_name': 'Chemistry'}}, None, None)
+    assert response['error'] == 'Only teachers can create classes'
+    assert learnlive_server.db.classes.count_documents({}) == 0
+
+
+def test_authenticated_handler_receives_caller(learnlive_server):
+    seen = {}
+    learnlive_server.register_handler('WHOAMI', lambda data: seen.update(data) or {'type': 'OK'})
+    login = sign_up(learnlive_server.db, 'who@example.com', 'teacher')
+
+    response = learnlive_server.process_message({'type': 'WHOAMI', 'data': {}}, None, None)
+    assert response['error'] == 'Unauthorized'
+
+    learnlive_server.process_message({'type': 'WHOAMI', 'token': login['token'], 'data': {}}, None, None)
+    assert seen['user_id'] == login['user_id']
+    assert seen['user_role'] == 'teacher'
+
+
+def test_metrics_are_for_teachers_only(learnlive_server):
+    student = sign_up(learnlive_server.db, 'student@example.com', 'student')
+    teacher = sign_up(learnlive_server.db, 'teacher@example.com', 'teacher')
+
+    response = learnlive_server.process_message({'type': MSG_GET_METRICS, 'token': student['token'], 'data': {}}, None, None)
+    assert response['error'] == 'Only teachers can view server metrics'
+    assert 'metrics' not in response
+
+    response = learnlive_server.process_message({'type': MSG_GET_METRICS, 'token': teacher['token'], 'data': {}}, None, None)
+    assert response['success'] and 'counters' in response['metrics']
@@ -0,0 +1,86 @@
+import time
+from datetime import datetime, timedelta
+
+from config.config import TOKEN_EXPIRY
+from server.session_cache import SessionCache
+from conftest import sign_up
+
+
+def user(user_id):
+    return {'success': True, 'user_id': user_id, 'name': user_id, 'email': f'{user_id}@example.com', 'role': 'student'}
+
+
+def test_get_returns_cached_entry():
+    cache = SessionCache(ttl=60, max_entries=10)
+    cache.put('t1', user('u1'))
+    assert cache.get('t1')['user']['user_id'] == 'u1'
+    assert cache.get('missing') is None
+    assert cache.get(None) is None
+
+
+def test_expired_entries_are_dropped():
+    cache = SessionCache(ttl=60, max_entries=10)
+    assert cache.put('t1', user('u1'), expires_at=time.time() - 1) is None
+    entry = cache.put('t2', user('u2'), expires_at=time.time() + 0.05)
+    time.sleep(0.1)
+    assert not cache.is_live(entry)
+    assert cache.get('t2') is None
+
+
+def test_new_login_revokes_previous_token():
+    cache = SessionCache(ttl=60, max_entries=10)
+    first = cache.put('old', user('u1'))
+    cache.put('new', user('u1'))
+    assert first['revoked']
+    assert cache.get('old') is None
+    assert cache.get('new') is not None
+
+
+def test_least_recently_used_is_evicted():
+    cache = SessionCache(ttl=60, max_entries=2)
+    cache.put('t1', user('u1'))
+    cache.put('t2', user('u2'))
+    cache.get('t1')
+    cache.put('t3', user('u3'))
+    assert cache.get('t2') is None
+    assert cache.get('t1') is not None and cache.get('t3') is not None
+
+
+def test_verify_token_is_served_from_cache(db):
+    login = sign_up(db, 'cache@example.com', 'student')
+    assert db.verify_token(login['token'])['user_id'] == login['user_id']
+
+    # A cached token no longer needs its users document
+    db.users.update_one({'token': login['token']}, {'$unset': {'token': ''}})
+    assert db.verify_token(login['token'])['success']
+
+
+def test_verify_token_after_restart_caches_until_expiry(db):
+    login = sign_up(db, 'restart@example.com', 'student')
+    db.sessions.entries.clear()
+    db.sessions.user_tokens.clear()
+    assert db.verify_token(login['token'])['success']
+    assert db.sessions.peek(login['token']) is not None
+    assert not db.verify_token('bogus')['success']
+
+
+def test_expired_token_is_refused_on_a_cache_miss(db):
+    login = sign_up(db, 'stale@example.com', 'student')
+    db.sessions.entries.clear()
+    db.sessions.user_tokens.clear()
+    db.users.update_one({'token': login['token']},
+                        {'$set': {'last_login': datetime.now() - timedelta(seconds=TOKEN_EXPIRY + 1)}})
+
+    assert db.verify_token(login['token']) == {'success': False, 'error': 'Token expired'}
+    assert db.sessions.peek(login['token']) is None
+
+
+def test_bound_session_stops_matching_after_relogin(learnlive_server):
+    db = learnlive_server.db
+    first = sign_up(db, 'bound@example.com', 'student')
+    session = learnlive_server.new_session()
+    assert learnlive_server.authenticate(first['token'], session)['success']
+    assert session['auth']['token'] == first['token']
+
+    db.authenticate_user('bound@example.com', 'secret')
+    assert not learnlive_server.authenticate(first['token'], session)['success']
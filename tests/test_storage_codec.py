@@ -0,0 +1,69 @@
+import os
+
+import pytest
+
+import server.storage_codec as storage_codec
+from config.config import *
+from server.storage_codec import (
+    choose_storage_codec, iter_stored_range, read_stored_file, stored_codec, stored_length
+)
+
+# zstd when zstandard is installed, zlib otherwise
+CODEC = COMPRESSION_ZSTD if storage_codec.zstandard is not None else COMPRESSION_ZLIB
+TEXT = b'The mitochondria is the powerhouse of the cell. ' * 20000
+
+
+def store(db, content):
+    file_id = db.stream_to_gridfs(db.gridfs, content, filename='stored.bin')
+    return db.gridfs.get(file_id)
+
+
+def test_codec_choice():
+    assert choose_storage_codec(TEXT[:GRIDFS_STREAM_CHUNK]) == CODEC
+    assert choose_storage_codec(os.urandom(4096)) is None
+    assert choose_storage_codec(b'\x89PNG\r\n\x1a\n' + b'\0' * 4096) is None
+    assert choose_storage_codec(b'\0\0\0\x18ftypmp42' + b'\0' * 4096) is None
+    assert choose_storage_codec(b'') is None
+
+
+def test_compression_can_be_turned_off(monkeypatch):
+    monkeypatch.setattr(storage_codec, 'GRIDFS_COMPRESSION', False)
+    assert choose_storage_codec(TEXT) is None
+
+
+def test_compressible_file_round_trip(db):
+    grid_out = store(db, TEXT)
+    assert stored_codec(grid_out) == CODEC
+    assert grid_out.length < len(TEXT) // 10
+    assert stored_length(grid_out) == len(TEXT)
+    assert read_stored_file(grid_out) == TEXT
+
+
+def test_incompressible_file_is_stored_raw(db):
+    content = os.urandom(GRIDFS_STREAM_CHUNK + 10)
+    grid_out = store(db, content)
+    assert stored_codec(grid_out) is None
+    assert grid_out.length == stored_length(grid_out) == len(content)
+    assert read_stored_file(grid_out) == content
+
+
+@pytest.mark.parametrize('compressible', [True, False])
+@pytest.mark.parametrize('offset, length', [(0, None), (5, 10), (GRIDFS_STREAM_CHUNK - 3, 7), (100, 10 ** 9)])
+def test_ranges(db, compressible, offset, length):
+    content = TEXT if compressible else os.urandom(len(TEXT))
+    grid_out = store(db, content)
+    end = len(content) if length is None else offset + length
+    assert b''.join(iter_stored_range(grid_out, offset, length)) == content[offset:end]
+
+
+def test_database_download_decompresses(db, classroom):
+    result = db.upload_material_gridfs(
+        classroom['class_id'], classroom['teacher']['user_id'], 'Notes', 'file', TEXT, 'notes.txt'
+    )
+    stored = db.gridfs_files.find_one({'filename': 'notes.txt'})
+    assert stored['storage_codec'] == CODEC
+    assert stored['raw_length'] == len(TEXT)
+
+    download = db.download_material_gridfs(result['file_id'])
+    assert download['total_size'] == len(TEXT)
+    assert b''.join(download['file_stream']) == TEXT
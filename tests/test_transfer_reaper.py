@@ -0,0 +1,94 @@
+# The transfer reaper: idle transfers are closed (and stay resumable),
+# abandoned ones are deleted or quarantined and their quota released.
+
+import os
+
+import pytest
+
+import server.file_handler as file_handler
+from config.config import *
+from server.file_handler import FileHandler
+
+CHUNK = TRANSFER_CHUNK_SIZE
+
+
+@pytest.fixture
+def handler(upload_folder):
+    handler = FileHandler()
+    yield handler
+    handler.stop()
+
+
+def start(handler, transfer_id='t1', user_id='alice', size=CHUNK * 2):
+    return handler.handle_file_upload_start({
+        'transfer_id': transfer_id, 'user_id': user_id, 'filename': 'notes.txt',
+        'filesize': size, 'file_type': 'text/plain'
+    }, None)
+
+
+def test_idle_transfer_is_closed_but_resumable(handler, monkeypatch):
+    start(handler)
+    handler.handle_file_chunk({'transfer_id': 't1', 'user_id': 'alice', 'chunk_number': 0, 'chunk_data': b'a' * CHUNK})
+
+    monkeypatch.setattr(file_handler, 'TRANSFER_IDLE_TIMEOUT', -1)
+    handler.expire_transfers()
+    assert handler.active_transfers == {}
+    assert handler.reserved_bytes == CHUNK * 2
+
+    status = handler.handle_query_transfer({'transfer_id': 't1', 'user_id': 'alice'})
+    assert status['missing'] == [[1, 2]]
+
+
+def test_abandoned_transfer_is_deleted_and_released(handler, monkeypatch, upload_folder):
+    start(handler)
+    monkeypatch.setattr(file_handler, 'TRANSFER_IDLE_TIMEOUT', -1)
+    monkeypatch.setattr(file_handler, 'TRANSFER_RETENTION', -1)
+
+    # The first sweep closes it; the next finds it abandoned on disk
+    handler.expire_transfers()
+    handler.expire_transfers()
+    assert os.listdir(upload_folder / '.partial') == []
+    assert handler.reserved_bytes == 0
+    assert handler.usage_snapshot()['users_with_uploads'] == 0
+
+
+def test_abandoned_transfer_can_be_quarantined(handler, monkeypatch, upload_folder):
+    start(handler)
+    monkeypatch.setattr(file_handler, 'TRANSFER_IDLE_TIMEOUT', -1)
+    monkeypatch.setattr(file_handler, 'TRANSFER_RETENTION', -1)
+    monkeypatch.setattr(file_handler, 'TRANSFER_QUARANTINE', True)
+
+    handler.expire_transfers()
+    handler.expire_transfers()
+    assert sorted(os.listdir(upload_folder / '.quarantine')) == ['t1.json', 't1.part']
+    assert handler.reserved_bytes == 0
+    assert handler.stored_bytes >= CHUNK * 2
+
+
+def test_recent_transfers_are_kept(handler):
+    start(handler)
+    handler.expire_transfers()
+    assert 't1' in handler.active_transfers
+
+
+def test_global_quota(handler, monkeypatch):
+    monkeypatch.setattr(file_handler, 'UPLOAD_QUOTA', CHUNK * 3)
+    assert start(handler, 't1')['success']
+    response = start(handler, 't2', user_id='bob')
+    assert response['success'] is False
+    assert response['error'] == 'Server upload storage is full'
+
+
+def test_usage_is_rebuilt_at_startup(handler, upload_folder):
+    (upload_folder / 'done.txt').write_bytes(b'x' * 100)
+    start(handler)
+    handler.stop()
+
+    restarted = FileHandler()
+    try:
+        snapshot = restarted.usage_snapshot()
+        assert snapshot['reserved_bytes'] == CHUNK * 2
+        assert snapshot['stored_bytes'] == 100
+        assert snapshot['open'] == 0
+    finally:
+        restarted.stop()
@@ -0,0 +1,60 @@
+import pytest
+
+from conftest import sign_up
+
+
+@pytest.fixture
+def user_queries(db, monkeypatch):
+    """Record every query on the users collection"""
+    queries = []
+    original = db.users.find
+    monkeypatch.setattr(db.users, 'find', lambda *args, **kwargs: queries.append(args) or original(*args, **kwargs))
+    return queries
+
+
+@pytest.fixture
+def school(db):
+    teacher = sign_up(db, 'teacher@example.com', 'teacher', name='Ms Frizzle')
+    students = [sign_up(db, f's{n}@example.com', 'student', name=f'Student {n}') for n in range(5)]
+    for name in ('Biology', 'Chemistry', 'Physics'):
+        created = db.create_class(teacher['user_id'], name)
+        for student in students:
+            db.join_class(student['user_id'], created['class_code'])
+    return teacher, students
+
+
+def test_teacher_classes_load_people_in_one_query(db, school, user_queries):
+    teacher, students = school
+    result = db.get_user_classes(teacher['user_id'], 'teacher')
+
+    assert len(user_queries) == 1
+    assert len(result['classes']) == 3
+    for c in result['classes']:
+        assert c['teacher_name'] == 'Ms Frizzle'
+        assert [s['name'] for s in c['student_list']] == [f'Student {n}' for n in range(5)]
+        assert c['student_list'][0]['email'] == 's0@example.com'
+
+
+def test_only_name_and_email_are_loaded(db, school, user_queries):
+    teacher, _ = school
+    db.get_user_classes(teacher['user_id'], 'teacher')
+    query, projection = user_queries[0]
+    assert set(projection) - {'_id'} == {'name', 'email'}
+
+
+def test_missing_and_invalid_people_are_skipped(db, school):
+    teacher, students = school
+    db.users.delete_one({'email': 's1@example.com'})
+    db.classes.update_many({}, {'$push': {'students': 'not-an-id'}})
+
+    result = db.get_user_classes(students[0]['user_id'], 'student')
+    assert len(result['classes']) == 3
+    for c in result['classes']:
+        assert [s['name'] for s in c['student_list']] == ['Student 0', 'Student 2', 'Student 3', 'Student 4']
+
+
+def test_no_classes_no_user_query(db, user_queries):
+    loner = sign_up(db, 'loner@example.com', 'student')
+    user_queries.clear()
+    assert db.get_user_classes(loner['user_id'], 'student') == {'success': True, 'classes': []}
+    assert user_queries == []